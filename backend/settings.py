@@ -170,7 +170,8 @@ if AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY and AWS_STORAGE_BUCKET_NAME:
     # S3 Settings
     AWS_S3_CUSTOM_DOMAIN = f'{AWS_STORAGE_BUCKET_NAME}.s3.{AWS_S3_REGION_NAME}.amazonaws.com'
     AWS_S3_OBJECT_PARAMETERS = {
-        'CacheControl': 'max-age=86400',  # 24 hours
+        # Uploads are content-addressed, a stored name never changes meaning
+        'CacheControl': 'public, max-age=31536000, immutable',
     }
     AWS_DEFAULT_ACL = None  # Disable ACLs
     AWS_S3_FILE_OVERWRITE = False
@@ -200,6 +201,64 @@ else:
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache configuration
+# CACHE_BACKEND selects locmem (default, per process), file or redis.
+# Use redis when running several workers so invalidations reach all of them
+# (requires the optional `redis` package).
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem').strip().lower()
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+        }
+    }
+elif CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', os.path.join(BASE_DIR, '.cache')),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'blog-cms',
+        }
+    }
+
+# Public read endpoint response cache (see blog/utils/response_cache.py). Invalidations
+# only reach processes sharing the cache, so it defaults to on only with a shared backend
+RESPONSE_CACHE_ENABLED = os.environ.get(
+    'RESPONSE_CACHE_ENABLED', str(CACHE_BACKEND in ('redis', 'file'))
+).lower() == 'true'
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 300))  # 5 minutes
+
+# Write-behind buffering of comment likes (see blog/utils/like_buffer.py); buffered
+# likes are flushed in batches and lost if a worker is killed before a clean exit
+LIKE_BUFFER_ENABLED = os.environ.get('LIKE_BUFFER_ENABLED', 'False').lower() == 'true'
+LIKE_BUFFER_MAX_EVENTS = int(os.environ.get('LIKE_BUFFER_MAX_EVENTS', 1000))
+LIKE_BUFFER_FLUSH_INTERVAL = float(os.environ.get('LIKE_BUFFER_FLUSH_INTERVAL', 2.0))  # seconds
+
+# Responsive image variants generated by the image worker (see blog/utils/image_utils.py)
+IMAGE_VARIANT_WIDTHS = [int(width) for width in os.environ.get('IMAGE_VARIANT_WIDTHS', '320,640,960,1200').split(',')]
+# Formats Pillow cannot encode (e.g. AVIF without pillow-avif-plugin) are skipped
+IMAGE_VARIANT_FORMATS = os.environ.get('IMAGE_VARIANT_FORMATS', 'avif,webp').split(',')
+
+# Images above this many pixels are rejected before decoding (decompression bomb guard)
+IMAGE_MAX_PIXELS = int(os.environ.get('IMAGE_MAX_PIXELS', 5000 * 5000))
+# Encoded images stay in memory up to this size, then spill to a temporary file
+IMAGE_SPOOL_MAX_SIZE = int(os.environ.get('IMAGE_SPOOL_MAX_SIZE', 2 * 1024 * 1024))
+
+# Media served by Django when not on S3 (see blog/views_media.py): 'x-accel-redirect'
+# (nginx) or 'x-sendfile' (Apache/lighttpd) hand files to the front proxy instead
+MEDIA_SENDFILE = os.environ.get('MEDIA_SENDFILE', '').lower()
+# Internal nginx location aliased to MEDIA_ROOT, used with x-accel-redirect
+MEDIA_SENDFILE_PREFIX = os.environ.get('MEDIA_SENDFILE_PREFIX', '/protected-media/')
+# Cache lifetime of media not named by content hash (those are cached immutably)
+MEDIA_CACHE_MAX_AGE = int(os.environ.get('MEDIA_CACHE_MAX_AGE', 86400))  # 1 day
+
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
@@ -17,9 +17,7 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
 from django.http import JsonResponse
-from django.views.static import serve
 from django.shortcuts import render
 from django.utils import timezone
 from rest_framework import permissions
@@ -29,6 +27,7 @@ import traceback
 import logging
 from django.views.generic import RedirectView
 from django.contrib.staticfiles.storage import staticfiles_storage
+from blog.views_media import serve_media
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -148,19 +147,8 @@ urlpatterns = [
     path('api/docs/', schema_view_with_error_handling, name='schema-swagger-ui'),
 ]
 
-# Serve media files in development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-    # Add this to serve CKEditor 5 media files in development
-    urlpatterns += [
-        re_path(r'^media/(?P<path>.*)$', serve, {
-            'document_root': settings.MEDIA_ROOT,
-        }),
-    ]
-# For production media serving (not recommended for high-traffic sites, but works for demos)
-else:
-    urlpatterns += [
-        re_path(r'^media/(?P<path>.*)$', serve, {
-            'document_root': settings.MEDIA_ROOT,
-        }),
-    ]
+# Media files (served from S3 instead when it is configured). Set MEDIA_SENDFILE
+# to have the front proxy send them rather than a worker.
+urlpatterns += [
+    re_path(r'^media/(?P<path>.*)$', serve_media),
+]
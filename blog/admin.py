@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import BlogPost, BlogImage, Comment
+from .models import BlogPost, BlogImage, Comment, ImageJob
+from .utils.comment_moderation import moderate_comments
 from django.utils.html import format_html
 from django.utils.text import Truncator
 
@@ -216,28 +217,27 @@ class CommentAdmin(admin.ModelAdmin):
     content_preview.admin_order_field = 'content'
 
     def approve_comments(self, request, queryset):
-        updated = queryset.update(approved=True, is_trash=False)
+        updated = len(moderate_comments('approve', queryset))
         self.message_user(request, f'{updated} comment(s) have been approved.')
     approve_comments.short_description = "Approve selected comments"
     
     def unapprove_comments(self, request, queryset):
-        updated = queryset.update(approved=False)
+        updated = len(moderate_comments('unapprove', queryset))
         self.message_user(request, f'{updated} comment(s) have been unapproved.')
     unapprove_comments.short_description = "Unapprove selected comments"
     
     def trash_comments(self, request, queryset):
-        updated = queryset.update(is_trash=True)
+        updated = len(moderate_comments('trash', queryset))
         self.message_user(request, f'{updated} comment(s) have been moved to trash.')
     trash_comments.short_description = "Move selected comments to trash"
     
     def restore_comments(self, request, queryset):
-        updated = queryset.update(is_trash=False)
+        updated = len(moderate_comments('restore', queryset))
         self.message_user(request, f'{updated} comment(s) have been restored from trash.')
     restore_comments.short_description = "Restore selected comments from trash"
     
     def delete_permanently(self, request, queryset):
-        count = queryset.count()
-        queryset.delete()
+        count = len(moderate_comments('delete', queryset))
         self.message_user(request, f'{count} comment(s) have been permanently deleted.')
     delete_permanently.short_description = "Delete selected comments permanently"
     
@@ -275,3 +275,10 @@ class BlogImageAdmin(admin.ModelAdmin):
             return format_html('<img src="{}" width="100" height="auto" />', obj.image.url)
         return "No Image"
     image_preview.short_description = 'Image Preview'
+
+@admin.register(ImageJob)
+class ImageJobAdmin(admin.ModelAdmin):
+    list_display = ('original_path', 'kind', 'status', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('original_path', 'optimized_path')
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
@@ -0,0 +1,59 @@
+"""
+Management command to delete media files nothing references
+"""
+
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from blog.utils.media_gc import GC_PREFIXES, PAGE_SIZE, collect_garbage
+
+
+class Command(BaseCommand):
+    help = 'Delete stored media that no post, image, queued job or post content references'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the files that would be deleted without deleting them',
+        )
+        parser.add_argument(
+            '--grace-hours',
+            type=float,
+            default=24,
+            help='Keep files modified within this many hours (default: 24)',
+        )
+        parser.add_argument(
+            '--prefix',
+            action='append',
+            dest='prefixes',
+            help=f'Directory to collect in, repeatable (default: {", ".join(GC_PREFIXES)})',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=PAGE_SIZE,
+            help=f'Files deleted per batch (default: {PAGE_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        prefixes = [
+            prefix if prefix.endswith('/') else f'{prefix}/'
+            for prefix in options['prefixes'] or GC_PREFIXES
+        ]
+
+        def report(stored):
+            self.stdout.write(f'  - {stored.name} ({stored.size} bytes, modified {stored.modified:%Y-%m-%d %H:%M})')
+
+        count, total_size = collect_garbage(
+            prefixes=prefixes,
+            grace_period=timedelta(hours=options['grace_hours']),
+            dry_run=dry_run,
+            batch_size=options['batch_size'],
+            on_file=report,
+        )
+
+        verb = 'Would delete' if dry_run else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {count} unreferenced files ({total_size / 1024 / 1024:.1f} MB)'
+        ))
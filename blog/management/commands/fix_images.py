@@ -2,15 +2,68 @@
 Management command to fix and optimize existing blog images
 """
 
+from django.core.files.storage import default_storage
 from django.core.management.base import BaseCommand
 from django.conf import settings
-from blog.models import BlogPost, BlogImage
+from django.db import connections
+from blog.models import BlogPost, BlogImage, ImageJob, MediaAsset
+from blog.utils.image_queue import claim_job, process_job
 from blog.utils.image_utils import ImageProcessor, ensure_media_directories, cleanup_unused_images
+from blog.utils.media_gc import PAGE_SIZE, delete_files, release_assets
+from datetime import timedelta
+from itertools import islice
+import multiprocessing
 import os
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# Seconds between progress lines
+PROGRESS_INTERVAL = 5
+
+
+def _run_job(job_id):
+    """
+    Run one queued job (in a pool worker)
+
+    Returns:
+        tuple: (status or None if another worker took the job, size of the
+            original, size of the optimized file)
+    """
+    job = claim_job(pk=job_id)
+    if job is None:
+        return None, 0, 0
+    try:
+        size_before = default_storage.size(job.original_path)
+    except Exception:
+        size_before = 0
+    status = process_job(job)
+    size_after = MediaAsset.objects.filter(sha256=job.sha256).values_list('size', flat=True).first() or 0
+    return status, size_before, size_after
+
+
+def _is_optimized_file(name):
+    """
+    Whether a stored image is already a WebP within the optimized size, as
+    left by optimizations run before MediaAsset rows were recorded
+    """
+    if not name.lower().endswith('.webp'):
+        return False
+    try:
+        with default_storage.open(name, 'rb') as image_file:
+            # Only the header is read
+            image = ImageProcessor.open_image(image_file)
+            width, height = image.size
+            return (
+                image.format == 'WEBP'
+                and width <= ImageProcessor.DEFAULT_MAX_WIDTH
+                and height <= ImageProcessor.DEFAULT_MAX_HEIGHT
+            )
+    except Exception:
+        return False
+
+
 class Command(BaseCommand):
     help = 'Fix and optimize existing blog images'
 
@@ -20,6 +73,18 @@ class Command(BaseCommand):
             action='store_true',
             help='Optimize all existing images',
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Worker processes used by --optimize (default: number of CPUs)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Images read and queued per database round trip by --optimize (default: 500)',
+        )
         parser.add_argument(
             '--cleanup',
             action='store_true',
@@ -47,7 +112,7 @@ class Command(BaseCommand):
             self.check_images()
         
         if options['optimize']:
-            self.optimize_images()
+            self.optimize_images(options['workers'], options['batch_size'])
         
         if options['cleanup']:
             self.cleanup_images()
@@ -68,8 +133,7 @@ class Command(BaseCommand):
         
         for post in posts_with_images:
             if post.featured_image:
-                file_path = os.path.join(settings.MEDIA_ROOT, post.featured_image.name)
-                if os.path.exists(file_path):
+                if post.featured_image.storage.exists(post.featured_image.name):
                     valid_featured += 1
                 else:
                     missing_featured += 1
@@ -84,8 +148,7 @@ class Command(BaseCommand):
         
         for blog_image in blog_images:
             if blog_image.image:
-                file_path = os.path.join(settings.MEDIA_ROOT, blog_image.image.name)
-                if os.path.exists(file_path):
+                if blog_image.image.storage.exists(blog_image.image.name):
                     valid_blog += 1
                 else:
                     missing_blog += 1
@@ -97,60 +160,110 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS(f'Featured images: {valid_featured} valid, {missing_featured} missing'))
         self.stdout.write(self.style.SUCCESS(f'Blog images: {valid_blog} valid, {missing_blog} missing'))
 
-    def optimize_images(self):
-        """Optimize all existing images"""
+    def optimize_images(self, workers, batch_size):
+        """
+        Optimize existing images that have not been optimized yet
+
+        Unoptimized images are queued as ImageJob rows, which double as the
+        checkpoint: an interrupted run leaves its remaining jobs pending, a
+        rerun picks them up again, and images that were swapped to their
+        optimized file are skipped. The jobs are then run across a process
+        pool through the same code path as the image worker, so this works
+        on any storage backend.
+        """
         self.stdout.write(self.style.WARNING('Optimizing images...'))
         
-        # Optimize featured images
-        posts_with_images = BlogPost.objects.filter(featured_image__isnull=False)
-        optimized_count = 0
+        job_ids, skipped = self.queue_unoptimized_images(batch_size)
+        self.stdout.write(f'{len(job_ids)} images to optimize, {skipped} already optimized')
+        if not job_ids:
+            return
         
-        for post in posts_with_images:
-            if post.featured_image:
-                file_path = os.path.join(settings.MEDIA_ROOT, post.featured_image.name)
-                if os.path.exists(file_path):
-                    try:
-                        with open(file_path, 'rb') as f:
-                            optimized = ImageProcessor.optimize_image(f)
-                            if optimized:
-                                # Save optimized image
-                                post.featured_image.save(
-                                    optimized.name,
-                                    optimized,
-                                    save=True
-                                )
-                                optimized_count += 1
-                                self.stdout.write(f'✓ Optimized: {post.title}')
-                    except Exception as e:
-                        self.stdout.write(
-                            self.style.ERROR(f'Error optimizing {post.title}: {str(e)}')
-                        )
-        
-        # Optimize blog images
-        blog_images = BlogImage.objects.all()
+        if workers > 1:
+            # Each worker process opens its own database connection
+            connections.close_all()
+            pool = multiprocessing.get_context('fork').Pool(workers)
+            results = pool.imap_unordered(_run_job, job_ids, chunksize=4)
+        else:
+            pool = None
+            results = map(_run_job, job_ids)
         
-        for blog_image in blog_images:
-            if blog_image.image:
-                file_path = os.path.join(settings.MEDIA_ROOT, blog_image.image.name)
-                if os.path.exists(file_path):
-                    try:
-                        with open(file_path, 'rb') as f:
-                            optimized = ImageProcessor.optimize_image(f)
-                            if optimized:
-                                # Save optimized image
-                                blog_image.image.save(
-                                    optimized.name,
-                                    optimized,
-                                    save=True
-                                )
-                                optimized_count += 1
-                                self.stdout.write(f'✓ Optimized blog image for: {blog_image.post.title}')
-                    except Exception as e:
-                        self.stdout.write(
-                            self.style.ERROR(f'Error optimizing blog image: {str(e)}')
-                        )
-        
-        self.stdout.write(self.style.SUCCESS(f'Optimized {optimized_count} images'))
+        total = len(job_ids)
+        counts = {}
+        saved = 0
+        started = last_report = time.monotonic()
+        try:
+            for done, (status, size_before, size_after) in enumerate(results, start=1):
+                counts[status] = counts.get(status, 0) + 1
+                if status == ImageJob.STATUS_DONE and size_before:
+                    saved += size_before - size_after
+                
+                now = time.monotonic()
+                if now - last_report >= PROGRESS_INTERVAL or done == total:
+                    last_report = now
+                    rate = done / max(now - started, 1e-6)
+                    eta = timedelta(seconds=round((total - done) / rate))
+                    self.stdout.write(
+                        f'{done}/{total} images ({rate:.1f}/s, ETA {eta}), '
+                        f'{saved / 1024 / 1024:.1f} MB saved'
+                    )
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        
+        self.stdout.write(self.style.SUCCESS(
+            f"Optimized {counts.get(ImageJob.STATUS_DONE, 0)} images, saving {saved / 1024 / 1024:.1f} MB "
+            f"({counts.get(ImageJob.STATUS_PENDING, 0)} queued for retry, "
+            f"{counts.get(ImageJob.STATUS_FAILED, 0)} failed, "
+            f"{counts.get(ImageJob.STATUS_SKIPPED, 0) + counts.get(None, 0)} skipped)"
+        ))
+
+    def queue_unoptimized_images(self, batch_size):
+        """
+        Queue jobs for images not yet pointing at an optimized file
+
+        An image counts as optimized when it is the output of a MediaAsset
+        or, for images optimized before those were recorded, a WebP file
+        within the optimized size.
+
+        Returns:
+            tuple: (ids of the jobs to run, number of images already optimized)
+        """
+        sources = [
+            (ImageJob.KIND_FEATURED_IMAGE, BlogPost.objects.exclude(featured_image='')
+                .exclude(featured_image__isnull=True).values_list('pk', 'featured_image')),
+            (ImageJob.KIND_BLOG_IMAGE, BlogImage.objects.exclude(image='').values_list('pk', 'image')),
+        ]
+        job_ids = []
+        skipped = 0
+        for kind, rows in sources:
+            rows = rows.order_by('pk').iterator(chunk_size=batch_size)
+            while batch := list(islice(rows, batch_size)):
+                optimized = set(MediaAsset.objects.filter(
+                    name__in={name for _, name in batch}
+                ).values_list('name', flat=True))
+                # Jobs left by an interrupted run (or the upload itself) are reused
+                queued = {
+                    (object_id, path): pk
+                    for pk, object_id, path in ImageJob.objects.filter(
+                        kind=kind,
+                        object_id__in=[object_id for object_id, _ in batch],
+                        status__in=[ImageJob.STATUS_PENDING, ImageJob.STATUS_PROCESSING],
+                    ).values_list('pk', 'object_id', 'original_path')
+                }
+                
+                new_jobs = []
+                for object_id, name in batch:
+                    if name in optimized:
+                        skipped += 1
+                    elif (object_id, name) in queued:
+                        job_ids.append(queued[object_id, name])
+                    elif _is_optimized_file(name):
+                        skipped += 1
+                    else:
+                        new_jobs.append(ImageJob(kind=kind, object_id=object_id, original_path=name))
+                job_ids.extend(job.pk for job in ImageJob.objects.bulk_create(new_jobs))
+        return job_ids, skipped
 
     def cleanup_images(self):
         """Clean up unused image files"""
@@ -166,19 +279,15 @@ class Command(BaseCommand):
             # Ask for confirmation
             confirm = input('Delete these files? (y/N): ')
             if confirm.lower() == 'y':
-                deleted_count = 0
-                for file in unused_files:
-                    file_path = os.path.join(settings.MEDIA_ROOT, file)
-                    try:
-                        os.remove(file_path)
-                        deleted_count += 1
-                        self.stdout.write(f'✓ Deleted: {file}')
-                    except Exception as e:
-                        self.stdout.write(
-                            self.style.ERROR(f'Error deleting {file}: {str(e)}')
-                        )
+                unused_files = sorted(unused_files)
+                deleted = 0
+                for start in range(0, len(unused_files), PAGE_SIZE):
+                    # Asset rows go first so identical uploads are stored again
+                    names = release_assets(unused_files[start:start + PAGE_SIZE])
+                    delete_files(default_storage, names)
+                    deleted += len(names)
                 
-                self.stdout.write(self.style.SUCCESS(f'Deleted {deleted_count} unused files'))
+                self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} unused files'))
             else:
                 self.stdout.write('Cleanup cancelled')
         else:
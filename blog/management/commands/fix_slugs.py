@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand
 from blog.models import BlogPost
 from django.utils.text import slugify
 from django.db.models import Q
+from blog.utils.slugs import allocate_slugs
 
 class Command(BaseCommand):
     help = 'Fix or populate slugs for blog posts'
@@ -36,41 +37,34 @@ class Command(BaseCommand):
             self.stdout.write(f"Searching for posts with NULL or empty slugs...")
         
         # Get posts that need fixing
-        posts_to_fix = BlogPost.objects.filter(query)
+        posts_to_fix = list(BlogPost.objects.filter(query))
         
-        self.stdout.write(self.style.SUCCESS(f'Found {posts_to_fix.count()} posts that need slug fixes'))
+        self.stdout.write(self.style.SUCCESS(f'Found {len(posts_to_fix)} posts that need slug fixes'))
         
         if dry_run:
             self.stdout.write(self.style.WARNING('DRY RUN: No changes will be made'))
         
+        # Allocate every slug up front with one lookup of the colliding
+        # slugs; posts without a usable title fall back to post-<id>
+        slugs = allocate_slugs(
+            BlogPost,
+            [slugify(post.title) or f"post-{post.id}" for post in posts_to_fix],
+            exclude_pks=[post.id for post in posts_to_fix],
+        )
+        
         # Counter for fixed posts
         fixed_count = 0
         
-        for post in posts_to_fix:
-            # Generate slug from title
-            original_slug = slugify(post.title)
-            
-            # Handle empty titles
-            if not original_slug:
-                original_slug = f"post-{post.id}"
-            
-            slug = original_slug
-            counter = 1
-            
-            # Ensure uniqueness
-            while BlogPost.objects.filter(slug=slug).exclude(id=post.id).exists():
-                slug = f"{original_slug}-{counter}"
-                counter += 1
-            
+        for post, slug in zip(posts_to_fix, slugs):
             old_slug = post.slug if post.slug else "NULL"
             
             if not dry_run:
                 post.slug = slug
-                post.save()
+                post.save(update_fields=['slug'])
                 fixed_count += 1
                 
             status = "[WOULD FIX]" if dry_run else "[FIXED]"
             self.stdout.write(f"{status} Post ID {post.id}: '{post.title}' - Slug changed from '{old_slug}' to '{slug}'")
         
         action = "Would fix" if dry_run else "Fixed"
-        self.stdout.write(self.style.SUCCESS(f'{action} {fixed_count} posts')) 
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS(f'{action} {fixed_count} posts'))
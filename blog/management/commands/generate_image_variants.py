@@ -0,0 +1,46 @@
+"""
+Management command to generate responsive variants for stored images
+"""
+
+import os
+from django.core.management.base import BaseCommand
+from blog.models import BlogImage, BlogPost
+from blog.utils.image_queue import generate_variants
+
+
+class Command(BaseCommand):
+    help = 'Generate the responsive width variants of featured and post images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate variants for images that already have them',
+        )
+
+    def handle(self, *args, **options):
+        force = options['force']
+        posts = BlogPost.objects.exclude(featured_image='').exclude(featured_image__isnull=True)
+        images = BlogImage.objects.exclude(image='')
+        if not force:
+            posts = posts.filter(featured_image_variants=[])
+            images = images.filter(variants=[])
+
+        generated = failed = 0
+        for queryset, field_name, variants_field in [
+            (posts, 'featured_image', 'featured_image_variants'),
+            (images, 'image', 'variants'),
+        ]:
+            for instance in queryset.iterator():
+                field_file = getattr(instance, field_name)
+                try:
+                    variants = generate_variants(field_file.storage, field_file.name, os.path.dirname(field_file.name))
+                except Exception as e:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(f'Failed {field_file.name}: {str(e)}'))
+                    continue
+                setattr(instance, variants_field, variants)
+                instance.save(update_fields=[variants_field])
+                generated += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Generated variants for {generated} images ({failed} failed).'))
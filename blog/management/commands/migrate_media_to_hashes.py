@@ -0,0 +1,101 @@
+"""
+Management command to move existing media to content-addressed names
+"""
+
+import os
+import re
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from blog.models import BlogImage, BlogPost, MediaAsset
+from blog.utils.media_store import file_digest, is_hashed_name, save_hashed
+
+# Editor upload links in post content that are not content-addressed yet
+LEGACY_EDITOR_UPLOAD_RE = re.compile(r'(?:quill|ckeditor)_uploads/[^"\'\s?#)<>]+')
+
+
+class Command(BaseCommand):
+    help = 'Copy existing media to content-addressed names and point the database at them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be migrated without copying or saving anything',
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.migrated = self.failed = 0
+
+        for post in BlogPost.objects.exclude(featured_image='').exclude(featured_image__isnull=True).iterator():
+            self.migrate_field(post, 'featured_image', 'featured_image_variants')
+        for image in BlogImage.objects.exclude(image='').iterator():
+            self.migrate_field(image, 'image', 'variants')
+        for post in BlogPost.objects.filter(content__contains='_uploads/').iterator():
+            self.migrate_content(post)
+
+        prefix = 'Would migrate' if self.dry_run else 'Migrated'
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix} {self.migrated} files ({self.failed} failed). '
+            f'Previous files are left in place for the media garbage collector.'
+        ))
+
+    def copy_hashed(self, storage, name):
+        """Copy a file to its content-addressed name, returning that name"""
+        with storage.open(name, 'rb') as source:
+            digest = file_digest(source)
+            if self.dry_run:
+                return name
+            hashed = save_hashed(storage, os.path.dirname(name), source, extension=os.path.splitext(name)[1], digest=digest)
+        # Stored files were already optimized; identical uploads can reuse them
+        MediaAsset.objects.get_or_create(sha256=digest, defaults={
+            'name': hashed,
+            'optimized_sha256': digest,
+            'size': storage.size(hashed),
+        })
+        return hashed
+
+    def migrate_field(self, instance, field_name, variants_field):
+        field_file = getattr(instance, field_name)
+        storage = field_file.storage
+        variants = getattr(instance, variants_field)
+        if is_hashed_name(field_file.name) and all(is_hashed_name(variant['name']) for variant in variants):
+            return
+
+        try:
+            name = field_file.name if is_hashed_name(field_file.name) else self.copy_hashed(storage, field_file.name)
+            for variant in variants:
+                if not is_hashed_name(variant['name']):
+                    variant['name'] = self.copy_hashed(storage, variant['name'])
+        except Exception as e:
+            self.failed += 1
+            self.stdout.write(self.style.ERROR(f'Failed {field_file.name}: {str(e)}'))
+            return
+
+        self.migrated += 1
+        self.stdout.write(f'{field_file.name} -> {name}')
+        if not self.dry_run:
+            field_file.name = name
+            setattr(instance, variants_field, variants)
+            instance.save(update_fields=[field_name, variants_field])
+
+    def migrate_content(self, post):
+        replacements = {}
+        for name in set(LEGACY_EDITOR_UPLOAD_RE.findall(post.content)):
+            if is_hashed_name(name) or not default_storage.exists(name):
+                continue
+            try:
+                replacements[name] = self.copy_hashed(default_storage, name)
+            except Exception as e:
+                self.failed += 1
+                self.stdout.write(self.style.ERROR(f'Failed {name}: {str(e)}'))
+                continue
+            self.migrated += 1
+            self.stdout.write(f'{name} -> {replacements[name]} (in "{post.title}")')
+
+        if replacements and not self.dry_run:
+            content = post.content
+            for old, new in replacements.items():
+                content = content.replace(old, new)
+            post.content = content
+            post.save(update_fields=['content', 'updated_at'])
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from blog.utils.image_queue import run_worker
+
+
+class Command(BaseCommand):
+    help = 'Run the worker that optimizes queued image uploads'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit when the queue is empty instead of polling for new jobs',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5,
+            help='Seconds to wait before polling an empty queue again (default: 5)',
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=None,
+            help='Exit after processing this many jobs',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Processing image jobs...")
+        
+        processed = run_worker(
+            once=options['once'],
+            poll_interval=options['poll_interval'],
+            max_jobs=options['max_jobs'],
+        )
+        
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} image jobs."))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from blog.utils.related_posts import DEFAULT_TOP_K, run_worker
+
+
+class Command(BaseCommand):
+    help = 'Run the worker that refreshes the related-posts rows of saved and deleted posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit when the queue is empty instead of polling for new updates',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=10,
+            help='Seconds to wait before polling an empty queue again (default: 10)',
+        )
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=DEFAULT_TOP_K,
+            help=f'Number of related posts stored per post (default: {DEFAULT_TOP_K})',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Processing related posts updates...")
+        
+        processed = run_worker(
+            once=options['once'],
+            poll_interval=options['poll_interval'],
+            top_k=options['top_k'],
+        )
+        
+        self.stdout.write(self.style.SUCCESS(f"Refreshed related posts for {processed} queued posts."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from blog.utils.render_store import rebuild_renders
+
+
+class Command(BaseCommand):
+    help = 'Re-render the stored detail payloads of all blog posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of posts loaded per database round trip (default: 100)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rendering post payloads...")
+        
+        rendered = rebuild_renders(batch_size=options['batch_size'])
+        
+        self.stdout.write(self.style.SUCCESS(f"Rendered {rendered} posts."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from blog.utils.related_posts import DEFAULT_TOP_K, rebuild_related_posts
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed related-posts index for all published posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=DEFAULT_TOP_K,
+            help=f'Number of related posts stored per post (default: {DEFAULT_TOP_K})',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuilding related posts index...")
+        
+        indexed = rebuild_related_posts(top_k=options['top_k'])
+        
+        self.stdout.write(self.style.SUCCESS(f"Indexed related posts for {indexed} posts."))
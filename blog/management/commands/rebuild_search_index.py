@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from blog.utils.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search documents for all blog posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of posts loaded per database round trip (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuilding search index...")
+        
+        indexed = rebuild_index(batch_size=options['batch_size'])
+        
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} posts."))
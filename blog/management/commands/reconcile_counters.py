@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from blog.utils.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Recount the stored comment, like and post counters and repair drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows checked per database round trip (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Reconciling stored counters...")
+        
+        repaired = reconcile_counters(batch_size=options['batch_size'])
+        
+        for label, count in repaired.items():
+            self.stdout.write(f"  {label}: {count} repaired")
+        self.stdout.write(self.style.SUCCESS(f"Repaired {sum(repaired.values())} counters."))
@@ -0,0 +1,158 @@
+# Generated by Django 4.2.13 on 2026-10-17 06:00
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils.html import strip_tags
+
+
+POSTGRESQL_INDEX_SQL = [
+    """
+    ALTER TABLE blog_postsearchdocument ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(excerpt, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(body, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX blog_postsearch_vector_gin ON blog_postsearchdocument USING GIN (search_vector)",
+]
+
+POSTGRESQL_DROP_SQL = [
+    "DROP INDEX IF EXISTS blog_postsearch_vector_gin",
+    "ALTER TABLE blog_postsearchdocument DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_INDEX_SQL = [
+    """
+    CREATE VIRTUAL TABLE blog_postsearch_fts USING fts5(
+        title, excerpt, body,
+        content='blog_postsearchdocument', content_rowid='post_id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER blog_postsearch_ai AFTER INSERT ON blog_postsearchdocument BEGIN
+        INSERT INTO blog_postsearch_fts(rowid, title, excerpt, body)
+        VALUES (new.post_id, new.title, new.excerpt, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER blog_postsearch_ad AFTER DELETE ON blog_postsearchdocument BEGIN
+        INSERT INTO blog_postsearch_fts(blog_postsearch_fts, rowid, title, excerpt, body)
+        VALUES ('delete', old.post_id, old.title, old.excerpt, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER blog_postsearch_au AFTER UPDATE ON blog_postsearchdocument BEGIN
+        INSERT INTO blog_postsearch_fts(blog_postsearch_fts, rowid, title, excerpt, body)
+        VALUES ('delete', old.post_id, old.title, old.excerpt, old.body);
+        INSERT INTO blog_postsearch_fts(rowid, title, excerpt, body)
+        VALUES (new.post_id, new.title, new.excerpt, new.body);
+    END
+    """,
+]
+
+SQLITE_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS blog_postsearch_au",
+    "DROP TRIGGER IF EXISTS blog_postsearch_ad",
+    "DROP TRIGGER IF EXISTS blog_postsearch_ai",
+    "DROP TABLE IF EXISTS blog_postsearch_fts",
+]
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Create the database-specific full-text index on the search documents.
+    Databases other than PostgreSQL and SQLite use substring search instead.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        statements = POSTGRESQL_INDEX_SQL
+    elif vendor == 'sqlite':
+        statements = SQLITE_INDEX_SQL
+    else:
+        return
+
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    """
+    Reverse operation - drop the full-text index
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        statements = POSTGRESQL_DROP_SQL
+    elif vendor == 'sqlite':
+        statements = SQLITE_DROP_SQL
+    else:
+        return
+
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def _clean(value):
+    return re.sub(r'\s+', ' ', strip_tags(value or '')).strip()
+
+
+def _excerpt(content):
+    """Excerpt generated from content, as BlogPost.generate_excerpt did here"""
+    plain_text = _clean(content)
+    if len(plain_text) <= 250:
+        return plain_text
+    excerpt = plain_text[:250]
+    last_space = excerpt.rfind(' ')
+    if last_space > 200:
+        excerpt = excerpt[:last_space]
+    return excerpt + "..."
+
+
+def populate_search_documents(apps, schema_editor):
+    """
+    Build search documents for existing posts, as saving them did when this
+    migration was written (the logic is copied so later code changes do not
+    alter it)
+    """
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    PostSearchDocument = apps.get_model('blog', 'PostSearchDocument')
+
+    documents = []
+    for post in BlogPost.objects.only('id', 'title', 'excerpt', 'content').iterator(chunk_size=500):
+        documents.append(PostSearchDocument(
+            post_id=post.id,
+            title=_clean(post.title),
+            excerpt=_clean(post.excerpt or _excerpt(post.content)),
+            body=_clean(post.content),
+        ))
+        if len(documents) >= 500:
+            PostSearchDocument.objects.bulk_create(documents)
+            documents = []
+
+    if documents:
+        PostSearchDocument.objects.bulk_create(documents)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_remove_schema_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearchDocument',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='blog.blogpost')),
+                ('title', models.CharField(max_length=200)),
+                ('excerpt', models.TextField(blank=True)),
+                ('body', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+    ]
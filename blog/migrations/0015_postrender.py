@@ -0,0 +1,25 @@
+# Generated by Django 4.2.13 on 2026-10-17 06:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0014_relatedpost'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostRender',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='render', serialize=False, to='blog.blogpost')),
+                ('payload', models.BinaryField()),
+                ('gzip_payload', models.BinaryField()),
+                ('brotli_payload', models.BinaryField(blank=True, null=True)),
+                ('etag', models.CharField(max_length=32)),
+                ('rendered_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
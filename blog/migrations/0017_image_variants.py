@@ -0,0 +1,23 @@
+# Generated by Django 4.2.13 on 2026-10-17 06:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0016_imagejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='featured_image_variants',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+    ]
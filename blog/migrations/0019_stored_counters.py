@@ -0,0 +1,64 @@
+# Generated by Django 4.2.13 on 2026-10-17 06:30
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    """
+    Count the existing rows into the new counters, one UPDATE per counter
+    """
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    Category = apps.get_model('blog', 'Category')
+    Comment = apps.get_model('blog', 'Comment')
+    CommentLike = apps.get_model('blog', 'CommentLike')
+    db_alias = schema_editor.connection.alias
+
+    def total(queryset, group_by):
+        counted = queryset.using(db_alias).order_by().values(group_by).annotate(total=Count('pk'))
+        return Coalesce(Subquery(counted.values('total')), 0)
+
+    BlogPost.objects.using(db_alias).update(approved_comment_count=total(
+        Comment.objects.filter(post=OuterRef('pk'), approved=True, is_trash=False), 'post'
+    ))
+    Comment.objects.using(db_alias).update(approved_reply_count=total(
+        Comment.objects.filter(parent=OuterRef('pk'), approved=True, is_trash=False), 'parent'
+    ))
+    Comment.objects.using(db_alias).update(like_count=total(
+        CommentLike.objects.filter(comment=OuterRef('pk')), 'comment'
+    ))
+    Category.objects.using(db_alias).update(published_post_count=total(
+        BlogPost.objects.filter(category=OuterRef('pk'), published=True), 'category'
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0018_media_assets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='approved_comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='published_post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='approved_reply_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.13 on 2026-10-17 06:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0019_stored_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['published', 'position', '-created_at', '-id'], name='blog_post_listing_keyset'),
+        ),
+    ]
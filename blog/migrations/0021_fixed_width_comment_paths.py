@@ -0,0 +1,89 @@
+# Generated by Django 4.2.13 on 2026-10-17 06:38
+
+from django.db import migrations, models
+
+# Kept in sync with blog.models.COMMENT_PATH_WIDTH at the time of writing
+PATH_WIDTH = 10
+BATCH_SIZE = 1000
+
+
+def _rewrite_paths(apps, schema_editor, make_segment):
+    """
+    Rebuild every comment path and level from the parent links, writing
+    the rows back in batches
+    """
+    Comment = apps.get_model('blog', 'Comment')
+    db_alias = schema_editor.connection.alias
+    comments = Comment.objects.using(db_alias)
+
+    # Parents are created before their replies, so walking by id sees a
+    # parent's new path before any of its replies
+    paths = {}
+    pending = []
+    batch = []
+
+    def place(comment_id, parent_id):
+        if parent_id is None:
+            paths[comment_id] = (make_segment(comment_id), 0)
+        elif parent_id in paths:
+            parent_path, parent_level = paths[parent_id]
+            paths[comment_id] = (f"{parent_path}/{make_segment(comment_id)}", parent_level + 1)
+        else:
+            return False
+        path, level = paths[comment_id]
+        batch.append(Comment(id=comment_id, path=path, level=level))
+        if len(batch) >= BATCH_SIZE:
+            comments.bulk_update(batch, ['path', 'level'])
+            batch.clear()
+        return True
+
+    for comment_id, parent_id in comments.order_by('id').values_list('id', 'parent_id').iterator(chunk_size=BATCH_SIZE):
+        if not place(comment_id, parent_id):
+            pending.append((comment_id, parent_id))
+
+    # Replies whose parent has a higher id (rows moved or imported by hand)
+    while pending:
+        remaining = [row for row in pending if not place(*row)]
+        if len(remaining) == len(pending):
+            break
+        pending = remaining
+
+    if batch:
+        comments.bulk_update(batch, ['path', 'level'])
+
+
+def pad_paths(apps, schema_editor):
+    _rewrite_paths(apps, schema_editor, lambda comment_id: f"{comment_id:0{PATH_WIDTH}d}")
+
+
+def unpad_paths(apps, schema_editor):
+    _rewrite_paths(apps, schema_editor, str)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0020_post_listing_keyset_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='blog_commen_path_7e6893_idx',
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, max_length=1024),
+        ),
+        # Rewritten before the new indexes are built
+        migrations.RunPython(pad_paths, unpad_paths),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='blog_comment_thread_order'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['path'], name='blog_comment_path_prefix', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
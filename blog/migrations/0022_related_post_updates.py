@@ -0,0 +1,23 @@
+# Generated by Django 4.2.13 on 2026-10-17 06:56
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0021_fixed_width_comment_paths'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedPostUpdate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_id', models.BigIntegerField(unique=True)),
+                ('affected_ids', models.JSONField(blank=True, default=list)),
+                ('queued_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.13 on 2026-10-17 07:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0023_blogimage_updated_at'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='postrender',
+            name='etag',
+        ),
+    ]
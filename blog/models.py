@@ -1,22 +1,42 @@
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models.functions import Concat, Substr
 from django_ckeditor_5.fields import CKEditor5Field
 import os
 from PIL import Image
 from io import BytesIO
 from django.core.files.base import ContentFile
 import logging
-from django.utils.text import slugify
+from django.utils import timezone
 from django.utils.html import strip_tags
 import re
 import math
-from .utils.image_utils import optimize_blog_image, ensure_media_directories
+from .utils.image_utils import ensure_media_directories
+from .utils.media_store import replace_editor_uploads, store_upload
+from .utils.slugs import save_with_unique_slug
 
 logger = logging.getLogger(__name__)
 
 # Ensure media directories exist on import
 ensure_media_directories()
 
-class Category(models.Model):
+class StoredCountersMixin:
+    """
+    Keep full saves from writing back stored counters (see
+    blog.utils.counters), which are only changed by ``F()`` updates and would
+    otherwise be reset to the stale value loaded with the instance
+    """
+    COUNTER_FIELDS = ()
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            skipped = set(self.COUNTER_FIELDS) | self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped and field.name not in skipped
+            ]
+        super().save(*args, **kwargs)
+
+class Category(StoredCountersMixin, models.Model):
     """
     Category model for organizing blog posts
     """
@@ -24,9 +44,12 @@ class Category(models.Model):
     slug = models.SlugField(max_length=120, unique=True, blank=True)
     description = models.TextField(blank=True, null=True)
     color = models.CharField(max_length=7, default='#007bff', help_text='Hex color code for category display')
+    published_post_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    COUNTER_FIELDS = ('published_post_count',)
+    
     class Meta:
         verbose_name_plural = 'Categories'
         ordering = ['name']
@@ -35,21 +58,29 @@ class Category(models.Model):
         return self.name
     
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.name)
-            # Ensure uniqueness
-            original_slug = self.slug
-            counter = 1
-            while Category.objects.filter(slug=self.slug).exists():
-                self.slug = f"{original_slug}-{counter}"
-                counter += 1
-        super().save(*args, **kwargs)
+        # Missing slugs are allocated from the name, unique in one query
+        save_with_unique_slug(self, self.name, super().save, *args, **kwargs)
     
     def get_post_count(self):
         """Get the number of published posts in this category"""
-        return self.posts.filter(published=True).count()
+        return self.published_post_count
 
-class BlogPost(models.Model):
+class BlogPostQuerySet(models.QuerySet):
+    """
+    QuerySet helpers for blog posts
+    """
+    
+    def with_list_stats(self):
+        """
+        Join the category shown in post listings.
+        
+        The comment and category post counts are stored counters
+        (``approved_comment_count`` and ``Category.published_post_count``), so
+        a page costs the same number of queries regardless of its size.
+        """
+        return self.select_related('category')
+
+class BlogPost(StoredCountersMixin, models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=250, unique=True, blank=True)
     content = CKEditor5Field('Content', config_name='extends')
@@ -59,6 +90,8 @@ class BlogPost(models.Model):
         help_text='Brief description of the post (max 300 characters). If left blank, will be auto-generated from content.'
     )
     featured_image = models.ImageField(upload_to='featured_images/', blank=True, null=True)
+    # Responsive copies filled in by the image worker: [{format, width, height, name}]
+    featured_image_variants = models.JSONField(default=list, blank=True, editable=False)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='posts', db_index=True)
     published = models.BooleanField(default=False, db_index=True)
     featured = models.BooleanField(default=False, db_index=True)
@@ -67,6 +100,7 @@ class BlogPost(models.Model):
         default=0, 
         help_text='Estimated reading time in minutes (auto-calculated based on content)'
     )
+    approved_comment_count = models.PositiveIntegerField(default=0, editable=False)
     # SEO Meta Fields
     meta_title = models.CharField(
         max_length=60,
@@ -84,6 +118,10 @@ class BlogPost(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = BlogPostQuerySet.as_manager()
+    
+    COUNTER_FIELDS = ('approved_comment_count',)
+    
     def __str__(self):
         return self.title
 
@@ -164,66 +202,104 @@ class BlogPost(models.Model):
         return excerpt + "..."
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.title)
-            # Ensure uniqueness
-            original_slug = self.slug
-            counter = 1
-            while BlogPost.objects.filter(slug=self.slug).exists():
-                self.slug = f"{original_slug}-{counter}"
-                counter += 1
-        
         # Auto-generate excerpt if not provided
         if not self.excerpt and self.content:
             self.excerpt = self.generate_excerpt()
         
         # Auto-calculate read time
         self.read_time = self.calculate_read_time()
-        # Optimize featured image if present and it's a new upload
-        if self.featured_image and hasattr(self.featured_image, '_file'):
-            try:
-                optimized_image = optimize_blog_image(self.featured_image)
-                if optimized_image:
-                    self.featured_image.save(
-                        optimized_image.name,
-                        optimized_image,
-                        save=False  # Don't trigger recursive save
-                    )
-                    logger.info(f"Optimized featured image: {optimized_image.name}")
-            except Exception as e:
-                logger.error(f"Error optimizing featured image: {str(e)}")
+        # New uploads are stored as-is and optimized by the image worker
+        # Editor uploads already optimized are linked in their optimized form
+        self.content = replace_editor_uploads(self.content)
         
-        super().save(*args, **kwargs)
+        # New uploads are stored under their content hash; identical content
+        # processed before is reused, anything else is queued for the worker
+        queue_digest = None
+        if self.featured_image and not self.featured_image._committed:
+            digest, asset = store_upload(self, self.featured_image)
+            self.featured_image_variants = asset.variants if asset else []
+            # Content first processed as an editor upload has no variants yet
+            queue_digest = None if asset and asset.variants else digest
+        elif not self.featured_image:
+            self.featured_image_variants = []
+        
+        # The row and its image job are written together, so a failed save
+        # never leaves a job behind and a saved upload is always queued
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(BlogPost, instance=self)):
+            # Missing slugs are allocated from the title, unique in one query
+            save_with_unique_slug(self, self.title, super().save, *args, **kwargs)
+            
+            if queue_digest:
+                ImageJob.objects.create(
+                    kind=ImageJob.KIND_FEATURED_IMAGE,
+                    object_id=self.pk,
+                    original_path=self.featured_image.name,
+                    sha256=queue_digest,
+                )
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the published listing (see blog.pagination)
+            models.Index(fields=['published', 'position', '-created_at', '-id'], name='blog_post_listing_keyset'),
+        ]
 
 class BlogImage(models.Model):
     post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='blog_images/')
+    # Responsive copies filled in by the image worker: [{format, width, height, name}]
+    variants = models.JSONField(default=list, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Moved by the image worker's swap too, so post validators see it
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Image for {self.post.title}"
 
     def save(self, *args, **kwargs):
-        """Optimize image on save"""
-        if self.image and hasattr(self.image, '_file'):
-            try:
-                optimized_image = optimize_blog_image(self.image)
-                if optimized_image:
-                    self.image.save(
-                        optimized_image.name,
-                        optimized_image,
-                        save=False  # Don't trigger recursive save
-                    )
-                    logger.info(f"Optimized blog image: {optimized_image.name}")
-            except Exception as e:
-                logger.error(f"Error optimizing blog image: {str(e)}")
+        """Store new uploads by content hash and queue them for the image worker"""
+        queue_digest = None
+        if self.image and not self.image._committed:
+            digest, asset = store_upload(self, self.image)
+            self.variants = asset.variants if asset else []
+            queue_digest = None if asset and asset.variants else digest
         
-        super().save(*args, **kwargs)
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(BlogImage, instance=self)):
+            super().save(*args, **kwargs)
+            
+            if queue_digest:
+                ImageJob.objects.create(
+                    kind=ImageJob.KIND_BLOG_IMAGE,
+                    object_id=self.pk,
+                    original_path=self.image.name,
+                    sha256=queue_digest,
+                )
+
+# Digits of each zero-padded id in a comment path: fixed-width segments make
+# ``ORDER BY path`` list a thread depth-first in reply order
+COMMENT_PATH_WIDTH = 10
+
+def comment_path(parent_path, comment_id):
+    """Materialized path of a comment below a parent path ('' for roots)"""
+    segment = f"{comment_id:0{COMMENT_PATH_WIDTH}d}"
+    return f"{parent_path}/{segment}" if parent_path else segment
+
+def _next_id(model, using):
+    """
+    Draw the next primary key from the table's sequence so it is known
+    before the INSERT; None on databases without sequences
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, %s))",
+            [model._meta.db_table, model._meta.pk.column],
+        )
+        return cursor.fetchone()[0]
 
-class Comment(models.Model):
+class Comment(StoredCountersMixin, models.Model):
     post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='comments', db_index=True)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies', db_index=True)
     author_name = models.CharField(max_length=100, blank=True, null=True)
@@ -239,11 +315,24 @@ class Comment(models.Model):
     admin_reply = models.TextField(null=True, blank=True)
     # New fields for nested comments
     level = models.IntegerField(default=0, db_index=True)
-    path = models.CharField(max_length=255, blank=True, db_index=True)
+    # Zero-padded ids from the root down, e.g. "0000000012/0000000045"
+    path = models.CharField(max_length=1024, blank=True)
+    # Stored counters maintained by blog.utils.counters
+    approved_reply_count = models.PositiveIntegerField(default=0, editable=False)
+    like_count = models.PositiveIntegerField(default=0, editable=False)
+
+    COUNTER_FIELDS = ('approved_reply_count', 'like_count')
 
     def __str__(self):
         return f"Comment by {self.author_name} on {self.post.title}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored parent to detect moves on save
+        instance._loaded_parent_id = instance.__dict__.get('parent_id')
+        return instance
+    
     @property
     def is_reply(self):
         """Check if this comment is a reply to another comment"""
@@ -255,41 +344,57 @@ class Comment(models.Model):
         
     def get_replies_count(self):
         """Get count of approved replies"""
-        return self.replies.filter(approved=True, is_trash=False).count()
+        return self.approved_reply_count
+    
+    def _parent_position(self):
+        """Get the (path, level) of the parent, ('', -1) for root comments"""
+        if self.parent_id is None:
+            return '', -1
+        if Comment.parent.is_cached(self) and self.parent is not None:
+            return self.parent.path, self.parent.level
+        return Comment.objects.filter(pk=self.parent_id).values_list('path', 'level').get()
     
     def save(self, *args, **kwargs):
-        # Calculate the level based on parent
-        if self.parent:
-            self.level = self.parent.level + 1
-            
-            # Generate path for efficient querying
-            if self.parent.path:
-                if self.id:
-                    self.path = f"{self.parent.path}/{self.id}"
-                # For new comments (no ID yet), we'll update path after save
+        if not self._state.adding:
+            if self.parent_id != getattr(self, '_loaded_parent_id', self.parent_id):
+                self._move(*args, **kwargs)
             else:
-                if self.id:
-                    self.path = f"{self.parent.id}/{self.id}"
-                # For new comments (no ID yet), we'll update path after save
-        else:
-            self.level = 0
-            if self.id:
-                self.path = str(self.id)
-            # For new comments (no ID yet), we'll update path after save
+                super().save(*args, **kwargs)
+            return
         
-        # Call the "real" save method
-        super().save(*args, **kwargs)
+        parent_path, parent_level = self._parent_position()
+        self.level = parent_level + 1
+        if self.id is None:
+            using = kwargs.get('using') or router.db_for_write(Comment, instance=self)
+            self.id = _next_id(Comment, using)
+            if self.id is not None:
+                kwargs['force_insert'] = True
         
-        # Update path after save to include this comment's ID if needed
-        if not self.path and self.id:
-            if self.parent and self.parent.path:
-                self.path = f"{self.parent.path}/{self.id}"
-            elif self.parent:
-                self.path = f"{self.parent.id}/{self.id}"
-            else:
-                self.path = str(self.id)
-            # Update only the path field to avoid recursion
+        if self.id is not None:
+            # The path is written with the row, in a single INSERT
+            self.path = comment_path(parent_path, self.id)
+            super().save(*args, **kwargs)
+        else:
+            # Without a sequence the id is only known after the INSERT
+            super().save(*args, **kwargs)
+            self.path = comment_path(parent_path, self.id)
             Comment.objects.filter(id=self.id).update(path=self.path)
+        self._loaded_parent_id = self.parent_id
+    
+    def _move(self, *args, **kwargs):
+        """Save a comment moved to another parent and re-root its replies"""
+        old_path, old_level = self.path, self.level
+        parent_path, parent_level = self._parent_position()
+        self.level = parent_level + 1
+        self.path = comment_path(parent_path, self.id)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'parent', 'level', 'path'}
+        super().save(*args, **kwargs)
+        Comment.objects.filter(path__startswith=f"{old_path}/").update(
+            path=Concat(models.Value(self.path), Substr('path', len(old_path) + 1)),
+            level=models.F('level') + (self.level - old_level),
+        )
+        self._loaded_parent_id = self.parent_id
 
     class Meta:
         ordering = ['-created_at']
@@ -299,7 +404,10 @@ class Comment(models.Model):
             models.Index(fields=['parent']),
             models.Index(fields=['approved', 'parent']),
             models.Index(fields=['level']),
-            models.Index(fields=['path']),
+            # Threads of a post in display order (ORDER BY path)
+            models.Index(fields=['post', 'path'], name='blog_comment_thread_order'),
+            # Subtree lookups (path LIKE 'prefix/%') whatever the collation
+            models.Index(fields=['path'], name='blog_comment_path_prefix', opclasses=['varchar_pattern_ops']),
         ] 
 
 class CommentLike(models.Model):
@@ -312,4 +420,138 @@ class CommentLike(models.Model):
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"{self.user_name} liked comment {self.comment.id}"
\ No newline at end of file
+        return f"{self.user_name} liked comment {self.comment.id}"
+
+class PostSearchDocument(models.Model):
+    """
+    Plain-text search document maintained for each blog post.
+    
+    The database-specific full-text index (a weighted tsvector column with a
+    GIN index on PostgreSQL, an FTS5 table on SQLite) is created by migration
+    0013 and kept in sync from these rows; see blog.utils.search.
+    """
+    post = models.OneToOneField(BlogPost, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    title = models.CharField(max_length=200)
+    excerpt = models.TextField(blank=True)
+    body = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Search document for {self.title}"
+
+class RelatedPost(models.Model):
+    """
+    Precomputed related-post entry, maintained by blog.utils.related_posts
+    """
+    post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='related_entries')
+    related = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='related_from')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        ordering = ['post', 'rank']
+        unique_together = ('post', 'related')
+        indexes = [
+            models.Index(fields=['post', 'rank']),
+        ]
+    
+    def __str__(self):
+        return f"{self.related_id} related to {self.post_id} ({self.score:.3f})"
+
+class RelatedPostUpdate(models.Model):
+    """
+    Post whose related-posts rows need refreshing, processed by the
+    process_related_posts worker (see blog.utils.related_posts)
+    """
+    # Not a foreign key: deleted posts are queued too
+    post_id = models.BigIntegerField(unique=True)
+    # Posts that listed a deleted post, whose rows are gone once it is deleted
+    affected_ids = models.JSONField(default=list, blank=True)
+    queued_at = models.DateTimeField(default=timezone.now, db_index=True)
+    
+    def __str__(self):
+        return f"Related posts update for post {self.post_id}"
+
+class PostRender(models.Model):
+    """
+    Pre-rendered JSON payload of a post detail response with its compressed
+    variants, maintained by blog.utils.render_store
+    """
+    post = models.OneToOneField(BlogPost, on_delete=models.CASCADE, primary_key=True, related_name='render')
+    payload = models.BinaryField()
+    gzip_payload = models.BinaryField()
+    brotli_payload = models.BinaryField(null=True, blank=True)
+    rendered_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Render of post {self.post_id} ({len(self.payload)} bytes)"
+
+class ImageJob(models.Model):
+    """
+    Queued optimization of an uploaded image, processed by the
+    process_image_jobs worker (see blog.utils.image_queue)
+    """
+    KIND_FEATURED_IMAGE = 'featured_image'
+    KIND_BLOG_IMAGE = 'blog_image'
+    KIND_EDITOR_UPLOAD = 'editor_upload'
+    KIND_CHOICES = [
+        (KIND_FEATURED_IMAGE, 'Featured image'),
+        (KIND_BLOG_IMAGE, 'Blog image'),
+        (KIND_EDITOR_UPLOAD, 'Editor upload'),
+    ]
+    
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_SKIPPED = 'skipped'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+        (STATUS_SKIPPED, 'Skipped'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # BlogPost id for featured images, BlogImage id for blog images
+    object_id = models.PositiveIntegerField(null=True, blank=True)
+    # Storage path of the uploaded original, kept until the optimized file is swapped in
+    original_path = models.CharField(max_length=255)
+    # SHA-256 of the original, used to reuse the output of identical uploads
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    optimized_path = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+            models.Index(fields=['kind', 'object_id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.original_path} ({self.status})"
+
+class MediaAsset(models.Model):
+    """
+    Optimized output of an uploaded original, keyed by the original's
+    SHA-256 so identical uploads are stored and processed once
+    (see blog.utils.media_store)
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    # Content-addressed name of the optimized file
+    name = models.CharField(max_length=255)
+    optimized_sha256 = models.CharField(max_length=64, blank=True)
+    size = models.PositiveIntegerField(default=0)
+    variants = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.sha256[:12]} -> {self.name}"
@@ -1,15 +1,301 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import hashlib
+import json
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
+from .utils import response_cache
+from .utils.response_cache import POSTS_SCOPE
 
-class BlogPostPagination(PageNumberPagination):
+COUNT_KEY_PREFIX = 'blog:count'
+
+
+def cached_count(queryset, scopes):
+    """
+    Count a queryset, caching the result per filter combination
+
+    The cache key is the count query itself plus the versions of the
+    response cache scopes it depends on, so any change that bumps one of
+    them recounts.
+
+    Args:
+        queryset: Rows to count
+        scopes (list): Response cache scopes invalidating the count
+
+    Returns:
+        int: Number of rows
+    """
+    sql, params = queryset.order_by().query.sql_with_params()
+    versions = response_cache.get_versions(scopes)
+    digest = hashlib.md5(f"{sql}|{params}|{sorted(versions.items())}".encode('utf-8')).hexdigest()
+    key = f"{COUNT_KEY_PREFIX}:{digest}"
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, response_cache.get_timeout())
+    return count
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator whose total count is shared by every page of a listing
+    """
+    count_scopes = ()
+
+    @cached_property
+    def count(self):
+        if not self.count_scopes or not response_cache.is_enabled():
+            return super().count
+        return cached_count(self.object_list, self.count_scopes)
+
+
+class PostPaginator(CachedCountPaginator):
+    count_scopes = (POSTS_SCOPE,)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination over a fixed, unique ordering
+
+    Pages are selected with a WHERE condition on the ordering values of the
+    last row seen instead of an OFFSET, so deep pages cost the same as the
+    first one and rows inserted meanwhile never shift a page. Cursors are
+    opaque tokens; the total count is only computed when asked for with
+    ``?count=true``.
+    """
+    # Must end with a unique field so every row has a distinct position
+    ordering = ('-created_at', '-id')
+    page_size = 10
+    page_size_query_param = 'limit'
+    max_page_size = 50
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    count_by_default = False
+    invalid_cursor_message = 'Invalid cursor'
+    # Response cache scopes the total count is cached under (none: not cached)
+    count_scopes = ()
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def _fields(self, queryset):
+        """(name, field, descending) of each ordering column"""
+        fields = []
+        for name in self.ordering:
+            column = name.lstrip('-')
+            if column in queryset.query.annotations:
+                # e.g. the search rank, filtered on like any column
+                field = queryset.query.annotations[column].output_field
+            else:
+                field = queryset.model._meta.get_field(column)
+            fields.append((column, field, name.startswith('-')))
+        return fields
+
+    def encode_cursor(self, row, reverse=False):
+        values = []
+        for name, field, _ in self.fields:
+            value = getattr(row, getattr(field, 'attname', None) or name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        token = json.dumps({'k': values, 'r': int(reverse)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(token.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            token = json.loads(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+            if len(token['k']) != len(self.fields):
+                raise ValueError(encoded)
+            values = [field.to_python(value) for (_, field, _), value in zip(self.fields, token['k'])]
+            if any(value is None for value in values):
+                raise ValueError(encoded)
+            return values, bool(token.get('r'))
+        except (TypeError, ValueError, KeyError, AttributeError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _after(self, values, reverse):
+        """Condition selecting the rows ordered after (or before) a position"""
+        condition = Q()
+        equal = Q()
+        for (name, _, descending), value in zip(self.fields, values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.queryset = queryset
+        self.fields = self._fields(queryset)
+        self.page_size = self.get_page_size(request)
+        values, reverse = self.decode_cursor(request)
+
+        ordering = list(self.ordering)
+        if reverse:
+            ordering = [name[1:] if name.startswith('-') else f"-{name}" for name in ordering]
+        if values is not None:
+            queryset = queryset.filter(self._after(values, reverse))
+        rows = list(queryset.order_by(*ordering)[:self.page_size + 1])
+
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+        # Moving forward from a cursor means there is a page before it, and
+        # moving back from one means there is a page after it
+        self.has_next = has_more if not reverse else values is not None
+        self.has_previous = has_more if reverse else values is not None
+        self.page = rows
+        return rows
+
+    def _link(self, row, reverse):
+        url = remove_query_param(self.request.build_absolute_uri(), 'page')
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(row, reverse))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self._link(self.page[0], reverse=True)
+
+    def get_count(self):
+        """Total rows of the listing, or None unless the client asked for it"""
+        default = 'true' if self.count_by_default else 'false'
+        if self.request.query_params.get(self.count_query_param, default).lower() != 'true':
+            return None
+        if self.count_scopes and response_cache.is_enabled():
+            return cached_count(self.queryset, self.count_scopes)
+        return self.queryset.count()
+
+    def get_paginated_response(self, data):
+        response = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+            'page_size': self.page_size,
+        }
+        count = self.get_count()
+        if count is not None:
+            response['count'] = count
+        return Response(response)
+
+
+class PostKeysetPagination(KeysetPagination):
+    ordering = ('position', '-created_at', '-id')
+    page_size = 9
+    count_scopes = (POSTS_SCOPE,)
+
+
+class CommentKeysetPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class ReplyPagination(KeysetPagination):
+    """
+    Keyset pages of a reply subtree in thread order (depth first, replies
+    oldest first), which the fixed-width comment paths sort in
+    """
+    ordering = ('path',)
+    page_size = 20
+    max_page_size = 100
+
+
+class AdminCommentPagination(CommentKeysetPagination):
+    """
+    Keyset pages of the comment moderation listing, with the total count
+    unless ``?count=false``
+    """
+    page_size = 100
+    max_page_size = 500
+    count_by_default = True
+
+
+class KeysetModeMixin:
+    """
+    Switch a page number pagination class to keyset pagination when the
+    request opts in with ``?pagination=cursor`` or carries a cursor
+
+    Cursor pages keep the view's ordering (a search stays ordered by
+    relevance), with the primary key added to make it unique. Orderings a
+    keyset cannot follow (expressions, related fields) keep page numbers.
+    """
+    keyset_class = KeysetPagination
+    mode_query_param = 'pagination'
+
+    def uses_keyset(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.keyset_class.cursor_query_param in request.query_params
+        )
+
+    def keyset_ordering(self, queryset):
+        """
+        The queryset's ordering made unique with the primary key
+
+        Returns:
+            tuple: Ordering for the keyset, or None if it cannot be keyed
+        """
+        query = queryset.query
+        if query.order_by:
+            ordering = list(query.order_by)
+        elif query.default_ordering and queryset.model._meta.ordering:
+            ordering = list(queryset.model._meta.ordering)
+        else:
+            return self.keyset_class.ordering
+
+        if not all(isinstance(name, str) and '__' not in name and '?' not in name for name in ordering):
+            return None
+        pk_name = queryset.model._meta.pk.name
+        ordering = [f"{'-' if name.startswith('-') else ''}{pk_name}" if name.lstrip('-') == 'pk' else name
+                    for name in ordering]
+        if ordering[-1].lstrip('-') != pk_name:
+            ordering.append(f"-{pk_name}" if ordering[-1].startswith('-') else pk_name)
+        return tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.uses_keyset(request):
+            ordering = self.keyset_ordering(queryset)
+            if ordering is not None:
+                self.keyset = self.keyset_class()
+                self.keyset.ordering = ordering
+        if self.keyset is not None:
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class BlogPostPagination(KeysetModeMixin, PageNumberPagination):
     """
     Custom pagination class for blog posts that supports dynamic page size
     """
     page_size = 9  # Default to 9 posts per page
     page_size_query_param = 'limit'  # Allow client to set page size with ?limit=X
     max_page_size = 50  # Maximum allowed page size
-    
+    django_paginator_class = PostPaginator  # Count shared by all pages of a filter
+    keyset_class = PostKeysetPagination
+
     def get_page_size(self, request):
         """
         Return the page size for this pagination instance.
@@ -22,11 +308,13 @@ class BlogPostPagination(PageNumberPagination):
             except (KeyError, ValueError):
                 pass
         return self.page_size
-    
+
     def get_paginated_response(self, data):
         """
         Return a paginated style Response object for the given output data.
         """
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
         return Response({
             'count': self.page.paginator.count,
             'next': self.get_next_link(),
@@ -35,4 +323,11 @@ class BlogPostPagination(PageNumberPagination):
             'total_pages': self.page.paginator.num_pages,
             'current_page': self.page.number,
             'page_size': self.page.paginator.per_page
-        })
\ No newline at end of file
+        })
+
+
+class CommentPagination(KeysetModeMixin, PageNumberPagination):
+    """
+    Page number pagination for comments with an opt-in keyset mode
+    """
+    keyset_class = CommentKeysetPagination
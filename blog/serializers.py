@@ -2,6 +2,8 @@ from rest_framework import serializers
 from .models import BlogPost, BlogImage, Comment, Category
 from django.contrib.auth.models import User
 from django.conf import settings
+from .utils import like_buffer
+from .utils.comment_tree import build_comment_tree
 
 def ensure_https_url(url):
     """
@@ -11,6 +13,27 @@ def ensure_https_url(url):
         return url.replace('http://', 'https://')
     return url
 
+def build_image_sources(field_file, variants, request=None):
+    """
+    Group the stored variants of an image into srcset-ready sources
+
+    Returns a list of ``{'type': 'image/avif', 'srcset': '<url> 320w, ...'}``
+    ordered by IMAGE_VARIANT_FORMATS, ready for <picture><source> markup
+    """
+    if not field_file or not variants:
+        return []
+    
+    candidates = {}
+    for variant in sorted(variants, key=lambda variant: variant['width']):
+        url = field_file.storage.url(variant['name'])
+        if not url.startswith('http') and request:
+            url = request.build_absolute_uri(url)
+        candidates.setdefault(variant['format'], []).append(f"{ensure_https_url(url)} {variant['width']}w")
+    
+    preference = [fmt.lower() for fmt in settings.IMAGE_VARIANT_FORMATS]
+    formats = sorted(candidates, key=lambda fmt: preference.index(fmt) if fmt in preference else len(preference))
+    return [{'type': f"image/{fmt}", 'srcset': ', '.join(candidates[fmt])} for fmt in formats]
+
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for the User model"""
     
@@ -48,12 +71,8 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['slug', 'created_at', 'updated_at']
     
     def get_post_count(self, obj):
-        """Get the post count from annotation or calculate it"""
-        # If the queryset has annotation, use it
-        if hasattr(obj, 'post_count'):
-            return obj.post_count
-        # Otherwise calculate it
-        return obj.get_post_count()
+        """Get the stored number of published posts"""
+        return obj.published_post_count
         
     def to_representation(self, instance):
         """Ensure we return a proper representation even if instance is None"""
@@ -63,10 +82,14 @@ class CategorySerializer(serializers.ModelSerializer):
 
 class BlogImageSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = BlogImage
-        fields = ['id', 'image', 'image_url', 'created_at']
+        fields = ['id', 'image', 'image_url', 'srcset', 'created_at']
+    
+    def get_srcset(self, obj):
+        return build_image_sources(obj.image, obj.variants, self.context.get('request'))
     
     def get_image_url(self, obj):
         if obj.image:
@@ -146,20 +169,24 @@ class CommentSerializer(serializers.ModelSerializer):
         nested_context = self.context.copy()
         nested_context['current_depth'] = current_depth + 1
         
-        # Get approved replies and serialize them
-        replies = obj.replies.filter(approved=True, is_trash=False).order_by('created_at')
-        
-        # Apply pagination if needed
-        limit = self.context.get('replies_limit', 5)
-        if limit and replies.count() > limit:
-            replies = replies[:limit]
+        # Use the replies linked by the comment tree builder if available
+        if hasattr(obj, 'tree_replies'):
+            replies = obj.tree_replies
+        else:
+            # Get approved replies and serialize them
+            replies = obj.replies.filter(approved=True, is_trash=False).order_by('created_at')
+            
+            # Apply pagination if needed
+            limit = self.context.get('replies_limit', 5)
+            if limit and obj.approved_reply_count > limit:
+                replies = replies[:limit]
         
         serializer = CommentSerializer(replies, many=True, context=nested_context)
         return serializer.data
     
     def get_reply_count(self, obj):
-        """Get count of approved replies"""
-        return obj.replies.filter(approved=True, is_trash=False).count()
+        """Get the stored count of approved replies"""
+        return obj.approved_reply_count
     
     def get_has_more_replies(self, obj):
         """Check if there are more replies than what was returned"""
@@ -171,18 +198,46 @@ class CommentSerializer(serializers.ModelSerializer):
         if not limit:
             return False
             
-        return obj.replies.filter(approved=True, is_trash=False).count() > limit
+        return self.get_reply_count(obj) > limit
     
     def get_like_count(self, obj):
-        """Get the number of likes for this comment"""
-        return obj.likes.count()
+        """Get the stored number of likes for this comment, plus buffered ones"""
+        return max(obj.like_count + like_buffer.pending_delta(obj.id), 0)
     
     def get_liked_by(self, obj):
-        """Get the names of users who liked this comment"""
-        return list(obj.likes.values_list('user_name', flat=True))
+        """Get the names of users who liked this comment, buffered likes included"""
+        if hasattr(obj, 'tree_liked_by'):
+            return obj.tree_liked_by
+        names = list(obj.likes.values_list('user_name', flat=True))
+        return like_buffer.apply_pending_likers({obj.id: names}, [obj.id])[obj.id]
+
+class CommentModerationSerializer(serializers.ModelSerializer):
+    """
+    Flat comment rows for the moderation listing: no nested replies or like
+    names, counts read from the stored counters and the post from a join
+    (use with select_related('post'))
+    """
+    post_title = serializers.SerializerMethodField(read_only=True)
+    reply_count = serializers.IntegerField(source='approved_reply_count', read_only=True)
+    like_count = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        model = Comment
+        fields = ['id', 'post', 'post_title', 'parent', 'author_name', 'author_email',
+                 'author_website', 'content', 'approved', 'is_trash',
+                 'created_at', 'admin_reply', 'reply_count', 'level', 'path', 'like_count']
+        read_only_fields = fields
+    
+    def get_post_title(self, obj):
+        return {
+            'id': obj.post.id,
+            'title': obj.post.title,
+            'slug': obj.post.slug
+        }
 
 class BlogPostListSerializer(serializers.ModelSerializer):
     featured_image_url = serializers.SerializerMethodField()
+    featured_image_srcset = serializers.SerializerMethodField()
     comment_count = serializers.SerializerMethodField()
     category = CategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all(), source='category', required=False, allow_null=True)
@@ -194,12 +249,16 @@ class BlogPostListSerializer(serializers.ModelSerializer):
         if instance.category is None:
             representation['category'] = None
         
+        # Include relevance information for search results
+        if hasattr(instance, 'search_rank'):
+            representation['search_rank'] = instance.search_rank
+            representation['search_highlight'] = instance.search_highlight
         
         return representation
     
     class Meta:
         model = BlogPost
-        fields = ['id', 'title', 'slug', 'excerpt', 'read_time', 'featured_image', 'featured_image_url', 
+        fields = ['id', 'title', 'slug', 'excerpt', 'read_time', 'featured_image', 'featured_image_url', 'featured_image_srcset',
                  'category', 'category_id', 'category_name', 'published', 'position', 'created_at', 'comment_count',
                  'meta_title', 'meta_description']
     
@@ -220,6 +279,9 @@ class BlogPostListSerializer(serializers.ModelSerializer):
                 return ensure_https_url(url)
             return ensure_https_url(url)
         return None
+    
+    def get_featured_image_srcset(self, obj):
+        return build_image_sources(obj.featured_image, obj.featured_image_variants, self.context.get('request'))
         
     def validate_category_name(self, value):
         if value:
@@ -230,7 +292,7 @@ class BlogPostListSerializer(serializers.ModelSerializer):
         return None
     
     def get_comment_count(self, obj):
-        return obj.comments.filter(approved=True).count()
+        return obj.approved_comment_count
         
     def to_internal_value(self, data):
         # Debug print
@@ -270,6 +332,7 @@ class BlogPostSerializer(serializers.ModelSerializer):
     images = BlogImageSerializer(many=True, read_only=True)
     comments = serializers.SerializerMethodField()
     featured_image_url = serializers.SerializerMethodField()
+    featured_image_srcset = serializers.SerializerMethodField()
     category = CategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all(), source='category', required=False, allow_null=True)
     category_name = serializers.CharField(write_only=True, required=False, allow_null=True)
@@ -303,7 +366,7 @@ class BlogPostSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = BlogPost
-        fields = ['id', 'title', 'slug', 'content', 'excerpt', 'read_time', 'featured_image', 'featured_image_url', 'images', 'comments',
+        fields = ['id', 'title', 'slug', 'content', 'excerpt', 'read_time', 'featured_image', 'featured_image_url', 'featured_image_srcset', 'images', 'comments',
                  'category', 'category_id', 'category_name', 'published', 'featured', 'position', 'created_at', 'updated_at',
                  'meta_title', 'meta_description']
     
@@ -325,19 +388,13 @@ class BlogPostSerializer(serializers.ModelSerializer):
             return ensure_https_url(url)
         return None
     
+    def get_featured_image_srcset(self, obj):
+        return build_image_sources(obj.featured_image, obj.featured_image_variants, self.context.get('request'))
+    
     def get_comments(self, obj):
-        # Get only approved root comments (no parent)
-        approved_comments = obj.comments.filter(approved=True, parent__isnull=True)
-        
-        # Set up context for nested serialization
-        context = self.context.copy()
-        context.update({
-            'max_depth': 3,  # Show up to 3 levels of nested comments
-            'current_depth': 0,
-            'replies_limit': 5  # Limit to 5 replies per comment
-        })
-        
-        return CommentSerializer(approved_comments, many=True, context=context).data
+        # Load the whole approved thread in one query and nest it in memory,
+        # showing up to 3 levels of nested comments and 5 replies per comment
+        return build_comment_tree(obj, context=self.context, max_depth=3, replies_limit=5)
     
         
     def to_internal_value(self, data):
@@ -0,0 +1,259 @@
+"""
+Signal handlers that keep derived blog data in sync with the models
+"""
+
+import logging
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import BlogImage, BlogPost, Category, Comment, CommentLike, RelatedPost
+from .utils import counters, response_cache
+from .utils.render_store import drop_category_renders, refresh_renders
+from .utils.related_posts import queue_related_update
+from .utils.search import index_post
+
+logger = logging.getLogger(__name__)
+
+
+# Fields that feed the search document and the related-posts vectors
+SEARCH_FIELDS = {'title', 'excerpt', 'content'}
+RELATED_FIELDS = SEARCH_FIELDS | {'category', 'published'}
+
+
+def _fields_changed(update_fields, fields):
+    """Check whether a save may have touched any of the given fields"""
+    return update_fields is None or bool(fields & set(update_fields))
+
+
+@receiver(post_save, sender=BlogPost, dispatch_uid='blog_index_post_for_search')
+def update_search_document(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Refresh the full-text search document whenever a post is saved"""
+    if raw or not _fields_changed(update_fields, SEARCH_FIELDS):
+        return
+    try:
+        index_post(instance)
+    except Exception as e:
+        logger.error(f"Error indexing post {instance.pk} for search: {str(e)}")
+
+
+@receiver(post_save, sender=BlogPost, dispatch_uid='blog_update_related_posts')
+def update_related_posts_on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Queue the related-posts rows affected by a saved post for the worker"""
+    if raw or not _fields_changed(update_fields, RELATED_FIELDS):
+        return
+    queue_related_update(instance.pk)
+
+
+@receiver(pre_delete, sender=BlogPost, dispatch_uid='blog_collect_related_posts')
+def collect_related_posts_on_delete(sender, instance, **kwargs):
+    """Remember which posts list a post before its index rows cascade away"""
+    instance._related_from_ids = list(
+        RelatedPost.objects.filter(related_id=instance.pk).values_list('post_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=BlogPost, dispatch_uid='blog_update_related_posts_on_delete')
+def update_related_posts_on_delete(sender, instance, **kwargs):
+    """Queue the refill of the related-posts rows of posts that listed a deleted post"""
+    affected_ids = getattr(instance, '_related_from_ids', [])
+    if affected_ids:
+        queue_related_update(instance.pk, affected_ids)
+
+
+def _post_slug(instance):
+    """Get the slug of the post a comment or image belongs to"""
+    if type(instance).post.is_cached(instance):
+        return instance.post.slug
+    return BlogPost.objects.filter(pk=instance.post_id).values_list('slug', flat=True).first()
+
+
+@receiver(post_init, sender=BlogPost, dispatch_uid='blog_remember_post_slug')
+def remember_post_slug(sender, instance, **kwargs):
+    """Keep the loaded slug so responses cached under it can be invalidated"""
+    instance._cached_slug = instance.__dict__.get('slug')
+
+
+@receiver(post_init, sender=Comment, dispatch_uid='blog_remember_comment_approval')
+def remember_comment_approval(sender, instance, **kwargs):
+    """Keep the loaded approval state to detect approved-count changes"""
+    instance._cached_approved = instance.__dict__.get('approved', False)
+
+
+def _comment_counted_in(instance):
+    """Get the (post_id, parent_id) counters a comment counts towards, if any"""
+    state = instance.__dict__
+    if counters.is_counted(state.get('approved'), state.get('is_trash')):
+        return state.get('post_id'), state.get('parent_id')
+    return None
+
+
+def _post_counted_in(instance):
+    """Get the category whose published post counter includes a post, if any"""
+    state = instance.__dict__
+    return state.get('category_id') if state.get('published') else None
+
+
+@receiver(post_init, sender=Comment, dispatch_uid='blog_remember_comment_counters')
+def remember_comment_counters(sender, instance, **kwargs):
+    """Keep the loaded counted state to adjust the counters on save"""
+    instance._counted_in = _comment_counted_in(instance)
+
+
+@receiver(post_init, sender=BlogPost, dispatch_uid='blog_remember_post_category_counter')
+def remember_post_category_counter(sender, instance, **kwargs):
+    """Keep the loaded counted category to adjust its counter on save"""
+    instance._counted_category_id = _post_counted_in(instance)
+
+
+@receiver(post_save, sender=Comment, dispatch_uid='blog_update_comment_counters_on_save')
+def update_comment_counters_on_save(sender, instance, created=False, raw=False, **kwargs):
+    """Move a saved comment in or out of its post and parent counters"""
+    if raw:
+        return
+    old = None if created else getattr(instance, '_counted_in', None)
+    new = _comment_counted_in(instance)
+    if old != new:
+        changes = [(*new, 1)] if new else []
+        if old:
+            changes.append((*old, -1))
+        counters.apply_comment_changes(changes)
+    instance._counted_in = new
+
+
+@receiver(post_delete, sender=Comment, dispatch_uid='blog_update_comment_counters_on_delete')
+def update_comment_counters_on_delete(sender, instance, **kwargs):
+    """Take a deleted comment out of its post and parent counters"""
+    counted_in = _comment_counted_in(instance)
+    if counted_in:
+        counters.apply_comment_changes([(*counted_in, -1)])
+
+
+@receiver(post_save, sender=CommentLike, dispatch_uid='blog_update_like_count_on_save')
+def update_like_count_on_save(sender, instance, created=False, raw=False, **kwargs):
+    """Count a new like on its comment"""
+    if created and not raw:
+        counters.adjust_like_count(instance.comment_id, 1)
+
+
+@receiver(post_delete, sender=CommentLike, dispatch_uid='blog_update_like_count_on_delete')
+def update_like_count_on_delete(sender, instance, **kwargs):
+    """Uncount a removed like"""
+    counters.adjust_like_count(instance.comment_id, -1)
+
+
+@receiver(post_save, sender=BlogPost, dispatch_uid='blog_update_category_counter_on_save')
+def update_category_counter_on_save(sender, instance, created=False, raw=False, **kwargs):
+    """Move a saved post between published category counters"""
+    if raw:
+        return
+    old = None if created else getattr(instance, '_counted_category_id', None)
+    new = _post_counted_in(instance)
+    counters.adjust_category_post_count(old, new)
+    instance._counted_category_id = new
+
+
+@receiver(post_delete, sender=BlogPost, dispatch_uid='blog_update_category_counter_on_delete')
+def update_category_counter_on_delete(sender, instance, **kwargs):
+    """Take a deleted post out of its category counter"""
+    counters.adjust_category_post_count(_post_counted_in(instance), None)
+
+
+@receiver(post_save, sender=BlogPost, dispatch_uid='blog_invalidate_post_cache_on_save')
+@receiver(post_delete, sender=BlogPost, dispatch_uid='blog_invalidate_post_cache_on_delete')
+def invalidate_post_cache(sender, instance, **kwargs):
+    """A post change affects its detail, every listing and category counts"""
+    scopes = {response_cache.post_scope(instance.slug), response_cache.POSTS_SCOPE, response_cache.CATEGORIES_SCOPE}
+    if getattr(instance, '_cached_slug', None):
+        scopes.add(response_cache.post_scope(instance._cached_slug))
+    response_cache.bump(*scopes)
+    instance._cached_slug = instance.slug
+
+
+@receiver(post_save, sender=Category, dispatch_uid='blog_invalidate_category_cache_on_save')
+@receiver(post_delete, sender=Category, dispatch_uid='blog_invalidate_category_cache_on_delete')
+def invalidate_category_cache(sender, instance, **kwargs):
+    """Categories are nested in post details and listings"""
+    response_cache.bump(
+        response_cache.category_scope(instance.pk),
+        response_cache.CATEGORIES_SCOPE,
+        response_cache.POSTS_SCOPE,
+    )
+
+
+@receiver(post_save, sender=Comment, dispatch_uid='blog_invalidate_comment_cache_on_save')
+@receiver(post_delete, sender=Comment, dispatch_uid='blog_invalidate_comment_cache_on_delete')
+def invalidate_comment_cache(sender, instance, **kwargs):
+    """
+    Comments are shown in their post's detail; listings only show approved
+    counts, so they are invalidated only when an approved comment changes
+    """
+    scopes = []
+    slug = _post_slug(instance)
+    if slug is not None:
+        scopes.append(response_cache.post_scope(slug))
+    if instance.approved or getattr(instance, '_cached_approved', False):
+        scopes.append(response_cache.POSTS_SCOPE)
+        # Only approved comments are part of the stored post render
+        _schedule_render(instance.post_id)
+    response_cache.bump(*scopes)
+    instance._cached_approved = instance.approved
+
+
+@receiver(post_save, sender=BlogImage, dispatch_uid='blog_invalidate_image_cache_on_save')
+@receiver(post_delete, sender=BlogImage, dispatch_uid='blog_invalidate_image_cache_on_delete')
+def invalidate_image_cache(sender, instance, **kwargs):
+    """Images are listed in their post's detail"""
+    slug = _post_slug(instance)
+    if slug is not None:
+        response_cache.bump(response_cache.post_scope(slug))
+
+
+@receiver(post_save, sender=CommentLike, dispatch_uid='blog_invalidate_like_cache_on_save')
+@receiver(post_delete, sender=CommentLike, dispatch_uid='blog_invalidate_like_cache_on_delete')
+def invalidate_like_cache(sender, instance, raw=False, **kwargs):
+    """Like counts and names are shown in their post's detail"""
+    if raw:
+        return
+    post = BlogPost.objects.filter(comments__id=instance.comment_id).values('id', 'slug').first()
+    if post is not None:
+        response_cache.bump(response_cache.post_scope(post['slug']))
+        _schedule_render(post['id'])
+
+
+def _refresh_render(post_id):
+    try:
+        refresh_renders([post_id])
+    except Exception as e:
+        logger.error(f"Error rendering post {post_id}: {str(e)}")
+
+
+def _schedule_render(post_id):
+    if post_id is not None:
+        transaction.on_commit(lambda: _refresh_render(post_id))
+
+
+@receiver(post_save, sender=BlogPost, dispatch_uid='blog_render_post_on_save')
+def render_post_on_save(sender, instance, raw=False, **kwargs):
+    """Re-render the stored detail payload of a saved post"""
+    if not raw:
+        _schedule_render(instance.pk)
+
+
+@receiver(post_save, sender=Category, dispatch_uid='blog_drop_category_renders_on_save')
+@receiver(pre_delete, sender=Category, dispatch_uid='blog_drop_category_renders_on_delete')
+def drop_renders_on_category_change(sender, instance, raw=False, **kwargs):
+    """
+    Category changes can touch many posts, so their renders are dropped and
+    rebuilt lazily; on delete this runs before the posts are detached
+    """
+    if not raw:
+        drop_category_renders(instance.pk)
+
+
+@receiver(post_save, sender=BlogImage, dispatch_uid='blog_render_post_on_image_save')
+@receiver(post_delete, sender=BlogImage, dispatch_uid='blog_render_post_on_image_delete')
+def render_post_on_image_change(sender, instance, raw=False, **kwargs):
+    """Images are part of the stored post render"""
+    if not raw:
+        _schedule_render(instance.post_id)
@@ -0,0 +1,63 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from blog.models import BlogPost, Comment, CommentLike, PostRender
+
+
+class BulkModerationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('moderator', password='secret'))
+        self.post = BlogPost.objects.create(title="Moderated", content="Content", published=True)
+        self.pending = [Comment.objects.create(post=self.post, content=f"Pending {i}") for i in range(3)]
+        self.approved = Comment.objects.create(post=self.post, content="Approved", approved=True)
+
+    def bulk(self, **data):
+        return self.client.post('/api/comments/bulk/', data, format='json')
+
+    def test_approve_updates_changed_rows_only_and_refreshes_the_post(self):
+        detail = self.client.get(f'/api/posts/{self.post.slug}/')
+        before = Comment.objects.get(pk=self.approved.pk).updated_at
+        ids = [comment.pk for comment in self.pending[:2]] + [self.approved.pk]
+
+        # Select rows, update them and the post counter and look up slugs in a
+        # savepoint, then count
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(7):
+            response = self.bulk(action='approve', ids=ids)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.data['affected_ids']), ids[:2])
+        self.assertEqual(response.data['counts'], {'all': 4, 'pending': 1, 'approved': 3, 'trash': 0})
+        self.assertEqual(Comment.objects.get(pk=self.approved.pk).updated_at, before)
+        self.assertGreater(Comment.objects.get(pk=ids[0]).updated_at, before)
+
+        # The cached detail and the stored render both show the new comments
+        refreshed = self.client.get(f'/api/posts/{self.post.slug}/', HTTP_IF_NONE_MATCH=detail['ETag'])
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertIn(b'Pending 0', PostRender.objects.get(post=self.post).payload)
+
+    def test_filter_trash_and_delete_with_replies(self):
+        reply = Comment.objects.create(post=self.post, parent=self.approved, content="Reply", approved=True)
+        CommentLike.objects.create(comment=reply, user_name="fan")
+
+        response = self.bulk(action='trash', filter={'post': self.post.pk, 'approved': False})
+        self.assertEqual(sorted(response.data['affected_ids']), [comment.pk for comment in self.pending])
+        self.assertEqual(response.data['counts']['trash'], 3)
+
+        response = self.bulk(action='delete', ids=[self.approved.pk])
+        self.assertEqual(response.data['affected_ids'], [self.approved.pk])
+        self.assertFalse(Comment.objects.filter(pk__in=[self.approved.pk, reply.pk]).exists())
+        self.assertFalse(CommentLike.objects.exists())
+        self.assertEqual(response.data['counts'], {'all': 3, 'pending': 0, 'approved': 0, 'trash': 3})
+
+    def test_invalid_requests(self):
+        self.assertEqual(APIClient().post('/api/comments/bulk/', {'action': 'delete', 'ids': [1]}, format='json').status_code, 401)
+        self.assertEqual(self.bulk(action='publish', ids=[1]).status_code, 400)
+        self.assertEqual(self.bulk(action='delete').status_code, 400)
+        self.assertEqual(self.bulk(action='delete', filter={}).status_code, 400)
+        self.assertEqual(self.bulk(action='delete', filter={'content': 'x'}).status_code, 400)
+        self.assertEqual(self.bulk(action='delete', filter={'post': 'abc'}).status_code, 400)
+        self.assertEqual(Comment.objects.count(), 4)
@@ -0,0 +1,153 @@
+from django.test import TestCase
+
+from blog.models import BlogPost, Comment, CommentLike
+from blog.serializers import BlogPostSerializer, CommentSerializer
+from blog.utils.comment_tree import build_comment_tree
+
+
+class CommentTreeTestCase(TestCase):
+    def setUp(self):
+        self.post = BlogPost.objects.create(title="Thread Post", content="Test content", published=True)
+
+    def _add_thread(self, roots=2, replies=7, depth=5):
+        # Each root gets `replies` direct replies and a chain `depth` levels deep
+        for i in range(roots):
+            root = Comment.objects.create(post=self.post, content=f"Root {i}", approved=True)
+            CommentLike.objects.create(comment=root, user_name=f"user-{i}")
+            for j in range(replies):
+                Comment.objects.create(post=self.post, parent=root, content=f"Reply {i}.{j}", approved=True)
+            parent = root
+            for level in range(depth):
+                parent = Comment.objects.create(post=self.post, parent=parent, content=f"Deep {i}.{level}", approved=True)
+                CommentLike.objects.create(comment=parent, user_name="deep-liker")
+        # Hidden comments must not show up anywhere in the tree
+        Comment.objects.create(post=self.post, content="Pending", approved=False)
+        Comment.objects.create(post=self.post, content="Trashed", approved=True, is_trash=True)
+
+    def test_matches_recursive_serialization(self):
+        self._add_thread()
+
+        roots = self.post.comments.filter(approved=True, is_trash=False, parent__isnull=True)
+        context = {'max_depth': 3, 'current_depth': 0, 'replies_limit': 5}
+        expected = CommentSerializer(roots, many=True, context=context).data
+
+        self.assertEqual(build_comment_tree(self.post), expected)
+
+    def test_reply_limit_and_counts(self):
+        self._add_thread(roots=1, replies=7, depth=1)
+
+        tree = build_comment_tree(self.post)
+
+        self.assertEqual(len(tree), 1)
+        self.assertEqual(tree[0]['reply_count'], 8)
+        self.assertEqual(len(tree[0]['replies']), 5)
+        self.assertTrue(tree[0]['has_more_replies'])
+        self.assertEqual(tree[0]['like_count'], 1)
+
+    def test_post_detail_query_count_is_constant(self):
+        self._add_thread(roots=1, replies=1, depth=1)
+        post = BlogPost.objects.select_related('category').prefetch_related('images').get(pk=self.post.pk)
+        with self.assertNumQueries(2):
+            BlogPostSerializer(post).data
+
+        self._add_thread(roots=5, replies=8, depth=6)
+        post = BlogPost.objects.select_related('category').prefetch_related('images').get(pk=self.post.pk)
+        with self.assertNumQueries(2):
+            BlogPostSerializer(post).data
+
+
+class ReplySubtreeTestCase(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+
+        self.client = APIClient()
+        self.post = BlogPost.objects.create(title="Subtree Post", content="Test content", published=True)
+        self.root = Comment.objects.create(post=self.post, content="Root", approved=True)
+        self.replies = [
+            Comment.objects.create(post=self.post, parent=self.root, content=f"Reply {i}", approved=True)
+            for i in range(3)
+        ]
+        self.nested = Comment.objects.create(post=self.post, parent=self.replies[0], content="Nested", approved=True)
+        CommentLike.objects.create(comment=self.nested, user_name="fan")
+        hidden = Comment.objects.create(post=self.post, parent=self.root, content="Hidden")
+        Comment.objects.create(post=self.post, parent=hidden, content="Under hidden", approved=True)
+
+    def _contents(self, response):
+        return [item['content'] for item in response.data['results']]
+
+    def test_direct_replies_are_paged_oldest_first(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/comments/{self.root.pk}/replies/', {'limit': 2})
+        self.assertEqual(self._contents(response), ["Reply 0", "Reply 1"])
+        self.assertEqual(response.data['results'][0]['reply_count'], 1)
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(self._contents(response), ["Reply 2"])
+        self.assertIsNone(response.data['next'])
+
+    def test_thread_returns_visible_subtree(self):
+        # Thread order: each reply is followed by its own replies
+        response = self.client.get(f'/api/comments/{self.root.pk}/thread/')
+        self.assertEqual(self._contents(response), ["Reply 0", "Nested", "Reply 1", "Reply 2"])
+        nested = response.data['results'][1]
+        self.assertEqual((nested['parent'], nested['level'], nested['liked_by']), (self.replies[0].pk, 2, ["fan"]))
+
+        # Deeper comments can be expanded on their own
+        response = self.client.get(f'/api/comments/{self.replies[0].pk}/replies/')
+        self.assertEqual(self._contents(response), ["Nested"])
+
+    def test_hidden_branches_at_any_depth_are_left_out(self):
+        trashed = Comment.objects.create(
+            post=self.post, parent=self.replies[1], content="Trashed", approved=True, is_trash=True,
+        )
+        Comment.objects.create(post=self.post, parent=trashed, content="Under trashed", approved=True)
+        Comment.objects.create(post=self.post, parent=self.replies[1], content="Sibling", approved=True)
+
+        response = self.client.get(f'/api/comments/{self.root.pk}/thread/')
+        self.assertEqual(self._contents(response), ["Reply 0", "Nested", "Reply 1", "Sibling", "Reply 2"])
+
+    def test_invalid_requests(self):
+        hidden = Comment.objects.get(content="Hidden")
+        self.assertEqual(self.client.get(f'/api/comments/{hidden.pk}/replies/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/comments/{self.root.pk}/thread/', {'depth': 0}).status_code, 400)
+
+
+class CommentPathTestCase(TestCase):
+    def setUp(self):
+        self.post = BlogPost.objects.create(title="Path Post", content="Test content", published=True)
+
+    def test_paths_are_fixed_width_and_sort_in_thread_order(self):
+        first = Comment.objects.create(post=self.post, content="First")
+        second = Comment.objects.create(post=self.post, content="Second")
+        # Enough replies for ids of different lengths
+        replies = [Comment.objects.create(post=self.post, parent=first, content=f"Reply {i}") for i in range(10)]
+        nested = Comment.objects.create(post=self.post, parent=replies[0], content="Nested")
+
+        self.assertEqual(first.path, f"{first.pk:010d}")
+        self.assertEqual(nested.path, f"{first.pk:010d}/{replies[0].pk:010d}/{nested.pk:010d}")
+        self.assertEqual(Comment.objects.get(pk=nested.pk).path, nested.path)
+        self.assertEqual(nested.level, 2)
+
+        ordered = list(Comment.objects.filter(post=self.post).order_by('path').values_list('pk', flat=True))
+        self.assertEqual(ordered, [first.pk, replies[0].pk, nested.pk] + [r.pk for r in replies[1:]] + [second.pk])
+
+    def test_reply_to_a_loaded_parent_does_not_fetch_it(self):
+        root = Comment.objects.create(post=self.post, content="Root")
+        # Sequence draw and INSERT on PostgreSQL, INSERT and path UPDATE
+        # elsewhere; the parent path comes from the instance
+        with self.assertNumQueries(2):
+            Comment(post=self.post, parent=root, content="Reply").save()
+
+    def test_moving_a_comment_moves_its_replies(self):
+        first = Comment.objects.create(post=self.post, content="First")
+        second = Comment.objects.create(post=self.post, content="Second")
+        reply = Comment.objects.create(post=self.post, parent=first, content="Reply")
+        nested = Comment.objects.create(post=self.post, parent=reply, content="Nested")
+
+        reply = Comment.objects.get(pk=reply.pk)
+        reply.parent = second
+        reply.save()
+
+        nested.refresh_from_db()
+        self.assertEqual(nested.path, f"{second.pk:010d}/{reply.pk:010d}/{nested.pk:010d}")
+        self.assertEqual(nested.level, 2)
@@ -0,0 +1,88 @@
+import shutil
+import tempfile
+from io import BytesIO
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from blog.models import BlogImage, BlogPost, Category, Comment, CommentLike
+from blog.utils.image_queue import run_worker
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+class ConditionalGetTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Travel")
+        self.post = BlogPost.objects.create(title="Validated post", content="Content", published=True, category=self.category)
+        self.comment = Comment.objects.create(post=self.post, content="Comment", approved=True)
+
+    def _revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_post_returns_304_without_serializing(self):
+        url = f'/api/posts/{self.post.slug}/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with self.assertNumQueries(1):
+            response = self._revalidate(url, response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_post_validators_cover_rendered_relations(self):
+        url = f'/api/posts/by-slug/{self.post.slug}/'
+        etag = self.client.get(url)['ETag']
+
+        CommentLike.objects.create(comment=self.comment, user_name="reader")
+        response = self._revalidate(url, etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        self.category.description = "Updated"
+        self.category.save()
+        self.assertEqual(self._revalidate(url, etag).status_code, 200)
+
+    @override_settings(MEDIA_ROOT=MEDIA_ROOT)
+    def test_processed_image_changes_the_post_etag(self):
+        buffer = BytesIO()
+        Image.new('RGB', (1600, 1000), (200, 30, 30)).save(buffer, format='PNG')
+        BlogImage.objects.create(post=self.post, image=SimpleUploadedFile('photo.png', buffer.getvalue()))
+        self.addCleanup(shutil.rmtree, MEDIA_ROOT, ignore_errors=True)
+        url = f'/api/posts/by-slug/{self.post.slug}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self._revalidate(url, etag).status_code, 304)
+
+        # The worker swaps in the optimized file and deletes the original
+        run_worker(once=True)
+        self.assertEqual(self._revalidate(url, etag).status_code, 200)
+
+    @override_settings(RESPONSE_CACHE_ENABLED=True)
+    def test_list_validators(self):
+        for url in ['/api/posts/?published=true', '/api/categories/', '/api/all-slugs/']:
+            response = self.client.get(url)
+            self.assertFalse(response.has_header('Last-Modified'))
+            # Validated from the scope versions alone
+            with self.assertNumQueries(0):
+                self.assertEqual(self._revalidate(url, response['ETag']).status_code, 304)
+
+        etag = self.client.get('/api/posts/?published=true')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            newest = BlogPost.objects.create(title="New post", content="Content", published=True)
+        response = self._revalidate('/api/posts/?published=true', etag)
+        self.assertEqual(response.status_code, 200)
+
+        # Deleting the newest post is a change too
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            newest.delete()
+        self.assertEqual(self._revalidate('/api/posts/?published=true', etag).status_code, 200)
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_lists_are_not_validated_without_a_shared_cache(self):
+        response = self.client.get('/api/posts/')
+        self.assertFalse(response.has_header('ETag'))
@@ -0,0 +1,105 @@
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from blog.models import BlogPost, Category, Comment, CommentLike
+from blog.utils.comment_moderation import moderate_comments
+from blog.utils.counters import reconcile_counters
+
+
+class StoredCountersTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="News")
+        self.post = BlogPost.objects.create(title="Counted", content="Content", published=True, category=self.category)
+        self.root = Comment.objects.create(post=self.post, content="Root", approved=True)
+
+    def assertCounters(self, comments, replies, likes, posts):
+        self.assertEqual(BlogPost.objects.get(pk=self.post.pk).approved_comment_count, comments)
+        root = Comment.objects.get(pk=self.root.pk)
+        self.assertEqual(root.approved_reply_count, replies)
+        self.assertEqual(root.like_count, likes)
+        self.assertEqual(Category.objects.get(pk=self.category.pk).published_post_count, posts)
+
+    def test_comment_lifecycle(self):
+        reply = Comment.objects.create(post=self.post, parent=self.root, content="Reply")
+        self.assertCounters(comments=1, replies=0, likes=0, posts=1)
+
+        reply.approved = True
+        reply.save()
+        self.assertCounters(comments=2, replies=1, likes=0, posts=1)
+
+        reply.is_trash = True
+        reply.save()
+        self.assertCounters(comments=1, replies=0, likes=0, posts=1)
+
+        reply.is_trash = False
+        reply.save()
+        reply.delete()
+        self.assertCounters(comments=1, replies=0, likes=0, posts=1)
+
+    def test_likes_and_stale_instances(self):
+        stale = Comment.objects.get(pk=self.root.pk)
+        like = CommentLike.objects.create(comment=self.root, user_name="fan")
+        CommentLike.objects.create(comment=self.root, user_name="other")
+
+        # Saving an instance loaded before the likes keeps the stored counts
+        stale.admin_reply = "Thanks"
+        stale.save()
+        self.assertCounters(comments=1, replies=0, likes=2, posts=1)
+
+        like.delete()
+        self.assertCounters(comments=1, replies=0, likes=1, posts=1)
+
+    def test_like_endpoint_returns_the_new_count(self):
+        client = APIClient()
+        response = client.post(f'/api/comments/{self.root.pk}/like/', {'user_name': 'fan'}, format='json')
+        self.assertEqual(response.data['like_count'], 1)
+        response = client.post(f'/api/comments/{self.root.pk}/unlike/', {'user_name': 'fan'}, format='json')
+        self.assertEqual(response.data['like_count'], 0)
+
+    def test_posts_move_between_categories(self):
+        other = Category.objects.create(name="Other")
+        self.post.category = other
+        self.post.save()
+        self.assertEqual(Category.objects.get(pk=other.pk).published_post_count, 1)
+        self.assertCounters(comments=1, replies=0, likes=0, posts=0)
+
+        self.post.published = False
+        self.post.save()
+        self.assertEqual(Category.objects.get(pk=other.pk).published_post_count, 0)
+
+        BlogPost.objects.create(title="Second", content="Content", published=True, category=self.category).delete()
+        self.assertCounters(comments=1, replies=0, likes=0, posts=0)
+
+    def test_bulk_moderation(self):
+        replies = [Comment.objects.create(post=self.post, parent=self.root, content=f"Reply {i}") for i in range(3)]
+
+        moderate_comments('approve', Comment.objects.filter(pk__in=[reply.pk for reply in replies]))
+        self.assertCounters(comments=4, replies=3, likes=0, posts=1)
+
+        moderate_comments('trash', Comment.objects.filter(pk=replies[0].pk))
+        self.assertCounters(comments=3, replies=2, likes=0, posts=1)
+
+        moderate_comments('delete', Comment.objects.filter(pk=self.root.pk))
+        self.assertEqual(BlogPost.objects.get(pk=self.post.pk).approved_comment_count, 0)
+
+    def test_reconcile_repairs_drift(self):
+        CommentLike.objects.create(comment=self.root, user_name="fan")
+        BlogPost.objects.update(approved_comment_count=7)
+        Comment.objects.update(like_count=0)
+        Category.objects.update(published_post_count=3)
+
+        repaired = reconcile_counters(batch_size=1)
+
+        self.assertEqual(repaired, {
+            'BlogPost.approved_comment_count': 1,
+            'Comment.approved_reply_count': 0,
+            'Comment.like_count': 1,
+            'Category.published_post_count': 1,
+        })
+        self.assertCounters(comments=1, replies=0, likes=1, posts=1)
+
+        call_command('reconcile_counters', stdout=open('/dev/null', 'w'))
+        self.assertEqual(sum(reconcile_counters().values()), 0)
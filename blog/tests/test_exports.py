@@ -0,0 +1,65 @@
+import csv
+import io
+import json
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from blog.models import BlogPost, Category, Comment
+
+
+class ExportTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('auditor', password='secret'))
+        category = Category.objects.create(name="News")
+        self.post = BlogPost.objects.create(title="Published", content="Body", published=True, category=category)
+        BlogPost.objects.create(title="Draft", content="Body")
+        root = Comment.objects.create(post=self.post, content="Root, with \"quotes\"", approved=True)
+        Comment.objects.create(post=self.post, parent=root, content="Reply")
+        Comment.objects.create(post=self.post, content="Trashed", is_trash=True)
+
+    def _body(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_comments_stream_as_ndjson_with_replies(self):
+        response = self.client.get('/api/comments/export/', {'is_trash': 'false'})
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn('attachment; filename="comments-', response['Content-Disposition'])
+        rows = [json.loads(line) for line in self._body(response).splitlines()]
+        self.assertEqual([row['content'] for row in rows], ["Reply", "Root, with \"quotes\""])
+        self.assertEqual(rows[0]['post__slug'], self.post.slug)
+        self.assertEqual(rows[1]['approved_reply_count'], 0)
+
+    def test_posts_stream_as_csv_with_list_filters(self):
+        response = self.client.get('/api/posts/export/', {'output': 'csv', 'published': 'true'})
+
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(io.StringIO(self._body(response))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['title'], "Published")
+        self.assertEqual(rows[0]['category__name'], "News")
+        self.assertEqual(rows[0]['approved_comment_count'], '1')
+
+    def test_csv_cells_cannot_run_formulas(self):
+        Comment.objects.create(post=self.post, content='=HYPERLINK("http://evil.example")', approved=True)
+        Comment.objects.create(post=self.post, content='-1', approved=True)
+
+        response = self.client.get('/api/comments/export/', {'output': 'csv'})
+        contents = [row['content'] for row in csv.DictReader(io.StringIO(self._body(response)))]
+        self.assertIn("'=HYPERLINK(\"http://evil.example\")", contents)
+        self.assertIn("'-1", contents)
+        self.assertIn("Reply", contents)
+
+    def test_requires_authentication_and_a_known_format(self):
+        self.assertEqual(APIClient().get('/api/comments/export/').status_code, 401)
+        self.assertEqual(APIClient().get('/api/posts/export/').status_code, 401)
+        self.assertEqual(self.client.get('/api/posts/export/', {'output': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/comments/export/', {'output': 'xml'}).status_code, 400)
+
+    def test_search_filter_applies(self):
+        response = self.client.get('/api/posts/export/', {'search': 'body'})
+        rows = [json.loads(line) for line in self._body(response).splitlines()]
+        self.assertEqual(sorted(row['title'] for row in rows), ["Draft", "Published"])
@@ -0,0 +1,209 @@
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO, StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from blog.models import BlogImage, BlogPost, ImageJob, MediaAsset
+from blog.utils.image_queue import claim_job, enqueue_editor_upload, process_job, run_worker
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_upload(name='photo.png', size=(1600, 1000), image_format='PNG', color=(200, 30, 30)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, format=image_format)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type=f'image/{image_format.lower()}')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImageQueueTestCase(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.post = BlogPost.objects.create(title="Image post", content="Content", published=True)
+
+    def test_upload_is_queued_and_swapped_by_worker(self):
+        image = BlogImage.objects.create(post=self.post, image=make_upload())
+        original = image.image.name
+        job = ImageJob.objects.get(kind=ImageJob.KIND_BLOG_IMAGE, object_id=image.pk)
+        self.assertEqual(job.status, ImageJob.STATUS_PENDING)
+        self.assertEqual(job.original_path, original)
+        # Stored untouched until the worker runs
+        self.assertTrue(default_storage.exists(original))
+
+        self.assertEqual(run_worker(once=True), 1)
+
+        job.refresh_from_db()
+        image.refresh_from_db()
+        self.assertEqual(job.status, ImageJob.STATUS_DONE)
+        self.assertEqual(image.image.name, job.optimized_path)
+        self.assertTrue(image.image.name.endswith('.webp'))
+        with default_storage.open(image.image.name) as optimized:
+            self.assertEqual(Image.open(optimized).size, (1200, 750))
+        self.assertFalse(default_storage.exists(original))
+
+        self.assertEqual(sorted(variant['width'] for variant in image.variants), [320, 640, 960, 1200])
+        for variant in image.variants:
+            self.assertTrue(default_storage.exists(variant['name']))
+
+    @override_settings(IMAGE_VARIANT_WIDTHS=[320, 640], IMAGE_VARIANT_FORMATS=['avif', 'webp'])
+    def test_variants_are_exposed_as_srcset(self):
+        self.post.featured_image = make_upload(size=(800, 500))
+        self.post.save()
+        run_worker(once=True)
+
+        response = self.client.get('/api/posts/')
+        sources = response.data['results'][0]['featured_image_srcset']
+        # AVIF is only listed when Pillow can encode it
+        webp = sources[-1]
+        self.assertEqual(webp['type'], 'image/webp')
+        urls = [candidate.split(' ') for candidate in webp['srcset'].split(', ')]
+        self.assertEqual([width for _, width in urls], ['320w', '640w'])
+        self.assertTrue(all('://testserver/media/featured_images/variants/' in url for url, _ in urls))
+
+    def test_replaced_upload_is_skipped(self):
+        self.post.featured_image = make_upload('first.png')
+        self.post.save()
+        self.post.featured_image = make_upload('second.png', color=(30, 200, 30))
+        self.post.save()
+
+        statuses = []
+        while (job := claim_job()) is not None:
+            statuses.append((job.original_path, process_job(job)))
+        self.assertEqual([status for _, status in statuses], [ImageJob.STATUS_SKIPPED, ImageJob.STATUS_DONE])
+        self.post.refresh_from_db()
+        self.assertTrue(self.post.featured_image.name.endswith('.webp'))
+
+    def test_identical_uploads_are_stored_and_processed_once(self):
+        first = BlogImage.objects.create(post=self.post, image=make_upload('one.png'))
+        second = BlogImage.objects.create(post=self.post, image=make_upload('two.png'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r'^blog_images/[0-9a-f]{64}\.png$')
+
+        run_worker(once=True)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(ImageJob.objects.get(object_id=second.pk, kind=ImageJob.KIND_BLOG_IMAGE).status, ImageJob.STATUS_DONE)
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(MediaAsset.objects.count(), 1)
+
+        # Once processed, identical uploads reuse the output without a job
+        third = BlogImage.objects.create(post=self.post, image=make_upload('three.png'))
+        self.assertEqual(third.image.name, first.image.name)
+        self.assertEqual(third.variants, first.variants)
+        self.assertFalse(ImageJob.objects.filter(object_id=third.pk, kind=ImageJob.KIND_BLOG_IMAGE).exists())
+
+    def test_editor_uploads_are_deduplicated_and_relinked(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('editor', password='secret'))
+        upload = lambda: client.post('/api/upload/quill/', {'image': make_upload('photo.jpg', (2400, 1600), 'JPEG')}, format='multipart')
+
+        url = upload().data['url']
+        self.assertEqual(upload().data['url'], url)
+        self.assertEqual(ImageJob.objects.filter(kind=ImageJob.KIND_EDITOR_UPLOAD).count(), 1)
+        original = url.split('/media/')[1]
+        post = BlogPost.objects.create(title="Inline", content=f'<p><img src="{url}"></p>')
+
+        broken = default_storage.save('quill_uploads/broken.png', SimpleUploadedFile('broken.png', b'not an image'))
+        broken_job = enqueue_editor_upload(broken)
+
+        run_worker(once=True)
+
+        optimized = MediaAsset.objects.get().name
+        post.refresh_from_db()
+        self.assertIn(optimized, post.content)
+        self.assertNotIn(original, post.content)
+        # Kept for drafts that still link it
+        self.assertTrue(default_storage.exists(original))
+        with default_storage.open(optimized) as image:
+            self.assertEqual(Image.open(image).size, (1200, 800))
+        self.assertIn(optimized, upload().data['url'])
+
+        broken_job.refresh_from_db()
+        self.assertEqual(broken_job.status, ImageJob.STATUS_PENDING)
+        self.assertEqual(broken_job.attempts, 1)
+        self.assertIn('Could not optimize', broken_job.error)
+
+    def test_reused_editor_upload_gets_variants(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('editor', password='secret'))
+        client.post('/api/upload/quill/', {'image': make_upload('photo.png', (800, 500))}, format='multipart')
+        run_worker(once=True)
+        self.assertEqual(MediaAsset.objects.get().variants, [])
+
+        image = BlogImage.objects.create(post=self.post, image=make_upload('photo.png', (800, 500)))
+        self.assertEqual(image.image.name, MediaAsset.objects.get().name)
+        job = ImageJob.objects.get(kind=ImageJob.KIND_BLOG_IMAGE, object_id=image.pk)
+
+        run_worker(once=True)
+        job.refresh_from_db()
+        image.refresh_from_db()
+        self.assertEqual(job.status, ImageJob.STATUS_DONE)
+        self.assertEqual(image.image.name, MediaAsset.objects.get().name)
+        self.assertTrue(image.variants)
+        self.assertEqual(image.variants, MediaAsset.objects.get().variants)
+
+    def test_fix_images_optimizes_remaining_images_and_resumes(self):
+        images = [BlogImage.objects.create(post=self.post, image=make_upload(f'{i}.png', color=(i, 0, 0))) for i in range(3)]
+        # The first upload was processed; the others predate the queue
+        run_worker(once=True, max_jobs=1)
+        ImageJob.objects.filter(status=ImageJob.STATUS_PENDING).delete()
+
+        out = StringIO()
+        call_command('fix_images', optimize=True, workers=1, batch_size=2, stdout=out)
+        self.assertIn('2 images to optimize, 1 already optimized', out.getvalue())
+        self.assertIn('Optimized 2 images', out.getvalue())
+        for image in images:
+            image.refresh_from_db()
+            self.assertTrue(MediaAsset.objects.filter(name=image.image.name).exists())
+
+        out = StringIO()
+        call_command('fix_images', optimize=True, workers=1, stdout=out)
+        self.assertIn('0 images to optimize, 3 already optimized', out.getvalue())
+
+    def test_fix_images_skips_previously_optimized_webp(self):
+        images = [BlogImage.objects.create(post=self.post, image=make_upload(f'{i}.png')) for i in range(2)]
+        ImageJob.objects.all().delete()
+        # Optimized by an older version, which recorded no MediaAsset
+        for image, size in zip(images, [(1200, 750), (1600, 1000)]):
+            name = default_storage.save(f'blog_images/legacy-{image.pk}.webp', make_upload('legacy.webp', size, 'WEBP'))
+            BlogImage.objects.filter(pk=image.pk).update(image=name)
+
+        out = StringIO()
+        call_command('fix_images', optimize=True, workers=1, stdout=out)
+        self.assertIn('1 images to optimize, 1 already optimized', out.getvalue())
+        self.assertEqual(ImageJob.objects.get().object_id, images[1].pk)
+
+    def test_identical_upload_after_cleanup_is_stored_again(self):
+        image = BlogImage.objects.create(post=self.post, image=make_upload())
+        run_worker(once=True)
+        optimized = BlogImage.objects.get(pk=image.pk).image.name
+        image.delete()
+        # Past the grace period
+        old = time.time() - 7 * 24 * 3600
+        for directory, _, files in os.walk(MEDIA_ROOT):
+            for name in files:
+                os.utime(os.path.join(directory, name), (old, old))
+
+        with mock.patch('builtins.input', return_value='y'):
+            call_command('fix_images', cleanup=True, stdout=StringIO())
+        self.assertFalse(default_storage.exists(optimized))
+        self.assertFalse(MediaAsset.objects.exists())
+
+        again = BlogImage.objects.create(post=self.post, image=make_upload())
+        self.assertTrue(default_storage.exists(again.image.name))
+        self.assertTrue(ImageJob.objects.filter(kind=ImageJob.KIND_BLOG_IMAGE, object_id=again.pk).exists())
@@ -0,0 +1,76 @@
+import multiprocessing
+import os
+import sys
+import tempfile
+import unittest
+from io import BytesIO
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from blog.utils.image_utils import ImageProcessor, validate_blog_image
+
+
+def _resident_kb():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+
+
+def _optimize_peak_mb(path, conn):
+    """Optimize an image and report the peak RSS growth in MB (run in a forked child)"""
+    import resource
+
+    baseline = _resident_kb()
+    with open(path, 'rb') as source:
+        optimized = ImageProcessor.optimize_image(source)
+        size = Image.open(optimized).size
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    conn.send((size, (peak - baseline) // 1024))
+
+
+class ImageProcessorTestCase(SimpleTestCase):
+    def make_jpeg(self, size, exif=None):
+        buffer = BytesIO()
+        image = Image.new('RGB', size, (200, 30, 30))
+        image.save(buffer, format='JPEG', exif=exif or Image.Exif())
+        buffer.seek(0)
+        buffer.name = 'photo.jpg'
+        return buffer
+
+    def test_downscale_uses_draft_and_respects_exif_orientation(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Rotated 90 degrees: stored landscape, shown portrait
+        optimized = ImageProcessor.optimize_image(self.make_jpeg((3200, 2400), exif))
+
+        self.assertEqual(optimized.name, 'photo.webp')
+        self.assertEqual(Image.open(optimized).size, (600, 800))
+
+    def test_pixel_budget_is_enforced_before_decoding(self):
+        image_file = self.make_jpeg((400, 300))
+        with override_settings(IMAGE_MAX_PIXELS=100_000):
+            # The original comes back untouched, as for any undecodable file
+            self.assertIs(ImageProcessor.optimize_image(image_file), image_file)
+
+            image_file.seek(0)
+            upload = SimpleUploadedFile('photo.jpg', image_file.read(), content_type='image/jpeg')
+            result = validate_blog_image(upload)
+        self.assertFalse(result['valid'])
+        self.assertIn('exceed the limit of 100000 pixels', result['errors'][0])
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), 'Reads RSS from /proc')
+    def test_large_jpeg_peak_memory(self):
+        # A full decode of this image alone takes ~100 MB (Pillow stores RGB
+        # in 4 bytes per pixel); draft mode decodes it at half scale
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as source:
+            Image.effect_noise((5000, 5000), 64).convert('RGB').save(source, format='JPEG', quality=90)
+            source.flush()
+
+            context = multiprocessing.get_context('fork')
+            parent_conn, child_conn = context.Pipe()
+            child = context.Process(target=_optimize_peak_mb, args=(source.name, child_conn))
+            child.start()
+            size, peak_mb = parent_conn.recv()
+            child.join()
+
+        self.assertEqual(size, (800, 800))
+        self.assertLess(peak_mb, 64)
@@ -0,0 +1,189 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from blog.models import BlogPost, Comment, CommentLike
+from blog.utils import counters, like_buffer
+
+
+class CommentLikeTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.post = BlogPost.objects.create(title="Liked", content="Content", published=True)
+        self.root = Comment.objects.create(post=self.post, content="Root", approved=True)
+        self.reply = Comment.objects.create(post=self.post, parent=self.root, content="Reply", approved=True)
+
+    def like(self, comment_id, user_name='fan', verb='like'):
+        return self.client.post(f'/api/comments/{comment_id}/{verb}/', {'user_name': user_name}, format='json')
+
+    def test_like_and_unlike_are_idempotent(self):
+        first = self.like(self.root.pk)
+        again = self.like(self.root.pk)
+        self.assertEqual((first.status_code, first.data['changed'], first.data['like_count']), (200, True, 1))
+        self.assertEqual((again.status_code, again.data['changed'], again.data['like_count']), (200, False, 1))
+        self.assertNotIn('comment', first.data)
+        self.assertEqual(CommentLike.objects.filter(comment=self.root).count(), 1)
+
+        removed = self.like(self.root.pk, verb='unlike')
+        noop = self.like(self.root.pk, verb='unlike')
+        self.assertEqual((removed.data['changed'], removed.data['like_count']), (True, 0))
+        self.assertEqual((noop.status_code, noop.data['changed'], noop.data['like_count']), (200, False, 0))
+        self.assertEqual(Comment.objects.get(pk=self.root.pk).like_count, 0)
+
+    def test_replies_can_be_liked(self):
+        response = self.like(self.reply.pk)
+        self.assertEqual(response.data['like_count'], 1)
+        self.assertEqual(Comment.objects.get(pk=self.reply.pk).like_count, 1)
+
+    def test_repeated_like_only_reads(self):
+        self.like(self.root.pk)
+        # The locked comment read and the existence check, inside a savepoint
+        with self.assertNumQueries(4):
+            self.like(self.root.pk)
+
+    def test_missing_comment_and_user_name(self):
+        self.assertEqual(self.like(999999).status_code, 404)
+        self.assertFalse(CommentLike.objects.filter(comment_id=999999).exists())
+        self.assertEqual(self.like(self.root.pk, user_name='').status_code, 400)
+
+    def test_like_refreshes_the_post_detail(self):
+        url = f'/api/posts/{self.post.slug}/'
+        self.client.get(url)
+        self.like(self.reply.pk)
+        response = self.client.get(url)
+        reply = response.data['comments'][0]['replies'][0]
+        self.assertEqual(reply['like_count'], 1)
+
+    def test_liked_lookup(self):
+        self.like(self.root.pk)
+        self.like(self.reply.pk, user_name='other')
+        ids = f'{self.root.pk},{self.reply.pk},999999'
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/comments/liked/', {'user_name': 'fan', 'ids': ids})
+        self.assertEqual(response.data['liked'], [self.root.pk])
+
+        self.assertEqual(self.client.get('/api/comments/liked/', {'ids': ids}).status_code, 400)
+        self.assertEqual(self.client.get('/api/comments/liked/', {'user_name': 'fan', 'ids': 'a,b'}).status_code, 400)
+        too_many = ','.join(str(i) for i in range(1, 202))
+        self.assertEqual(self.client.get('/api/comments/liked/', {'user_name': 'fan', 'ids': too_many}).status_code, 400)
+
+
+@override_settings(LIKE_BUFFER_ENABLED=True)
+class LikeBufferTestCase(CommentLikeTestCase):
+    def setUp(self):
+        super().setUp()
+        # No timer, so flushes only happen when full or asked to
+        self.buffer = like_buffer.LikeBuffer(max_events=3, flush_interval=0)
+        self.previous, like_buffer._buffer = like_buffer._buffer, self.buffer
+
+    def tearDown(self):
+        like_buffer._buffer = self.previous
+
+    def test_like_and_unlike_are_idempotent(self):
+        first = self.like(self.root.pk)
+        again = self.like(self.root.pk)
+        self.assertEqual((first.data['changed'], first.data['like_count']), (True, 1))
+        self.assertEqual((again.data['changed'], again.data['like_count']), (False, 1))
+        self.assertFalse(CommentLike.objects.exists())
+
+        # Coalesced back to the stored state, so nothing is left to write
+        removed = self.like(self.root.pk, verb='unlike')
+        self.assertEqual((removed.data['changed'], removed.data['like_count']), (True, 0))
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_replies_can_be_liked(self):
+        self.like(self.reply.pk)
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(Comment.objects.get(pk=self.reply.pk).like_count, 1)
+
+    def test_repeated_like_only_reads(self):
+        self.like(self.root.pk)
+        with self.assertNumQueries(1):
+            self.like(self.root.pk)
+
+    def test_missing_comment_and_user_name(self):
+        self.assertEqual(self.like(999999).status_code, 404)
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(self.like(self.root.pk, user_name='').status_code, 400)
+
+    def test_like_refreshes_the_post_detail(self):
+        url = f'/api/posts/{self.post.slug}/'
+        self.client.get(url)
+        self.like(self.reply.pk)
+        self.buffer.flush()
+        response = self.client.get(url)
+        self.assertEqual(response.data['comments'][0]['replies'][0]['like_count'], 1)
+
+    def test_liked_lookup(self):
+        self.like(self.root.pk)
+        self.like(self.reply.pk, user_name='other')
+        response = self.client.get('/api/comments/liked/', {'user_name': 'fan', 'ids': f'{self.root.pk},{self.reply.pk}'})
+        self.assertEqual(response.data['liked'], [self.root.pk])
+
+    def test_liked_by_shows_buffered_likes(self):
+        CommentLike.objects.create(comment=self.root, user_name='stored')
+        self.like(self.root.pk)
+        self.like(self.root.pk, user_name='stored', verb='unlike')
+
+        listing = self.client.get('/api/comments/', {'post': self.post.pk}).data['results'][0]
+        self.assertEqual(listing['liked_by'], ['fan'])
+        detail = self.client.get(f'/api/posts/{self.post.slug}/').data['comments'][0]
+        self.assertEqual(detail['liked_by'], ['fan'])
+
+    def test_flushes_batches_and_recounts(self):
+        CommentLike.objects.create(comment=self.root, user_name='gone')
+        self.like(self.root.pk, user_name='gone', verb='unlike')
+        self.like(self.root.pk, user_name='a')
+        self.assertEqual(self.client.get('/api/comments/', {'post': self.post.pk}).data['results'][0]['like_count'], 1)
+        self.assertEqual(CommentLike.objects.count(), 1)
+
+        # The third pending pair fills the buffer and flushes it
+        self.like(self.root.pk, user_name='b')
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(
+            sorted(CommentLike.objects.values_list('user_name', flat=True)), ['a', 'b']
+        )
+        self.assertEqual(Comment.objects.get(pk=self.root.pk).like_count, 2)
+
+    def test_events_recorded_during_a_flush_apply_on_top_of_it(self):
+        self.like(self.root.pk)
+        recount = counters.recount_like_counts
+        seen = {}
+
+        def unlike_mid_flush(comment_ids):
+            recount(comment_ids)
+            # Other connections still see the state before the flush
+            with mock.patch.object(self.buffer, '_stored_state', return_value=(0, False)):
+                seen['delta'] = like_buffer.pending_delta(self.root.pk)
+                seen['response'] = self.like(self.root.pk, verb='unlike')
+
+        with mock.patch.object(counters, 'recount_like_counts', side_effect=unlike_mid_flush):
+            self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(seen['delta'], 1)
+        self.assertEqual((seen['response'].data['changed'], seen['response'].data['like_count']), (True, 0))
+        self.assertEqual(like_buffer.pending_delta(self.root.pk), -1)
+
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertFalse(CommentLike.objects.exists())
+        self.assertEqual(Comment.objects.get(pk=self.root.pk).like_count, 0)
+
+    def test_failed_flush_is_requeued_under_newer_events(self):
+        self.like(self.root.pk)
+
+        def fail_mid_flush(comment_ids):
+            with mock.patch.object(self.buffer, '_stored_state', return_value=(0, False)):
+                self.like(self.root.pk, verb='unlike')
+                self.like(self.reply.pk)
+            raise RuntimeError("database went away")
+
+        with mock.patch.object(counters, 'recount_like_counts', side_effect=fail_mid_flush):
+            self.assertEqual(self.buffer.flush(), 0)
+        # The like was never written, so the unlike leaves nothing to do
+        self.assertEqual(self.buffer.pending_states('fan', [self.root.pk, self.reply.pk]), {self.reply.pk: True})
+        self.assertEqual(like_buffer.pending_delta(self.root.pk), 0)
+
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(list(CommentLike.objects.values_list('comment_id', flat=True)), [self.reply.pk])
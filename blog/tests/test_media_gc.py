@@ -0,0 +1,166 @@
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from blog.models import BlogPost, ImageJob, MediaAsset
+from blog.utils.media_gc import collect_garbage, delete_files, find_unreferenced
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+OLD = datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class FakeObject:
+    def __init__(self, key, size=10, last_modified=OLD):
+        self.key = key
+        self.size = size
+        self.last_modified = last_modified
+
+
+class FakeObjects:
+    """The slice of a boto3 bucket object collection the collector uses"""
+
+    def __init__(self, bucket, prefix=''):
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def filter(self, Prefix):
+        return FakeObjects(self.bucket, Prefix)
+
+    def page_size(self, count):
+        self.bucket.page_sizes.append(count)
+        return self
+
+    def __iter__(self):
+        return iter([obj for key, obj in sorted(self.bucket.objects_by_key.items()) if key.startswith(self.prefix)])
+
+
+class FakeBucket:
+    def __init__(self, keys):
+        self.objects_by_key = {key: FakeObject(key) for key in keys}
+        self.objects = FakeObjects(self)
+        self.page_sizes = []
+        self.delete_requests = []
+
+    def delete_objects(self, Delete):
+        keys = [obj['Key'] for obj in Delete['Objects']]
+        self.delete_requests.append(keys)
+        for key in keys:
+            del self.objects_by_key[key]
+
+
+class FakeS3Storage:
+    location = 'media'
+
+    def __init__(self, keys):
+        self.bucket = FakeBucket(keys)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class MediaGarbageCollectorTestCase(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def store(self, name, age=timedelta(days=7)):
+        name = default_storage.save(name, ContentFile(b'image bytes'))
+        modified = time.time() - age.total_seconds()
+        os.utime(default_storage.path(name), (modified, modified))
+        return name
+
+    def test_unreferenced_files_are_deleted_after_the_grace_period(self):
+        featured = self.store('featured_images/photo.webp')
+        variant = self.store('featured_images/variants/photo_320w.webp')
+        inline = self.store('quill_uploads/inline.png')
+        srcset = self.store('ckeditor_uploads/wide.png')
+        asset = self.store('blog_images/asset.webp')
+        queued = self.store('blog_images/queued.png')
+        orphans = [
+            self.store('blog_images/orphan.png'),
+            self.store('quill_uploads/orphan.png'),
+            self.store('featured_images/variants/orphan_640w.webp'),
+        ]
+        fresh = self.store('quill_uploads/fresh.png', age=timedelta(minutes=5))
+        unmanaged = self.store('placeholders/blog-placeholder.jpg')
+
+        BlogPost.objects.create(
+            title="Post",
+            featured_image=featured,
+            featured_image_variants=[{'format': 'webp', 'width': 320, 'height': 200, 'name': variant}],
+            content=(
+                f'<p><img src="https://cdn.example.com/media/{inline}"></p>'
+                f'<img srcset="/media/{srcset} 2x, /media/quill_uploads/missing.png 1x">'
+            ),
+        )
+        MediaAsset.objects.create(sha256='a' * 64, name=asset)
+        # Kept for the queued job of identical content
+        ImageJob.objects.create(kind=ImageJob.KIND_EDITOR_UPLOAD, original_path=queued, sha256='a' * 64)
+
+        out = StringIO()
+        call_command('collect_media_garbage', dry_run=True, stdout=out)
+        self.assertIn('Would delete 3 unreferenced files', out.getvalue())
+        for name in orphans:
+            self.assertIn(name, out.getvalue())
+            self.assertTrue(default_storage.exists(name))
+
+        self.assertEqual(collect_garbage(batch_size=2), (3, 3 * len(b'image bytes')))
+        for name in orphans:
+            self.assertFalse(default_storage.exists(name))
+        for name in [featured, variant, inline, srcset, asset, queued, fresh, unmanaged]:
+            self.assertTrue(default_storage.exists(name), name)
+
+    def test_unused_assets_are_collected_with_their_rows(self):
+        used = self.store('blog_images/used.webp')
+        linked = self.store('quill_uploads/linked.webp')
+        stale = self.store('blog_images/stale.webp')
+        stale_variant = self.store('blog_images/variants/stale_320w.webp')
+        original = f"quill_uploads/{'c' * 64}.png"
+
+        BlogPost.objects.create(title="Post", featured_image=used, content=f'<img src="/media/{original}">')
+        MediaAsset.objects.create(sha256='a' * 64, name=used)
+        # Its original is still linked, so the next save relinks the output
+        MediaAsset.objects.create(sha256='c' * 64, name=linked)
+        MediaAsset.objects.create(sha256='b' * 64, name=stale, variants=[
+            {'format': 'webp', 'width': 320, 'height': 200, 'name': stale_variant},
+        ])
+
+        out = StringIO()
+        call_command('collect_media_garbage', dry_run=True, stdout=out)
+        self.assertEqual(MediaAsset.objects.count(), 3)
+
+        self.assertEqual(collect_garbage(), (2, 2 * len(b'image bytes')))
+        self.assertFalse(default_storage.exists(stale))
+        self.assertFalse(default_storage.exists(stale_variant))
+        self.assertTrue(default_storage.exists(used))
+        self.assertTrue(default_storage.exists(linked))
+        self.assertEqual(sorted(MediaAsset.objects.values_list('sha256', flat=True)), ['a' * 64, 'c' * 64])
+
+    def test_s3_listing_is_paged_and_deleted_in_batches(self):
+        storage = FakeS3Storage([
+            'media/blog_images/a.png',
+            'media/blog_images/b.png',
+            'media/blog_images/variants/b_320w.webp',
+            'media/quill_uploads/c.png',
+            'media/thumbnails/d.png',
+        ])
+        references = ['blog_images/b.png', 'blog_images/variants/b_320w.webp']
+
+        unreferenced = [stored.name for stored in find_unreferenced(storage, references=references)]
+        self.assertEqual(unreferenced, ['blog_images/a.png', 'quill_uploads/c.png'])
+        self.assertTrue(storage.bucket.page_sizes)
+
+        delete_files(storage, unreferenced)
+        self.assertEqual(storage.bucket.delete_requests, [['media/blog_images/a.png', 'media/quill_uploads/c.png']])
@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+from django.test import TestCase, override_settings
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+HASHED_NAME = 'blog_images/' + 'ab' * 32 + '.webp'
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, MEDIA_SENDFILE='')
+class MediaServingTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(MEDIA_ROOT, 'blog_images'), exist_ok=True)
+        for name in ['blog_images/legacy.png', HASHED_NAME]:
+            with open(os.path.join(MEDIA_ROOT, name), 'wb') as f:
+                f.write(bytes(range(100)))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def test_full_response_headers(self):
+        response = self.client.get('/media/blog_images/legacy.png')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(100)))
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=86400')
+
+        response = self.client.get(f'/media/{HASHED_NAME}')
+        self.assertEqual(response['ETag'], f'"{"ab" * 32}"')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+
+    def test_conditional_requests(self):
+        etag = self.client.get('/media/blog_images/legacy.png')['ETag']
+        response = self.client.get('/media/blog_images/legacy.png', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # A stale If-Range validator gets the whole, current file
+        response = self.client.get('/media/blog_images/legacy.png', HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_byte_ranges(self):
+        response = self.client.get('/media/blog_images/legacy.png', HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(10, 20)))
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(response['Content-Length'], '10')
+
+        response = self.client.get('/media/blog_images/legacy.png', HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(95, 100)))
+        self.assertEqual(response['Content-Range'], 'bytes 95-99/100')
+
+        response = self.client.get('/media/blog_images/legacy.png', HTTP_RANGE='bytes=200-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_sendfile_offload_and_missing_files(self):
+        with override_settings(MEDIA_SENDFILE='x-accel-redirect'):
+            response = self.client.get(f'/media/{HASHED_NAME}')
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{HASHED_NAME}')
+        self.assertEqual(response.content, b'')
+
+        with override_settings(MEDIA_SENDFILE='x-sendfile'):
+            response = self.client.get('/media/blog_images/legacy.png')
+        self.assertEqual(response['X-Sendfile'], os.path.join(MEDIA_ROOT, 'blog_images/legacy.png'))
+
+        self.assertEqual(self.client.get('/media/blog_images/missing.png').status_code, 404)
+        # Paths escaping MEDIA_ROOT are rejected as suspicious
+        self.assertEqual(self.client.get('/media/../settings.py').status_code, 400)
@@ -0,0 +1,131 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from blog.models import BlogPost, Comment
+
+
+class KeysetPaginationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        now = timezone.now()
+        for i in range(7):
+            post = BlogPost.objects.create(title=f"Post {i}", content="Content", published=True, position=i % 2)
+            # Ties on position and created_at are broken by id
+            BlogPost.objects.filter(pk=post.pk).update(created_at=now - timezone.timedelta(minutes=i // 3))
+        self.expected = list(
+            BlogPost.objects.filter(published=True).order_by('position', '-created_at', '-id').values_list('slug', flat=True)
+        )
+
+    def _slugs(self, response):
+        return [item['slug'] for item in response.data['results']]
+
+    def test_walks_forward_and_back_without_counting(self):
+        # Page rows only, no COUNT(*)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/posts/', {'published': 'true', 'pagination': 'cursor', 'limit': 3})
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+
+        pages = [self._slugs(response)]
+        while response.data['next']:
+            with self.assertNumQueries(1):
+                response = self.client.get(response.data['next'])
+            pages.append(self._slugs(response))
+        self.assertEqual([slug for page in pages for slug in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+
+        for page in reversed(pages[:-1]):
+            response = self.client.get(response.data['previous'])
+            self.assertEqual(self._slugs(response), page)
+        self.assertIsNone(response.data['previous'])
+
+    def test_count_on_request_and_invalid_cursor(self):
+        response = self.client.get('/api/posts/', {'published': 'true', 'pagination': 'cursor', 'count': 'true'})
+        self.assertEqual(response.data['count'], 7)
+
+        self.assertEqual(self.client.get('/api/posts/', {'cursor': 'garbage'}).status_code, 404)
+
+    @override_settings(RESPONSE_CACHE_ENABLED=True)
+    def test_page_mode_count_is_shared_by_pages(self):
+        response = self.client.get('/api/posts/', {'published': 'true', 'limit': 3})
+        self.assertEqual(response.data['count'], 7)
+        # Page rows; the count is reused from the first page and the
+        # validators come from the cache
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/posts/', {'published': 'true', 'limit': 3, 'page': 2})
+        self.assertEqual(response.data['current_page'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BlogPost.objects.create(title="New", content="Content", published=True)
+        response = self.client.get('/api/posts/', {'published': 'true', 'limit': 3, 'page': 2})
+        self.assertEqual(response.data['count'], 8)
+
+    def _walk(self, params):
+        response = self.client.get('/api/posts/', params)
+        slugs = self._slugs(response)
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            slugs += self._slugs(response)
+        return slugs
+
+    def test_cursor_pages_keep_the_view_ordering(self):
+        unfiltered = list(BlogPost.objects.order_by('-created_at', '-id').values_list('slug', flat=True))
+        self.assertEqual(self._walk({'pagination': 'cursor', 'limit': 2}), unfiltered)
+
+        BlogPost.objects.filter(title="Post 5").update(title="Post 5 special")
+        BlogPost.objects.filter(title="Post 2").update(content="Content special")
+        for post in BlogPost.objects.all():
+            post.save()
+        params = {'search': 'special', 'limit': 1}
+        by_rank = self._slugs(self.client.get('/api/posts/', {**params, 'limit': 10}))
+        self.assertEqual(len(by_rank), 2)
+        self.assertEqual(by_rank[0], BlogPost.objects.get(title="Post 5 special").slug)
+        self.assertEqual(self._walk({**params, 'pagination': 'cursor'}), by_rank)
+
+    def test_comments_cursor_mode(self):
+        post = BlogPost.objects.first()
+        comments = [Comment.objects.create(post=post, content=f"Comment {i}") for i in range(5)]
+        Comment.objects.update(created_at=timezone.now())
+
+        ids = []
+        response = self.client.get('/api/comments/', {'pagination': 'cursor', 'limit': 2})
+        while True:
+            ids += [item['id'] for item in response.data['results']]
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(ids, sorted((comment.pk for comment in comments), reverse=True))
+
+
+class AdminCommentListingTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        posts = [BlogPost.objects.create(title=f"Post {i}", content="Content") for i in range(3)]
+        Comment.objects.bulk_create([
+            Comment(post=posts[i % 3], content=f"Comment {i}", approved=i % 2 == 0) for i in range(150)
+        ])
+
+    def test_pages_take_a_fixed_number_of_queries(self):
+        # Page rows with their posts, and the total count
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/comments/admin_all/')
+        self.assertEqual(response.data['count'], 150)
+        self.assertEqual(len(response.data['results']), 100)
+        first = response.data['results'][0]
+        self.assertEqual(first['post_title']['title'], "Post 2")
+        self.assertNotIn('liked_by', first)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(response.data['next'] + '&count=false')
+        self.assertEqual(len(response.data['results']), 50)
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['next'])
+
+    def test_filters_still_apply(self):
+        response = self.client.get('/api/comments/admin_all/', {'approved': 'false', 'limit': 10})
+        self.assertEqual(response.data['count'], 75)
+        self.assertFalse(any(item['approved'] for item in response.data['results']))
+        self.assertEqual(self.client.get('/api/comments/admin_all/', {'post': 'x'}).status_code, 400)
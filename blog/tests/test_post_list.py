@@ -0,0 +1,47 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from blog.models import BlogPost, Category, Comment
+
+
+class PostListQueryTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Travel")
+
+    def _create_posts(self, count):
+        for i in range(count):
+            post = BlogPost.objects.create(
+                title=f"Post {BlogPost.objects.count()}",
+                content="Test content",
+                published=True,
+                category=self.category,
+            )
+            Comment.objects.create(post=post, content="Approved", approved=True)
+            Comment.objects.create(post=post, content="Pending", approved=False)
+
+    def _list(self, limit):
+        return self.client.get('/api/posts/', {'published': 'true', 'limit': limit})
+
+    def test_list_includes_annotated_counts(self):
+        self._create_posts(3)
+
+        response = self._list(10)
+
+        self.assertEqual(response.status_code, 200)
+        for item in response.data['results']:
+            self.assertEqual(item['comment_count'], 1)
+            self.assertEqual(item['category']['post_count'], 3)
+
+    def test_list_query_count_does_not_grow_with_page_size(self):
+        # Page count and page rows
+        self._create_posts(1)
+        with self.assertNumQueries(2):
+            self._list(1)
+
+        self._create_posts(49)
+        with self.assertNumQueries(2):
+            response = self._list(50)
+        self.assertEqual(len(response.data['results']), 50)
@@ -0,0 +1,98 @@
+from collections import Counter
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from blog.models import BlogPost, Category, RelatedPost, RelatedPostUpdate
+from blog.utils.related_posts import (
+    build_matrix, process_related_updates, rebuild_related_posts, top_neighbours, update_related_posts,
+)
+
+
+class RelatedPostsIndexTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.travel = Category.objects.create(name="Travel")
+        self.food = Category.objects.create(name="Food")
+        self.beach = self._post("Beach holidays in Spain", "Sunny beach resorts and sandy coastline holidays.", self.travel)
+        self.coast = self._post("Spanish coastline guide", "The best beach towns along the sandy coastline.", self.travel)
+        self.pasta = self._post("Homemade pasta recipe", "Fresh pasta dough with eggs and flour.", self.food)
+        self.noodles = self._post("Pasta sauces", "Tomato sauces for homemade pasta dishes.", self.food)
+
+    def _post(self, title, content, category):
+        return BlogPost.objects.create(title=title, content=f"<p>{content}</p>", category=category, published=True)
+
+    def test_top_neighbours_are_ordered_by_similarity(self):
+        matrix = build_matrix([
+            Counter({'beach': 2, 'sand': 1}),
+            Counter({'beach': 1, 'sand': 1}),
+            Counter({'pasta': 1, 'sand': 1}),
+        ])
+
+        neighbours = top_neighbours(matrix, top_k=2, batch_size=1)
+
+        self.assertEqual([row for row, score in neighbours[0]], [1, 2])
+        self.assertGreater(neighbours[0][0][1], neighbours[0][1][1])
+
+    def test_rebuild_groups_similar_posts(self):
+        rebuild_related_posts()
+
+        first = RelatedPost.objects.filter(post=self.beach).order_by('rank').first()
+        self.assertEqual(first.related, self.coast)
+        first = RelatedPost.objects.filter(post=self.pasta).order_by('rank').first()
+        self.assertEqual(first.related, self.noodles)
+
+    def test_incremental_update_only_touches_affected_rows(self):
+        rebuild_related_posts()
+        untouched = list(RelatedPost.objects.filter(post=self.pasta).values_list('id', flat=True))
+
+        post = self._post("Beach resorts on the Spanish coastline", "Sandy beach holidays.", self.travel)
+        update_related_posts([post.id])
+
+        self.assertTrue(RelatedPost.objects.filter(post=post, related=self.beach).exists())
+        self.assertTrue(RelatedPost.objects.filter(post=self.beach, related=post).exists())
+        self.assertEqual(list(RelatedPost.objects.filter(post=self.pasta).values_list('id', flat=True)), untouched)
+
+    def test_saves_and_deletes_are_queued_for_the_worker(self):
+        rebuild_related_posts()
+        self.assertFalse(RelatedPostUpdate.objects.exists())
+
+        post = self._post("Beach resorts on the Spanish coastline", "Sandy beach holidays.", self.travel)
+        post.title = "Beach resorts along the Spanish coastline"
+        post.save()
+        # Saving never touches the index, and repeated saves queue once
+        self.assertFalse(RelatedPost.objects.filter(post=post).exists())
+        self.assertEqual(RelatedPostUpdate.objects.count(), 1)
+
+        self.assertEqual(process_related_updates(), 1)
+        self.assertFalse(RelatedPostUpdate.objects.exists())
+        self.assertTrue(RelatedPost.objects.filter(post=self.beach, related=post).exists())
+
+        post.delete()
+        self.assertEqual(process_related_updates(), 1)
+        self.assertFalse(RelatedPost.objects.filter(related_id=post.id).exists())
+        self.assertTrue(RelatedPost.objects.filter(post=self.beach, related=self.coast).exists())
+
+    def test_endpoint_reads_index(self):
+        rebuild_related_posts()
+
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/posts/{self.beach.slug}/related/', {'limit': 1})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['id'], self.coast.id)
+
+    @override_settings(RESPONSE_CACHE_ENABLED=True)
+    def test_worker_refreshes_cached_related_responses(self):
+        rebuild_related_posts()
+        url = f'/api/posts/{self.beach.slug}/related/'
+        with self.captureOnCommitCallbacks(execute=True):
+            post = self._post("Beach holidays in Spain", "Sunny beach resorts and sandy coastline holidays.", self.travel)
+        # Cached again before the worker has indexed the new post
+        self.assertEqual(self.client.get(url, {'limit': 1}).data['results'][0]['id'], self.coast.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            process_related_updates()
+        self.assertEqual(self.client.get(url, {'limit': 1}).data['results'][0]['id'], post.id)
@@ -0,0 +1,67 @@
+import gzip
+import json
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from blog.models import BlogPost, Category, Comment, PostRender
+from blog.serializers import BlogPostSerializer
+from blog.utils.render_store import _accepted_encodings
+
+
+class PostRenderStoreTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Travel")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post = BlogPost.objects.create(
+                title="Rendered post", content="<p>Content</p>", published=True, category=self.category
+            )
+        self.url = f'/api/posts/by-slug/{self.post.slug}/'
+
+    def _payload(self, response):
+        return json.loads(response.content)
+
+    def test_serves_stored_payload_with_negotiated_encoding(self):
+        self.assertTrue(PostRender.objects.filter(post=self.post).exists())
+
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        post = BlogPost.objects.get(pk=self.post.pk)
+        self.assertEqual(self._payload(response), json.loads(json.dumps(BlogPostSerializer(post).data)))
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(json.loads(gzip.decompress(response.content))['title'], "Rendered post")
+
+        self.assertEqual(self.client.get('/api/posts/by-slug/missing/').status_code, 404)
+
+    def test_renders_follow_post_comment_and_category_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.title = "Renamed post"
+            self.post.save()
+        self.assertEqual(self._payload(self.client.get(self.url))['title'], "Renamed post")
+
+        # Pending comments are not rendered, approving one re-renders
+        with self.captureOnCommitCallbacks(execute=True):
+            comment = Comment.objects.create(post=self.post, content="Hello")
+        self.assertEqual(self._payload(self.client.get(self.url))['comments'], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            comment.approved = True
+            comment.save()
+        self.assertEqual(len(self._payload(self.client.get(self.url))['comments']), 1)
+
+        # Category edits drop the render, the next read rebuilds it
+        self.category.name = "Adventure"
+        self.category.save()
+        self.assertFalse(PostRender.objects.filter(post=self.post).exists())
+        self.assertEqual(self._payload(self.client.get(self.url))['category']['name'], "Adventure")
+        self.assertTrue(PostRender.objects.filter(post=self.post).exists())
+
+    def test_accepted_encodings(self):
+        self.assertEqual(_accepted_encodings('gzip;q=1.0, br;q=0, identity'), {'gzip', 'identity'})
+        self.assertEqual(_accepted_encodings(None), set())
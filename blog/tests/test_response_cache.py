@@ -0,0 +1,95 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from blog.models import BlogImage, BlogPost, Category, Comment
+from blog.utils.response_cache import get_stats
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=True)
+class ResponseCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Travel")
+        self.post = BlogPost.objects.create(title="Cached post", content="Content", published=True, category=self.category)
+        self.other = BlogPost.objects.create(title="Other post", content="Content", published=True)
+
+    def _get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_repeated_reads_are_served_from_cache(self):
+        self.assertEqual(self._get('/api/posts/').get('X-Cache'), 'MISS')
+        # Hits and their validators only read the cache
+        with self.assertNumQueries(0):
+            response = self._get('/api/posts/')
+        self.assertEqual(response.get('X-Cache'), 'HIT')
+        self.assertEqual(get_stats()['hits'], 1)
+        self.assertEqual(get_stats()['misses'], 1)
+
+    def test_post_change_invalidates_detail_and_listing(self):
+        detail = f'/api/posts/{self.post.slug}/'
+        self._get(detail)
+        self._get('/api/posts/')
+
+        # Scopes are bumped once the change commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.title = "Renamed"
+            self.post.save()
+
+        self.assertEqual(self._get(detail).data['title'], "Renamed")
+        self.assertEqual(self._get('/api/posts/').get('X-Cache'), 'MISS')
+
+    def test_comment_only_invalidates_its_post(self):
+        detail = f'/api/posts/{self.post.slug}/'
+        other_detail = f'/api/posts/{self.other.slug}/'
+        self._get(detail)
+        self._get(other_detail)
+        self._get('/api/posts/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=self.post, content="Pending comment")
+
+        self.assertEqual(self._get(detail).get('X-Cache'), 'MISS')
+        self.assertEqual(self._get(other_detail).get('X-Cache'), 'HIT')
+        # Pending comments do not change listed counts
+        self.assertEqual(self._get('/api/posts/').get('X-Cache'), 'HIT')
+
+    def test_category_change_invalidates_posts_in_it(self):
+        detail = f'/api/posts/{self.post.slug}/'
+        self._get(detail)
+        self._get('/api/categories/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = "Trips"
+            self.category.save()
+
+        self.assertEqual(self._get(detail).data['category']['name'], "Trips")
+        self.assertEqual(self._get('/api/categories/').get('X-Cache'), 'MISS')
+
+    def test_bumps_wait_for_the_commit(self):
+        self._get('/api/posts/')
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.post.title = "Renamed"
+            self.post.save()
+            # A read before the commit caches under the old versions
+            self.assertEqual(self._get('/api/posts/').get('X-Cache'), 'HIT')
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self._get('/api/posts/').get('X-Cache'), 'MISS')
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_disabled_cache_is_bypassed(self):
+        self._get('/api/posts/')
+        self.assertIsNone(self._get('/api/posts/').get('X-Cache'))
+
+    def test_image_change_invalidates_post_detail(self):
+        detail = f'/api/posts/{self.post.slug}/'
+        self._get(detail)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BlogImage.objects.create(post=self.post, image='blog_images/example.webp')
+
+        self.assertEqual(len(self._get(detail).data['images']), 1)
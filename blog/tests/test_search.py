@@ -0,0 +1,56 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from blog.models import BlogPost, PostSearchDocument
+
+
+class PostSearchTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.title_match = BlogPost.objects.create(
+            title="Nashville travel guide",
+            content="<p>Everything about the city.</p>",
+            published=True,
+        )
+        self.content_match = BlogPost.objects.create(
+            title="Weekend plans",
+            content="<p>A short <strong>Nashville</strong> itinerary for travellers.</p>",
+            published=True,
+        )
+        self.markup_only = BlogPost.objects.create(
+            title="Unrelated",
+            content='<p class="nashville">Nothing to see here.</p>',
+            published=True,
+        )
+
+    def _search(self, query):
+        response = self.client.get('/api/posts/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_documents_are_maintained_on_save(self):
+        document = PostSearchDocument.objects.get(post=self.content_match)
+        self.assertNotIn('<strong>', document.body)
+
+        self.content_match.title = "Updated title"
+        self.content_match.save()
+        document.refresh_from_db()
+        self.assertEqual(document.title, "Updated title")
+
+    def test_results_are_ranked_and_ignore_markup(self):
+        results = self._search("nashville")
+
+        self.assertEqual([item['id'] for item in results], [self.title_match.id, self.content_match.id])
+        self.assertGreater(results[0]['search_rank'], results[1]['search_rank'])
+
+    def test_results_include_highlights(self):
+        results = self._search("itinerary")
+
+        self.assertEqual(len(results), 1)
+        self.assertIn('<mark>itinerary</mark>', results[0]['search_highlight'])
+
+    def test_prefix_and_all_terms_must_match(self):
+        self.assertEqual(len(self._search("nash weekend")), 1)
+        self.assertEqual(len(self._search("nashville missing")), 0)
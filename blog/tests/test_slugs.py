@@ -0,0 +1,63 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from blog.models import BlogPost, Category
+from blog.utils import slugs
+from blog.utils.slugs import allocate_slug, allocate_slugs
+
+
+class SlugAllocatorTestCase(TestCase):
+    def test_next_free_suffix_in_one_query(self):
+        for slug in ["weekly-update", "weekly-update-1", "weekly-update-3", "weekly-update-notes"]:
+            BlogPost.objects.create(title="Other", slug=slug, content="Content")
+
+        with self.assertNumQueries(1):
+            allocated = allocate_slugs(BlogPost, ["Weekly update"] * 3 + ["Weekly update 1", ""])
+        self.assertEqual(
+            allocated,
+            ["weekly-update-2", "weekly-update-4", "weekly-update-5", "weekly-update-1-1", "blogpost"],
+        )
+
+    def test_suffixes_across_bases_in_a_batch(self):
+        # "news-1" handed out for the second "News" is not reused for "News 1"
+        self.assertEqual(allocate_slugs(Category, ["News", "News", "News 1"]), ["news", "news-1", "news-1-1"])
+
+    def test_long_titles_leave_room_for_a_suffix(self):
+        slug = allocate_slug(Category, "x" * 200)
+        self.assertLessEqual(len(slug), Category._meta.get_field('slug').max_length - slugs.SUFFIX_ROOM)
+
+    def test_saves_allocate_unique_slugs(self):
+        first = BlogPost.objects.create(title="Weekly update", content="Content")
+        with self.assertNumQueries(1):
+            slug = allocate_slug(BlogPost, "Weekly update")
+        second = BlogPost.objects.create(title="Weekly update", content="Content")
+        self.assertEqual((first.slug, slug, second.slug), ("weekly-update", "weekly-update-1", "weekly-update-1"))
+        self.assertEqual(Category.objects.create(name="Weekly update").slug, "weekly-update")
+
+    def test_save_retries_a_slug_taken_concurrently(self):
+        BlogPost.objects.create(title="Race", content="Content")
+        stale = iter(["race"])
+        real = slugs.allocate_slug
+
+        # The first allocation misses the row another writer just saved
+        def allocate(*args, **kwargs):
+            return next(stale, None) or real(*args, **kwargs)
+
+        with patch.object(slugs, 'allocate_slug', side_effect=allocate):
+            post = BlogPost.objects.create(title="Race", content="Content")
+        self.assertEqual(post.slug, "race-1")
+
+    def test_fix_slugs_allocates_in_one_lookup(self):
+        BlogPost.objects.create(title="Same", content="Content")
+        post = BlogPost.objects.create(title="Same", content="Content")
+        BlogPost.objects.filter(pk=post.pk).update(slug='')
+
+        out = StringIO()
+        with patch.object(slugs, '_taken_suffixes', wraps=slugs._taken_suffixes) as lookup:
+            call_command('fix_slugs', stdout=out)
+        self.assertEqual(lookup.call_count, 1)
+        self.assertIn('Fixed 1 posts', out.getvalue())
+        self.assertEqual(BlogPost.objects.get(pk=post.pk).slug, "same-1")
@@ -0,0 +1,53 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient, APIRequestFactory
+
+from blog.models import BlogPost, Category, Comment
+from blog.views_comments import comment_counts
+
+
+class StatsEndpointsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('admin', password='secret'))
+        category = Category.objects.create(name="News")
+        first = BlogPost.objects.create(title="First", content="Content", published=True, category=category)
+        second = BlogPost.objects.create(title="Second", content="Content")
+        root = Comment.objects.create(post=first, content="Approved", approved=True)
+        Comment.objects.create(post=first, parent=root, content="Pending reply")
+        Comment.objects.create(post=second, content="Pending")
+        Comment.objects.create(post=second, content="Trashed", approved=True, is_trash=True)
+
+    def test_dashboard_stats_in_one_query_per_table(self):
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/dashboard/stats/')
+        self.assertEqual(response.data['data'], {
+            'total_posts': 2,
+            'published_posts': 1,
+            'draft_posts': 1,
+            'total_comments': 4,
+            'pending_comments': 2,
+            'total_categories': 1,
+        })
+
+    def test_empty_tables_count_zero(self):
+        Comment.objects.all().delete()
+        response = self.client.get('/api/dashboard/stats/')
+        self.assertEqual(response.data['data']['total_comments'], 0)
+        self.assertEqual(response.data['data']['pending_comments'], 0)
+
+    def test_comment_counts_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/comments/counts/')
+        self.assertEqual(response.data, {'all': 4, 'pending': 2, 'approved': 1, 'trash': 1})
+
+        request = APIRequestFactory().get('/api/comments/counts/')
+        with self.assertNumQueries(1):
+            response = comment_counts(request)
+        self.assertEqual(response.data, {
+            'total': 3,
+            'approved': 1,
+            'pending': 1,
+            'trashed': 1,
+            'posts': {'with_comments': 2, 'with_pending': 1},
+        })
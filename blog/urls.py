@@ -37,4 +37,5 @@ urlpatterns = [
     
     # Dashboard endpoints
     path('dashboard/stats/', views_dashboard.dashboard_stats, name='dashboard-stats'),
+    path('dashboard/cache-stats/', views_dashboard.cache_stats, name='dashboard-cache-stats'),
 ]
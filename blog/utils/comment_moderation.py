@@ -0,0 +1,137 @@
+"""
+Bulk comment moderation
+
+Moderation actions are applied to any number of comments with a single
+UPDATE inside a transaction instead of a load and full save() per comment.
+Bulk updates send no model signals, so the stored counters, response cache
+scopes and stored post renders the comment signals maintain (see
+blog.signals) are updated here for the affected posts. Deletes go through
+QuerySet.delete(), which removes replies and likes along with the selected
+comments and sends the signals that maintain all of that.
+"""
+
+import logging
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from . import counters, response_cache
+from .render_store import refresh_renders
+
+logger = logging.getLogger(__name__)
+
+# Field values set by each action; rows already in that state are untouched
+ACTIONS = {
+    'approve': {'approved': True, 'is_trash': False},
+    'unapprove': {'approved': False},
+    'trash': {'is_trash': True},
+    'restore': {'is_trash': False},
+    'delete': None,
+}
+
+
+def comment_status_counts():
+    """
+    Count all comments (replies included) by moderation status in one query
+
+    Returns:
+        dict: all, pending, approved and trash counts
+    """
+    from blog.models import Comment
+
+    # Aliased apart from the filtered fields, which later filters would
+    # otherwise resolve to the aggregates
+    counts = Comment.objects.aggregate(
+        all_count=Count('id'),
+        pending_count=Count('id', filter=Q(approved=False, is_trash=False)),
+        approved_count=Count('id', filter=Q(approved=True, is_trash=False)),
+        trash_count=Count('id', filter=Q(is_trash=True)),
+    )
+    return {name[:-len('_count')]: count for name, count in counts.items()}
+
+
+def _refresh_renders(post_ids):
+    try:
+        refresh_renders(post_ids)
+    except Exception as e:
+        logger.error(f"Error rendering posts {sorted(post_ids)}: {str(e)}")
+
+
+def _sync_updated(rows, fields):
+    """
+    Update what the comment signals would have for bulk-updated rows
+
+    Args:
+        rows (list): (id, post_id, parent_id, approved, is_trash) of the
+            rows before the update
+        fields (dict): Field values the rows were updated with
+    """
+    from blog.models import BlogPost
+
+    # Mirror update_comment_counters_on_save
+    changes = []
+    for _, post_id, parent_id, approved, is_trash in rows:
+        was_counted = counters.is_counted(approved, is_trash)
+        is_counted = counters.is_counted(
+            fields.get('approved', approved), fields.get('is_trash', is_trash)
+        )
+        if was_counted != is_counted:
+            changes.append((post_id, parent_id, 1 if is_counted else -1))
+    counters.apply_comment_changes(changes)
+
+    # Mirror invalidate_comment_cache: listings and renders only show
+    # approved comments
+    post_ids = {row[1] for row in rows}
+    rendered_post_ids = {
+        row[1] for row in rows
+        if row[3] or fields.get('approved')
+    }
+    slugs = BlogPost.objects.filter(pk__in=post_ids).order_by().values_list('slug', flat=True)
+    scopes = [response_cache.post_scope(slug) for slug in slugs]
+    if rendered_post_ids:
+        scopes.append(response_cache.POSTS_SCOPE)
+        transaction.on_commit(lambda: _refresh_renders(rendered_post_ids))
+    response_cache.bump(*scopes)
+
+
+def moderate_comments(action, queryset):
+    """
+    Apply a moderation action to every comment of a queryset
+
+    Args:
+        action (str): One of ACTIONS
+        queryset: Comments to act on
+
+    Returns:
+        list: Ids of the comments that changed (for 'delete', the selected
+            comments; their replies are deleted along with them)
+
+    Raises:
+        ValueError: For an unknown action
+    """
+    from blog.models import Comment
+
+    if action not in ACTIONS:
+        raise ValueError(f"Unknown action: {action}")
+    fields = ACTIONS[action]
+
+    with transaction.atomic():
+        if fields is not None:
+            # Skip rows already in the target state so they keep updated_at
+            queryset = queryset.exclude(**fields)
+        columns = ('id', 'post_id', 'parent_id', 'approved', 'is_trash')
+        rows = list(queryset.order_by().select_for_update().values_list(*columns))
+        affected_ids = [row[0] for row in rows]
+        if not affected_ids:
+            return []
+
+        if fields is None:
+            # Replies and likes cascade; the delete signals keep counters,
+            # cache scopes and renders up to date
+            Comment.objects.filter(id__in=affected_ids).delete()
+        else:
+            Comment.objects.filter(id__in=affected_ids).update(updated_at=timezone.now(), **fields)
+            _sync_updated(rows, fields)
+
+    logger.info(f"Bulk {action} of {len(affected_ids)} comments")
+    return affected_ids
@@ -0,0 +1,172 @@
+"""
+In-memory comment tree assembly for post detail responses
+"""
+
+import logging
+from collections import defaultdict
+from django.db.models import CharField, Exists, ExpressionWrapper, OuterRef, Q, Value
+from django.db.models.functions import Concat
+
+from . import like_buffer
+
+logger = logging.getLogger(__name__)
+
+# Defaults used by the post detail serializers
+DEFAULT_MAX_DEPTH = 3
+DEFAULT_REPLIES_LIMIT = 5
+
+
+def load_comment_tree(post, max_depth=DEFAULT_MAX_DEPTH, replies_limit=DEFAULT_REPLIES_LIMIT):
+    """
+    Load every approved, non-trashed comment of a post and link it into a tree.
+
+    Runs exactly two queries regardless of thread size: one for the comments
+    (bounded by ``level`` so nothing deeper than what will be rendered is read)
+    and one for their likes. Each returned root comment carries the attributes
+    ``CommentSerializer`` looks for instead of querying:
+
+    - ``tree_replies``: the child comments to render (oldest first, capped)
+    - ``tree_liked_by``: names of the users who liked the comment, buffered
+      likes included
+
+    Reply and like counts come from the comments' stored counters.
+
+    Args:
+        post: BlogPost instance
+        max_depth: Number of reply levels rendered below the roots
+        replies_limit: Maximum replies rendered per comment (falsy for no cap)
+
+    Returns:
+        list: Root comments ordered newest first
+    """
+    from blog.models import Comment, CommentLike
+
+    comments = list(
+        Comment.objects.filter(
+            post=post,
+            approved=True,
+            is_trash=False,
+            level__lte=max_depth,
+        ).order_by('created_at', 'id')
+    )
+
+    liked_by = defaultdict(list)
+    if comments:
+        likes = CommentLike.objects.filter(
+            comment__post=post,
+            comment__approved=True,
+            comment__is_trash=False,
+            comment__level__lte=max_depth,
+        ).order_by('-created_at').values_list('comment_id', 'user_name')
+        for comment_id, user_name in likes:
+            liked_by[comment_id].append(user_name)
+    liked_by = like_buffer.apply_pending_likers(liked_by, [comment.id for comment in comments])
+
+    by_id = {comment.id: comment for comment in comments}
+    children = defaultdict(list)
+    roots = []
+
+    for comment in comments:
+        # Reuse the already loaded post so post_title does not query
+        comment.post = post
+        comment.tree_liked_by = liked_by.get(comment.id, [])
+        if comment.parent_id is None:
+            roots.append(comment)
+        elif comment.parent_id in by_id:
+            children[comment.parent_id].append(comment)
+        # Replies whose parent is unapproved or trashed stay hidden
+
+    for comment in comments:
+        replies = children.get(comment.id, [])
+        comment.tree_replies = replies[:replies_limit] if replies_limit else replies
+
+    roots.reverse()
+    return roots
+
+
+def build_comment_tree(post, context=None, max_depth=DEFAULT_MAX_DEPTH, replies_limit=DEFAULT_REPLIES_LIMIT):
+    """
+    Serialize the approved comment thread of a post in a constant number of queries.
+
+    Produces the same nested structure as recursive ``CommentSerializer``
+    rendering with ``max_depth``/``replies_limit`` in the context.
+
+    Args:
+        post: BlogPost instance
+        context: Serializer context to extend (request, etc.)
+        max_depth: Number of reply levels rendered below the roots
+        replies_limit: Maximum replies rendered per comment
+
+    Returns:
+        list: Serialized root comments
+    """
+    from blog.serializers import CommentSerializer
+
+    roots = load_comment_tree(post, max_depth=max_depth, replies_limit=replies_limit)
+
+    tree_context = dict(context or {})
+    tree_context.update({
+        'max_depth': max_depth,
+        'current_depth': 0,
+        'replies_limit': replies_limit,
+    })
+
+    return CommentSerializer(roots, many=True, context=tree_context).data
+
+
+def subtree_queryset(comment, depth=None):
+    """
+    Approved, non-trashed replies below a comment, at any depth up to ``depth``.
+
+    Descendants are selected with a prefix match on ``path`` (indexed), and
+    replies under a hidden (unapproved or trashed) reply are left out like in
+    the rendered thread by a correlated subquery looking for a hidden
+    ancestor, so the query has the same size however many branches are
+    hidden. No query is run here; the returned queryset is evaluated by the
+    caller.
+
+    Args:
+        comment: Comment whose replies to select
+        depth: Number of reply levels below the comment (None for all)
+
+    Returns:
+        QuerySet: The visible replies
+    """
+    from blog.models import Comment
+
+    descendants = Comment.objects.filter(post_id=comment.post_id, path__startswith=f"{comment.path}/")
+    if depth is not None:
+        descendants = descendants.filter(level__lte=comment.level + depth)
+
+    visible = Q(approved=True, is_trash=False)
+    # A hidden reply whose path is a prefix of the outer reply's path
+    hidden_ancestors = Comment.objects.filter(
+        post_id=comment.post_id,
+        path__startswith=f"{comment.path}/",
+    ).exclude(visible).annotate(
+        descendant_path=ExpressionWrapper(OuterRef('path'), output_field=CharField()),
+    ).filter(
+        descendant_path__startswith=Concat('path', Value('/')),
+    )
+    return descendants.filter(visible).exclude(Exists(hidden_ancestors))
+
+
+def attach_likes(comments):
+    """
+    Load the like names of a page of comments in one query, as the
+    ``tree_liked_by`` attribute CommentSerializer looks for
+
+    Args:
+        comments (list): Comment instances
+    """
+    from blog.models import CommentLike
+
+    liked_by = defaultdict(list)
+    likes = CommentLike.objects.filter(
+        comment_id__in=[comment.id for comment in comments]
+    ).order_by('-created_at').values_list('comment_id', 'user_name')
+    for comment_id, user_name in likes:
+        liked_by[comment_id].append(user_name)
+    liked_by = like_buffer.apply_pending_likers(liked_by, [comment.id for comment in comments])
+    for comment in comments:
+        comment.tree_liked_by = liked_by.get(comment.id, [])
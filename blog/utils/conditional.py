@@ -0,0 +1,126 @@
+"""
+Conditional GET support (ETag / Last-Modified / 304) for public read endpoints
+
+Single-post validators are computed from the ``updated_at`` timestamps and
+row counts of the post and what it renders, in one indexed aggregate query.
+Listings use the response cache scope versions they are cached under (see
+blog.utils.response_cache) as their ETag instead of aggregating whole tables,
+and send no Last-Modified, which a deleted newest row would move backwards.
+Either way, a client revalidating an unchanged resource gets a 304 before any
+serialization happens.
+"""
+
+import hashlib
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.views.decorators.http import condition
+
+from . import response_cache
+from .response_cache import CATEGORIES_SCOPE, POSTS_SCOPE
+
+
+def _fingerprint(*parts):
+    return hashlib.md5(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def _latest(*timestamps):
+    timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+    return max(timestamps) if timestamps else None
+
+
+def _related_state(model, lookup, date_field):
+    """Count and latest timestamp of related rows, as correlated subqueries"""
+    rows = model.objects.filter(**{lookup: OuterRef('pk')}).order_by().values(lookup)
+    return (
+        Subquery(rows.annotate(total=Count('pk')).values('total')),
+        Subquery(rows.annotate(latest=Max(date_field)).values('latest')),
+    )
+
+
+def post_validators(request, slug=None, **kwargs):
+    """
+    Validators of a single-post response, covering everything it renders:
+    the post, its category, comments, comment likes and images
+
+    Returns:
+        tuple: (etag, last_modified), both None if the post does not exist
+    """
+    from blog.models import BlogImage, BlogPost, Comment, CommentLike
+
+    comments_total, comments_latest = _related_state(Comment, 'post', 'updated_at')
+    likes_total, likes_latest = _related_state(CommentLike, 'comment__post', 'created_at')
+    images_total, images_latest = _related_state(BlogImage, 'post', 'updated_at')
+
+    state = BlogPost.objects.filter(slug=slug).values(
+        'id', 'updated_at', 'category__updated_at'
+    ).annotate(
+        comments_total=comments_total,
+        comments_latest=comments_latest,
+        likes_total=likes_total,
+        likes_latest=likes_latest,
+        images_total=images_total,
+        images_latest=images_latest,
+    ).first()
+
+    if state is None:
+        return None, None
+
+    etag = _fingerprint('post', *(state[key] for key in sorted(state)))
+    last_modified = _latest(
+        state['updated_at'], state['category__updated_at'], state['comments_latest'],
+        state['likes_latest'], state['images_latest'],
+    )
+    return etag, last_modified
+
+
+def _list_validators(name, request, scopes):
+    """
+    ETag of a listing from the versions of the scopes it is cached under
+
+    Versions only change for every process when the cache is shared, which
+    is also when the response cache is enabled; otherwise listings are not
+    validated, since another process could answer 304 for a change it never
+    saw.
+    """
+    if not response_cache.is_enabled():
+        return None, None
+    versions = response_cache.get_versions(scopes)
+    query = sorted(f"{key}={value}" for key, values in request.GET.lists() for value in values)
+    etag = _fingerprint(name, '&'.join(query), *(versions[scope] for scope in scopes))
+    return etag, None
+
+
+def post_list_validators(request, *args, **kwargs):
+    """Validators of post listings (posts, comment counts and categories)"""
+    return _list_validators('posts', request, [POSTS_SCOPE])
+
+
+def category_validators(request, *args, **kwargs):
+    """Validators of category responses (categories and their post counts)"""
+    return _list_validators('categories', request, [CATEGORIES_SCOPE])
+
+
+def slug_list_validators(request, *args, **kwargs):
+    """Validators of the slug list"""
+    return _list_validators('slugs', request, [POSTS_SCOPE])
+
+
+def conditional(validators):
+    """
+    Answer conditional GET requests from the given validators
+
+    Wraps ``django.views.decorators.http.condition`` so the validators are
+    computed once per request and used for both ETag and Last-Modified.
+
+    Args:
+        validators: Callable ``validators(request, *args, **kwargs)``
+            returning ``(etag, last_modified)``
+    """
+    def compute(request, *args, **kwargs):
+        if not hasattr(request, '_blog_validators'):
+            request._blog_validators = validators(request, *args, **kwargs)
+        return request._blog_validators
+
+    return condition(
+        etag_func=lambda request, *args, **kwargs: compute(request, *args, **kwargs)[0],
+        last_modified_func=lambda request, *args, **kwargs: compute(request, *args, **kwargs)[1],
+    )
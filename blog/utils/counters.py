@@ -0,0 +1,167 @@
+"""
+Stored comment, like and post counters
+
+Listings and comment threads read counts from columns instead of counting
+rows per request:
+
+- ``BlogPost.approved_comment_count``: approved, non-trashed comments (replies
+  included) of the post
+- ``Comment.approved_reply_count``: approved, non-trashed direct replies
+- ``Comment.like_count``: likes of the comment
+- ``Category.published_post_count``: published posts in the category
+
+The counters are adjusted with ``F()`` updates in the same transaction as the
+change they follow (see blog.signals and blog.utils.comment_moderation), so
+concurrent writers never overwrite each other's increments. Writes that
+bypass both (raw SQL, fixtures) can leave them drifting;
+reconcile_counters() recounts them from the rows.
+"""
+
+import logging
+from collections import defaultdict
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+logger = logging.getLogger(__name__)
+
+
+def is_counted(approved, is_trash):
+    """Check whether a comment in this state counts as approved"""
+    return bool(approved) and not is_trash
+
+
+def _adjust(model, field, deltas):
+    """
+    Add per-row deltas to a counter column
+
+    Rows sharing a delta are updated by one statement, so the number of
+    queries depends on the distinct deltas rather than the number of rows.
+
+    Args:
+        model: Model owning the counter
+        field (str): Counter column
+        deltas (dict): pk -> amount to add
+    """
+    by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if pk is not None and delta:
+            by_delta[delta].append(pk)
+    for delta, pks in by_delta.items():
+        model.objects.filter(pk__in=pks).update(**{field: F(field) + delta})
+
+
+def apply_comment_changes(changes):
+    """
+    Adjust post comment and parent reply counters for comment state changes
+
+    Args:
+        changes: Iterable of (post_id, parent_id, delta) tuples, with delta +1
+            for a comment that became counted and -1 for one that stopped
+            counting (or was deleted)
+    """
+    from blog.models import BlogPost, Comment
+
+    post_deltas = defaultdict(int)
+    parent_deltas = defaultdict(int)
+    for post_id, parent_id, delta in changes:
+        post_deltas[post_id] += delta
+        if parent_id is not None:
+            parent_deltas[parent_id] += delta
+
+    _adjust(BlogPost, 'approved_comment_count', post_deltas)
+    _adjust(Comment, 'approved_reply_count', parent_deltas)
+
+
+def adjust_like_count(comment_id, delta):
+    """Add delta to a comment's like counter"""
+    from blog.models import Comment
+
+    _adjust(Comment, 'like_count', {comment_id: delta})
+
+
+def recount_like_counts(comment_ids):
+    """
+    Recount the like counters of some comments from their like rows
+
+    Used after bulk like writes, which cannot tell which rows they changed.
+
+    Args:
+        comment_ids: Comments whose counters to recount
+    """
+    from blog.models import Comment, CommentLike
+
+    likes = CommentLike.objects.filter(comment=OuterRef('pk')).order_by().values('comment')
+    Comment.objects.filter(pk__in=set(comment_ids)).update(like_count=Coalesce(
+        Subquery(likes.annotate(total=Count('pk')).values('total')), 0,
+    ))
+
+
+def adjust_category_post_count(old_category_id, new_category_id):
+    """
+    Move a published post between category counters
+
+    Args:
+        old_category_id: Category the post was counted in (None if it was not)
+        new_category_id: Category the post is counted in now (None if it is not)
+    """
+    from blog.models import Category
+
+    if old_category_id == new_category_id:
+        return
+    _adjust(Category, 'published_post_count', {old_category_id: -1, new_category_id: 1})
+
+
+def _counter_definitions():
+    from blog.models import BlogPost, Category, Comment, CommentLike
+
+    return [
+        (BlogPost, 'approved_comment_count', Comment.objects.filter(
+            post=OuterRef('pk'), approved=True, is_trash=False,
+        ).values('post')),
+        (Comment, 'approved_reply_count', Comment.objects.filter(
+            parent=OuterRef('pk'), approved=True, is_trash=False,
+        ).values('parent')),
+        (Comment, 'like_count', CommentLike.objects.filter(
+            comment=OuterRef('pk'),
+        ).values('comment')),
+        (Category, 'published_post_count', BlogPost.objects.filter(
+            category=OuterRef('pk'), published=True,
+        ).values('category')),
+    ]
+
+
+def reconcile_counters(batch_size=1000):
+    """
+    Recount every stored counter from the rows and repair the drifted ones
+
+    Each table is walked in primary key batches; a batch costs one UPDATE
+    per counter that only writes the rows whose stored value is wrong.
+
+    Args:
+        batch_size (int): Rows checked per statement
+
+    Returns:
+        dict: "Model.field" -> number of rows repaired
+    """
+    repaired = {}
+    for model, field, related in _counter_definitions():
+        label = f"{model.__name__}.{field}"
+        actual = Coalesce(
+            Subquery(related.order_by().annotate(total=Count('pk')).values('total')),
+            0,
+        )
+        repaired[label] = 0
+        last_pk = 0
+        while True:
+            pks = list(
+                model.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            last_pk = pks[-1]
+            repaired[label] += model.objects.filter(pk__in=pks).filter(
+                ~Q(**{field: actual})
+            ).update(**{field: actual})
+        if repaired[label]:
+            logger.warning(f"Repaired {repaired[label]} drifted {label} counters")
+    return repaired
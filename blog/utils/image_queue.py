@@ -0,0 +1,289 @@
+"""
+Database-backed queue for image optimization
+
+Uploads are stored untouched (under their content hash, see
+blog.utils.media_store) and an ImageJob row is queued in the same
+transaction as the post or image row referencing them (editor uploads, which
+have no row, are queued right after the file is stored), so requests never
+wait for the resize and WebP encode. The
+process_image_jobs worker claims jobs with a conditional UPDATE (safe with
+several workers on any database), optimizes the stored original, generates
+its responsive width variants and swaps the result in, deleting the original
+only once nothing references it. Outputs are recorded as MediaAsset rows so
+identical uploads reuse them instead of being processed again.
+"""
+
+import logging
+import os
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .image_utils import ImageProcessor
+from .media_store import file_digest, save_hashed
+
+logger = logging.getLogger(__name__)
+
+# Attempts before a job is marked failed, with a growing delay in between
+MAX_ATTEMPTS = 3
+RETRY_DELAY = timedelta(minutes=1)
+
+# A processing job whose worker died is claimed again after this long
+STALE_AFTER = timedelta(minutes=10)
+
+def enqueue_editor_upload(path, digest=''):
+    """Queue an editor upload stored at ``path`` for optimization"""
+    from blog.models import ImageJob
+
+    return ImageJob.objects.create(kind=ImageJob.KIND_EDITOR_UPLOAD, original_path=path, sha256=digest)
+
+
+def claim_job(pk=None):
+    """
+    Claim the next runnable job
+
+    Args:
+        pk (int): Claim this job only, if it is runnable
+
+    Returns:
+        ImageJob: The claimed job, or None if the queue is empty
+    """
+    from blog.models import ImageJob
+
+    now = timezone.now()
+    runnable = ImageJob.objects.filter(
+        Q(status=ImageJob.STATUS_PENDING, run_after__lte=now) |
+        Q(status=ImageJob.STATUS_PROCESSING, started_at__lt=now - STALE_AFTER)
+    ).order_by('run_after', 'id')
+    if pk is not None:
+        runnable = runnable.filter(pk=pk)
+
+    for job in runnable.only('id', 'status', 'started_at')[:10]:
+        # Only one worker can move the row out of the state it was read in
+        claimed = ImageJob.objects.filter(
+            pk=job.pk, status=job.status, started_at=job.started_at
+        ).update(
+            status=ImageJob.STATUS_PROCESSING,
+            started_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return ImageJob.objects.get(pk=job.pk)
+    return None
+
+
+def _optimize(storage, path, **options):
+    with storage.open(path, 'rb') as source:
+        optimized = ImageProcessor.optimize_image(source, **options)
+        # optimize_image hands back its input when it cannot decode it
+        if optimized is source:
+            raise ValueError(f"Could not optimize {path}")
+    return optimized
+
+
+def generate_variants(storage, source_path, target_dir):
+    """
+    Create and store the responsive variants of an image
+
+    Args:
+        storage: Storage holding the image
+        source_path (str): Image to resize, ideally the full-size original
+        target_dir (str): Directory of the image; variants go to its
+            ``variants/`` subdirectory, named by content hash
+
+    Returns:
+        list: {format, width, height, name} dicts for the stored variants
+    """
+    with storage.open(source_path, 'rb') as source:
+        variants = ImageProcessor.create_variants(
+            source, settings.IMAGE_VARIANT_WIDTHS, settings.IMAGE_VARIANT_FORMATS
+        )
+    variants_dir = os.path.join(target_dir, 'variants')
+    stored = []
+    for fmt, width, height, content in variants:
+        with content:
+            name = save_hashed(storage, variants_dir, content, extension=f".{fmt}")
+        stored.append({'format': fmt, 'width': width, 'height': height, 'name': name})
+    return stored
+
+
+def _digest_of(storage, path):
+    with storage.open(path, 'rb') as source:
+        return file_digest(source)
+
+
+def _process_original(storage, job, with_variants):
+    """Optimize a job's original and record the result as a MediaAsset"""
+    from blog.models import MediaAsset
+
+    target_dir = os.path.dirname(job.original_path)
+    optimized = _optimize(storage, job.original_path)
+    with optimized:
+        optimized_digest = file_digest(optimized)
+        optimized_size = optimized.size
+        name = save_hashed(
+            storage, target_dir, optimized,
+            extension=os.path.splitext(optimized.name)[1], digest=optimized_digest
+        )
+    variants = generate_variants(storage, job.original_path, target_dir) if with_variants else []
+
+    # A concurrent job for identical content may have won; reuse its row
+    asset, _ = MediaAsset.objects.get_or_create(sha256=job.sha256, defaults={
+        'name': name,
+        'optimized_sha256': optimized_digest,
+        'size': optimized_size,
+        'variants': variants,
+    })
+    return asset
+
+
+def _asset_for(storage, job, with_variants):
+    """Reuse the output of identical content processed before, or create it"""
+    from blog.models import MediaAsset
+
+    if not job.sha256:
+        # Queued before uploads were content-addressed
+        job.sha256 = _digest_of(storage, job.original_path)
+    asset = MediaAsset.objects.filter(sha256=job.sha256).first()
+    if asset is None:
+        return _process_original(storage, job, with_variants)
+
+    logger.info(f"Reusing optimized {asset.name} for {job.original_path}")
+    if with_variants and not asset.variants:
+        # First processed as an editor upload, which has no variants
+        asset.variants = generate_variants(storage, asset.name, os.path.dirname(asset.name))
+        asset.save(update_fields=['variants'])
+    return asset
+
+
+def _delete_original(storage, job):
+    """Delete a swapped-out original unless identical uploads still use it"""
+    from blog.models import BlogImage, BlogPost, ImageJob
+
+    path = job.original_path
+    if path == job.optimized_path:
+        return
+    still_used = (
+        ImageJob.objects.filter(
+            original_path=path, status__in=[ImageJob.STATUS_PENDING, ImageJob.STATUS_PROCESSING]
+        ).exclude(pk=job.pk).exists()
+        or BlogPost.objects.filter(featured_image=path).exists()
+        or BlogImage.objects.filter(image=path).exists()
+    )
+    if not still_used:
+        storage.delete(path)
+
+
+def _swap_field(model, object_id, field_name, variants_field, job):
+    """
+    Point a model's image field at the optimized file of its upload and
+    its responsive variants
+    """
+    from blog.models import ImageJob
+
+    instance = model.objects.filter(pk=object_id).first()
+    field_file = getattr(instance, field_name, None) if instance else None
+    if not field_file or field_file.name != job.original_path:
+        # Deleted or replaced by a newer upload, which has its own job
+        return ImageJob.STATUS_SKIPPED
+
+    storage = field_file.storage
+    asset = _asset_for(storage, job, with_variants=True)
+    job.optimized_path = asset.name
+
+    with transaction.atomic():
+        instance = model.objects.select_for_update().filter(pk=object_id).first()
+        if instance is None or getattr(instance, field_name).name != job.original_path:
+            # The stored output stays available to identical uploads
+            return ImageJob.STATUS_SKIPPED
+        getattr(instance, field_name).name = asset.name
+        setattr(instance, variants_field, asset.variants)
+        update_fields = [field_name, variants_field]
+        if any(field.name == 'updated_at' for field in model._meta.fields):
+            update_fields.append('updated_at')
+        # A regular save so cache invalidation and re-rendering signals run
+        instance.save(update_fields=update_fields)
+
+    _delete_original(storage, job)
+    return ImageJob.STATUS_DONE
+
+
+def _optimize_editor_upload(job):
+    from django.core.files.storage import default_storage
+    from blog.models import BlogPost, ImageJob
+
+    if not default_storage.exists(job.original_path):
+        return ImageJob.STATUS_SKIPPED
+
+    asset = _asset_for(default_storage, job, with_variants=False)
+    job.optimized_path = asset.name
+
+    # Posts saved before the upload was processed still link the original;
+    # saving them rewrites the link (see BlogPost.save)
+    for post in BlogPost.objects.filter(content__contains=job.original_path):
+        post.save(update_fields=['content', 'updated_at'])
+
+    # The original is kept: unsaved drafts may still link it, and it can be
+    # garbage collected once nothing does
+    return ImageJob.STATUS_DONE
+
+
+def process_job(job):
+    """
+    Run a claimed job and record its outcome
+
+    Returns:
+        str: The job's new status
+    """
+    from blog.models import BlogImage, BlogPost, ImageJob
+
+    try:
+        if job.kind == ImageJob.KIND_FEATURED_IMAGE:
+            status = _swap_field(BlogPost, job.object_id, 'featured_image', 'featured_image_variants', job)
+        elif job.kind == ImageJob.KIND_BLOG_IMAGE:
+            status = _swap_field(BlogImage, job.object_id, 'image', 'variants', job)
+        else:
+            status = _optimize_editor_upload(job)
+        job.error = ''
+    except Exception as e:
+        logger.error(f"Error processing image job {job.pk} ({job.original_path}): {str(e)}")
+        job.error = str(e)
+        if job.attempts >= MAX_ATTEMPTS:
+            status = ImageJob.STATUS_FAILED
+        else:
+            status = ImageJob.STATUS_PENDING
+            job.run_after = timezone.now() + RETRY_DELAY * job.attempts
+
+    job.status = status
+    job.finished_at = timezone.now() if status != ImageJob.STATUS_PENDING else None
+    job.save(update_fields=['status', 'sha256', 'optimized_path', 'error', 'run_after', 'finished_at'])
+    logger.info(f"Image job {job.pk} ({job.original_path}): {status}")
+    return status
+
+
+def run_worker(once=False, poll_interval=5, max_jobs=None):
+    """
+    Process queued jobs until stopped
+
+    Args:
+        once (bool): Exit as soon as the queue is empty
+        poll_interval (float): Seconds to sleep when the queue is empty
+        max_jobs (int): Exit after this many jobs
+
+    Returns:
+        int: Number of jobs processed
+    """
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        job = claim_job()
+        if job is None:
+            if once:
+                break
+            time.sleep(poll_interval)
+            continue
+        process_job(job)
+        processed += 1
+    return processed
@@ -2,17 +2,32 @@
 Image utility functions for the blog application
 """
 
+import io
 import os
 import logging
-from PIL import Image, ImageOps
+import tempfile
+from PIL import ExifTags, Image, ImageOps
 from io import BytesIO
-from django.core.files.base import ContentFile
+from django.core.files.base import ContentFile, File
 from django.conf import settings
 from django.core.files.storage import default_storage
 import mimetypes
 
 logger = logging.getLogger(__name__)
 
+class _SpooledImageFile(tempfile.SpooledTemporaryFile):
+    """
+    Spooled temporary file that hides its descriptor while in memory
+
+    Pillow encoders write to fileno() when there is one, which would make
+    every output roll over to disk.
+    """
+
+    def fileno(self):
+        if not self._rolled:
+            raise io.UnsupportedOperation('fileno')
+        return super().fileno()
+
 class ImageProcessor:
     """
     Image processing utility class for handling blog images
@@ -33,11 +48,22 @@ class ImageProcessor:
     DEFAULT_MAX_HEIGHT = 800
     THUMBNAIL_SIZE = (300, 200)
     
+    # Decode at least this many times the target size before the final
+    # resize, so draft mode and reduce() don't cost quality
+    REDUCING_GAP = 2
+    
+    # EXIF orientations that swap width and height
+    TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+    
     @classmethod
     def optimize_image(cls, image_file, max_width=None, max_height=None, quality=None, convert_to_webp=True):
         """
         Optimize an image file by resizing and compressing
         
+        The image is decoded once, at a reduced scale when it is being
+        downscaled (see decode_scaled), and encoded straight into a spooled
+        temporary file.
+        
         Args:
             image_file: Django UploadedFile or file-like object
             max_width: Maximum width in pixels
@@ -46,7 +72,7 @@ class ImageProcessor:
             convert_to_webp: Whether to convert to WebP format
             
         Returns:
-            ContentFile: Optimized image file
+            File: Optimized image file
         """
         try:
             # Set defaults
@@ -54,64 +80,141 @@ class ImageProcessor:
             max_height = max_height or cls.DEFAULT_MAX_HEIGHT
             quality = quality or cls.DEFAULT_QUALITY
             
-            # Open image
-            img = Image.open(image_file)
+            # Open image (header only) and work out the output size
+            img = cls.open_image(image_file)
+            source_format = img.format
+            original_width, original_height = cls.oriented_size(img)
+            ratio = min(max_width / original_width, max_height / original_height, 1)
+            new_width = max(1, int(original_width * ratio))
+            new_height = max(1, int(original_height * ratio))
             
-            # Auto-rotate based on EXIF data
-            img = ImageOps.exif_transpose(img)
+            # Decode, auto-rotated based on EXIF data
+            img = cls.decode_scaled(img, (new_width, new_height))
             
             # Convert to RGB if necessary (for WebP/JPEG)
-            if img.mode in ('RGBA', 'LA', 'P') and convert_to_webp:
+            if img.mode in ('RGBA', 'LA') and convert_to_webp:
                 # Create white background for transparent images
                 background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+                background.paste(img, mask=img.split()[-1])
                 img = background
             elif img.mode not in ('RGB', 'RGBA'):
                 img = img.convert('RGB')
             
             # Resize if necessary
-            original_width, original_height = img.size
-            if original_width > max_width or original_height > max_height:
-                # Calculate new size maintaining aspect ratio
-                ratio = min(max_width / original_width, max_height / original_height)
-                new_width = int(original_width * ratio)
-                new_height = int(original_height * ratio)
-                
+            if img.size != (new_width, new_height):
                 img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+            if ratio < 1:
                 logger.info(f"Resized image from {original_width}x{original_height} to {new_width}x{new_height}")
             
             # Save optimized image
-            img_io = BytesIO()
-            
-            if convert_to_webp and img.mode in ('RGB', 'RGBA'):
-                # Save as WebP
-                img.save(img_io, format='WEBP', quality=quality, optimize=True)
-                
+            if convert_to_webp:
                 # Generate new filename with .webp extension
-                original_name = getattr(image_file, 'name', 'image.jpg')
+                original_name = getattr(image_file, 'name', None) or 'image.jpg'
                 name_without_ext = os.path.splitext(original_name)[0]
                 new_filename = f"{name_without_ext}.webp"
+                optimized = cls.encode(img, new_filename, format='WEBP', quality=quality, optimize=True)
                 
                 logger.info(f"Converted image to WebP: {new_filename}")
             else:
-                # Keep original format
-                img_format = img.format or 'JPEG'
-                img.save(img_io, format=img_format, quality=quality, optimize=True)
+                # Keep original format (transforms above drop img.format)
+                img_format = source_format or 'JPEG'
+                new_filename = getattr(image_file, 'name', None) or 'image.jpg'
+                optimized = cls.encode(img, new_filename, format=img_format, quality=quality, optimize=True)
                 
-                new_filename = getattr(image_file, 'name', 'image.jpg')
                 logger.info(f"Optimized image in {img_format} format: {new_filename}")
             
-            # Create ContentFile
-            img_io.seek(0)
-            return ContentFile(img_io.getvalue(), name=new_filename)
+            return optimized
             
         except Exception as e:
             logger.error(f"Error optimizing image: {str(e)}")
             # Return original file if optimization fails
             return image_file
     
+    @classmethod
+    def open_image(cls, image_file, max_pixels=None):
+        """
+        Open an image reading only its header
+        
+        Pillow decodes lazily, so the format and size are known here without
+        any pixel data having been decoded.
+        
+        Args:
+            image_file: Django File or file-like object
+            max_pixels: Pixel budget (default: settings.IMAGE_MAX_PIXELS)
+            
+        Returns:
+            Image: The opened, not yet decoded image
+            
+        Raises:
+            ValueError: If the image is over the pixel budget, which guards
+                against decompression bombs
+        """
+        max_pixels = max_pixels or settings.IMAGE_MAX_PIXELS
+        img = Image.open(image_file)
+        width, height = img.size
+        if width * height > max_pixels:
+            raise ValueError(f"Image dimensions {width}x{height} exceed the limit of {max_pixels} pixels")
+        return img
+    
+    @classmethod
+    def _is_transposed(cls, img):
+        return img.getexif().get(ExifTags.Base.Orientation) in cls.TRANSPOSED_ORIENTATIONS
+    
+    @classmethod
+    def oriented_size(cls, img):
+        """Size of an opened image once its EXIF orientation is applied"""
+        width, height = img.size
+        return (height, width) if cls._is_transposed(img) else (width, height)
+    
+    @classmethod
+    def decode_scaled(cls, img, target_size):
+        """
+        Decode an opened image at no more than about twice a target size
+        
+        JPEGs are decoded at a reduced DCT scale (draft mode), which skips
+        most of the decoding work and memory. Other formats are shrunk by an
+        integer factor with reduce() right after decoding. Either way the
+        caller's final LANCZOS resize runs on a small bitmap.
+        
+        Args:
+            img: Image from open_image
+            target_size: (width, height) the caller will resize to, in the
+                EXIF-oriented frame
+            
+        Returns:
+            Image: Decoded and EXIF-transposed image, in RGB, RGBA, L or LA
+        """
+        gap_width, gap_height = (side * cls.REDUCING_GAP for side in target_size)
+        if img.format == 'JPEG':
+            draft_size = (gap_height, gap_width) if cls._is_transposed(img) else (gap_width, gap_height)
+            img.draft(img.mode, tuple(int(side) for side in draft_size))
+        
+        ImageOps.exif_transpose(img, in_place=True)
+        if img.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            img = img.convert('RGBA' if 'transparency' in img.info or img.mode == 'PA' else 'RGB')
+        
+        factor = int(min(img.width / gap_width, img.height / gap_height))
+        if factor > 1:
+            img = img.reduce(factor)
+        return img
+    
+    @classmethod
+    def encode(cls, img, name, **save_options):
+        """
+        Encode an image into a spooled temporary file
+        
+        The output stays in memory up to settings.IMAGE_SPOOL_MAX_SIZE and
+        spills to disk beyond that, instead of being copied out of a
+        BytesIO.
+        
+        Returns:
+            File: The encoded image, positioned at the start
+        """
+        output = _SpooledImageFile(max_size=settings.IMAGE_SPOOL_MAX_SIZE)
+        img.save(output, **save_options)
+        output.seek(0)
+        return File(output, name=name)
+    
     @classmethod
     def create_thumbnail(cls, image_file, size=None):
         """
@@ -156,6 +259,58 @@ class ImageProcessor:
             logger.error(f"Error creating thumbnail: {str(e)}")
             return None
     
+    @classmethod
+    def supported_variant_formats(cls, formats):
+        """Keep the formats Pillow can encode, e.g. AVIF needs a plugin"""
+        Image.init()
+        return [fmt.lower() for fmt in formats if fmt.upper() in Image.SAVE]
+    
+    @classmethod
+    def create_variants(cls, image_file, widths, formats, quality=None):
+        """
+        Create resized copies of an image for responsive ``srcset`` markup
+        
+        The image is decoded once, at a reduced scale for the largest width,
+        and downscaled from the largest width to the smallest, each step
+        resizing the previous result.
+        
+        Args:
+            image_file: Django File or file-like object
+            widths: Target widths in pixels; widths above the source width
+                are dropped (the source width is used if none fit)
+            formats: Output formats such as 'avif' or 'webp'
+            quality: Encoder quality (1-100)
+            
+        Returns:
+            list: (format, width, height, File) tuples
+        """
+        quality = quality or cls.DEFAULT_QUALITY
+        formats = cls.supported_variant_formats(formats)
+        
+        img = cls.open_image(image_file)
+        source_width, source_height = cls.oriented_size(img)
+        targets = sorted({width for width in widths if width <= source_width}, reverse=True)
+        if not targets:
+            targets = [source_width]
+        
+        largest = (targets[0], max(1, round(source_height * targets[0] / source_width)))
+        img = cls.decode_scaled(img, largest)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if img.mode == 'LA' else 'RGB')
+        
+        stem = os.path.splitext(os.path.basename(getattr(image_file, 'name', None) or 'image'))[0]
+        variants = []
+        for width in targets:
+            height = max(1, round(source_height * width / source_width))
+            if img.size != (width, height):
+                img = img.resize((width, height), Image.Resampling.LANCZOS)
+            for fmt in formats:
+                content = cls.encode(img, f"{stem}_{width}w.{fmt}", format=fmt.upper(), quality=quality)
+                variants.append((fmt, width, height, content))
+        
+        logger.info(f"Created {len(variants)} variants of {stem}")
+        return variants
+    
     @classmethod
     def validate_image(cls, image_file, max_size_mb=5):
         """
@@ -180,23 +335,19 @@ class ImageProcessor:
             if content_type not in cls.SUPPORTED_FORMATS.values():
                 errors.append(f"File type {content_type} is not supported. Supported types: {', '.join(cls.SUPPORTED_FORMATS.values())}")
             
-            # Try to open image to validate it's a real image
+            # Read the header to check it's a real image, without decoding it
             try:
-                img = Image.open(image_file)
-                img.verify()  # Verify it's a valid image
-                
-                # Reset file pointer after verify()
-                image_file.seek(0)
-                
-                # Check image dimensions
                 img = Image.open(image_file)
                 width, height = img.size
+                image_file.seek(0)
                 
                 if width < 100 or height < 100:
                     errors.append(f"Image dimensions {width}x{height} are too small. Minimum 100x100 pixels required.")
                 
                 if width > 5000 or height > 5000:
                     errors.append(f"Image dimensions {width}x{height} are too large. Maximum 5000x5000 pixels allowed.")
+                elif width * height > settings.IMAGE_MAX_PIXELS:
+                    errors.append(f"Image dimensions {width}x{height} exceed the limit of {settings.IMAGE_MAX_PIXELS} pixels.")
                 
             except Exception as e:
                 errors.append(f"Invalid image file: {str(e)}")
@@ -261,33 +412,14 @@ def ensure_media_directories():
 
 def cleanup_unused_images():
     """
-    Clean up unused image files (run as management command)
-    """
-    from blog.models import BlogPost, BlogImage
+    Find unused image files (run as management command)
     
-    # Get all image files in media directory
-    media_files = set()
-    for root, dirs, files in os.walk(settings.MEDIA_ROOT):
-        for file in files:
-            if not file.startswith('.'):
-                rel_path = os.path.relpath(os.path.join(root, file), settings.MEDIA_ROOT)
-                media_files.add(rel_path)
-    
-    # Get all referenced images from database
-    referenced_files = set()
-    
-    # Featured images
-    for post in BlogPost.objects.filter(featured_image__isnull=False):
-        if post.featured_image:
-            referenced_files.add(post.featured_image.name)
-    
-    # Blog images
-    for blog_image in BlogImage.objects.all():
-        if blog_image.image:
-            referenced_files.add(blog_image.image.name)
+    See blog.utils.media_gc, which also keeps images only referenced from
+    post content and works on any storage backend.
+    """
+    from blog.utils.media_gc import find_unreferenced
     
-    # Find unused files
-    unused_files = media_files - referenced_files
+    unused_files = {stored.name for stored in find_unreferenced()}
     
     logger.info(f"Found {len(unused_files)} unused image files")
     
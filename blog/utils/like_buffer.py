@@ -0,0 +1,314 @@
+"""
+Write-behind buffering of comment likes
+
+With LIKE_BUFFER_ENABLED, like and unlike requests only record the wanted
+state of a (comment, user_name) pair in a bounded in-process buffer. Events
+for the same pair coalesce (a like followed by an unlike writes nothing),
+and the buffer is flushed in batches - bulk_create(ignore_conflicts=True)
+for likes, OR-ed QuerySet.delete() calls for unlikes, one recount of the
+touched like counters - once it holds LIKE_BUFFER_MAX_EVENTS pairs, LIKE_BUFFER_FLUSH_INTERVAL
+seconds after the first pending event, and when the process exits.
+
+Events being flushed stay visible as an in-flight overlay until the flush
+commits: a like or unlike recorded meanwhile is applied on top of the
+state the flush is writing rather than the stored one, which the database
+does not show yet, and served like counts keep the in-flight deltas.
+
+Like counts served by the worker holding the events include their pending
+deltas; other workers see them once flushed. Events still buffered when a
+worker is killed without a clean exit are lost, which is the trade-off of
+the mode, so it is off by default.
+"""
+
+import atexit
+import logging
+import threading
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+from django.conf import settings
+from django.db import close_old_connections, router, transaction
+from django.db.models import Exists, OuterRef, Q
+
+from . import counters
+from .likes import invalidate_posts
+
+logger = logging.getLogger(__name__)
+
+# Pairs written per INSERT or DELETE statement of a flush
+FLUSH_BATCH_SIZE = 500
+
+
+def is_enabled():
+    return getattr(settings, 'LIKE_BUFFER_ENABLED', False)
+
+
+class LikeBuffer:
+    """
+    Pending like states keyed by (comment_id, user_name)
+
+    Each entry holds whether the like existed when the pair was first
+    buffered and whether it should exist now; pairs back at their stored
+    state are dropped, so the buffer only holds real changes. Entries taken
+    by a flush move to the in-flight overlay until it commits; flushes run
+    one at a time.
+    """
+
+    def __init__(self, max_events=1000, flush_interval=2.0):
+        self.max_events = max_events
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._deltas = defaultdict(int)
+        self._inflight = {}
+        self._inflight_deltas = defaultdict(int)
+        # Bumped when a flush commits, so reads that may predate it are redone
+        self._generation = 0
+        self._timer = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def pending_delta(self, comment_id):
+        """Likes added (or removed, if negative) to a comment by pending events"""
+        with self._lock:
+            return self._inflight_deltas.get(comment_id, 0) + self._deltas.get(comment_id, 0)
+
+    def pending_states(self, user_name, comment_ids):
+        """Buffered like states of a user name: comment_id -> liked"""
+        states = {}
+        with self._lock:
+            for entries in (self._inflight, self._pending):
+                for comment_id in comment_ids:
+                    if (comment_id, user_name) in entries:
+                        states[comment_id] = entries[(comment_id, user_name)][1]
+        return states
+
+    def pending_likers(self, comment_ids):
+        """Buffered like states of comments: comment_id -> {user_name: liked}"""
+        comment_ids = set(comment_ids)
+        likers = defaultdict(dict)
+        with self._lock:
+            for entries in (self._inflight, self._pending):
+                for (comment_id, user_name), (_, liked) in entries.items():
+                    if comment_id in comment_ids:
+                        likers[comment_id][user_name] = liked
+        return likers
+
+    def _stored_state(self, comment_id, user_name):
+        from blog.models import Comment, CommentLike
+
+        row = Comment.objects.filter(pk=comment_id).order_by().annotate(
+            liked=Exists(CommentLike.objects.filter(comment=OuterRef('pk'), user_name=user_name)),
+        ).values_list('like_count', 'liked').first()
+        if row is None:
+            raise Comment.DoesNotExist(f"Comment with ID {comment_id} not found")
+        return row
+
+    def record(self, comment_id, user_name, liked):
+        """
+        Buffer a like or unlike
+
+        Args:
+            comment_id (int): Comment liked or unliked
+            user_name (str): Name of the user
+            liked (bool): Whether the user now likes the comment
+
+        Returns:
+            tuple: (whether the event changed the like state, the comment's
+            like count including pending events)
+
+        Raises:
+            Comment.DoesNotExist: If the comment does not exist
+        """
+        key = (comment_id, user_name)
+        while True:
+            generation = self._generation
+            like_count, stored_liked = self._stored_state(comment_id, user_name)
+            with self._lock:
+                if self._generation != generation:
+                    # A flush committed meanwhile; the read may predate it
+                    continue
+                # A pair being flushed is about to be stored in its wanted state
+                inflight = self._inflight.get(key)
+                if inflight is not None:
+                    stored_liked = inflight[1]
+                entry = self._pending.setdefault(key, [stored_liked, stored_liked])
+                changed = entry[1] != liked
+                if changed:
+                    self._deltas[comment_id] += 1 if liked else -1
+                    entry[1] = liked
+                    if entry[0] == entry[1]:
+                        del self._pending[key]
+                like_count = max(
+                    like_count + self._inflight_deltas.get(comment_id, 0) + self._deltas.get(comment_id, 0), 0
+                )
+                full = len(self._pending) >= self.max_events
+                break
+
+        if full:
+            self.flush()
+        elif self._pending:
+            self._schedule()
+        return changed, like_count
+
+    def _schedule(self):
+        with self._lock:
+            if self._timer is None and self.flush_interval > 0:
+                self._timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        finally:
+            # The timer thread has its own database connection
+            close_old_connections()
+
+    def _take(self):
+        """Move the pending events to the in-flight overlay"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._inflight, self._pending = self._pending, {}
+            self._inflight_deltas, self._deltas = self._deltas, defaultdict(int)
+            return self._inflight
+
+    def _requeue(self):
+        """Put the events of a failed flush back in front of newer ones"""
+        with self._lock:
+            for key, (stored_liked, wanted) in self._inflight.items():
+                entry = self._pending.setdefault(key, [stored_liked, wanted])
+                # A newer event was applied on top of the unwritten state
+                entry[0] = stored_liked
+                if entry[0] == entry[1]:
+                    del self._pending[key]
+            for comment_id, delta in self._inflight_deltas.items():
+                self._deltas[comment_id] += delta
+            self._inflight, self._inflight_deltas = {}, defaultdict(int)
+
+    def flush(self):
+        """
+        Write every pending event to the database
+
+        Returns:
+            int: Number of (comment, user_name) pairs written
+        """
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self):
+        from blog.models import BlogPost, CommentLike
+
+        pending = self._take()
+        if not pending:
+            return 0
+
+        likes = [key for key, (_, liked) in pending.items() if liked]
+        unlikes = [key for key, (_, liked) in pending.items() if not liked]
+        comment_ids = {comment_id for comment_id, _ in pending}
+        using = router.db_for_write(CommentLike)
+        locked = False
+        try:
+            with transaction.atomic(using=using):
+                for start in range(0, len(likes), FLUSH_BATCH_SIZE):
+                    CommentLike.objects.using(using).bulk_create([
+                        CommentLike(comment_id=comment_id, user_name=user_name)
+                        for comment_id, user_name in likes[start:start + FLUSH_BATCH_SIZE]
+                    ], ignore_conflicts=True)
+                for start in range(0, len(unlikes), FLUSH_BATCH_SIZE):
+                    match = reduce(or_, (
+                        Q(comment_id=comment_id, user_name=user_name)
+                        for comment_id, user_name in unlikes[start:start + FLUSH_BATCH_SIZE]
+                    ))
+                    CommentLike.objects.using(using).filter(match).delete()
+                # Concurrent writers may have changed some of the pairs (and
+                # the delete signals adjusted counts too), so the counters
+                # are recounted rather than adjusted
+                counters.recount_like_counts(comment_ids)
+
+                posts = list(BlogPost.objects.using(using).filter(
+                    comments__id__in=comment_ids,
+                ).values_list('id', 'slug').distinct())
+
+                # Held through the commit, so no event is recorded against
+                # both the committed rows and the in-flight overlay
+                self._lock.acquire()
+                locked = True
+        except Exception as e:
+            if locked:
+                self._lock.release()
+            logger.error(f"Error flushing {len(pending)} buffered likes: {str(e)}")
+            self._requeue()
+            return 0
+
+        try:
+            self._inflight, self._inflight_deltas = {}, defaultdict(int)
+            self._generation += 1
+        finally:
+            self._lock.release()
+
+        post_ids, slugs = zip(*posts) if posts else ((), ())
+        invalidate_posts(post_ids, slugs, using=using)
+        return len(pending)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """The process-wide like buffer, flushed again when the process exits"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = LikeBuffer(
+                    max_events=getattr(settings, 'LIKE_BUFFER_MAX_EVENTS', 1000),
+                    flush_interval=getattr(settings, 'LIKE_BUFFER_FLUSH_INTERVAL', 2.0),
+                )
+                atexit.register(_buffer.flush)
+    return _buffer
+
+
+def apply_pending(user_name, comment_ids, liked_ids):
+    """Overlay buffered like states on the stored liked ids of a user name"""
+    if _buffer is None:
+        return liked_ids
+    liked = set(liked_ids)
+    for comment_id, state in _buffer.pending_states(user_name, comment_ids).items():
+        if state:
+            liked.add(comment_id)
+        else:
+            liked.discard(comment_id)
+    return sorted(liked)
+
+
+def apply_pending_likers(liked_by, comment_ids):
+    """
+    Overlay buffered like states on stored liker names
+
+    Args:
+        liked_by (dict): comment_id -> user names, newest like first
+        comment_ids (list): Comments to overlay
+
+    Returns:
+        dict: comment_id -> user names, buffered likes first
+    """
+    if _buffer is None:
+        return liked_by
+    for comment_id, states in _buffer.pending_likers(comment_ids).items():
+        names = [name for name in liked_by.get(comment_id, []) if states.get(name, True)]
+        added = [name for name, liked in states.items() if liked and name not in names]
+        liked_by[comment_id] = added + names
+    return liked_by
+
+
+def pending_delta(comment_id):
+    """Pending like delta of a comment, 0 when buffering is off"""
+    if _buffer is None:
+        return 0
+    return _buffer.pending_delta(comment_id)
@@ -0,0 +1,123 @@
+"""
+Idempotent comment likes
+
+Liking and unliking lock the comment row first, so requests for the same
+comment run one after another and an existence check tells whether the
+like actually changes. Likes are inserted with
+``bulk_create(ignore_conflicts=True)``, which never raises on the
+(comment, user_name) unique constraint and sends no model signals, so the
+like counter, the post's response cache scope and its stored render are
+maintained here. Unlikes are a regular ``QuerySet.delete()``, whose signals
+(see blog.signals) do the same.
+"""
+
+import logging
+from django.db import router, transaction
+
+from . import counters, response_cache
+from .render_store import refresh_renders
+
+logger = logging.getLogger(__name__)
+
+# Most comment ids answered by one liked_comment_ids() lookup
+MAX_LOOKUP_IDS = 200
+
+
+def _refresh_renders(post_ids):
+    try:
+        refresh_renders(post_ids)
+    except Exception as e:
+        logger.error(f"Error rendering posts {sorted(post_ids)}: {str(e)}")
+
+
+def invalidate_posts(post_ids, slugs, using=None):
+    """Bump the cache scopes of posts whose likes changed and re-render them"""
+    post_ids = set(post_ids)
+    if not post_ids:
+        return
+    response_cache.bump(*(response_cache.post_scope(slug) for slug in slugs))
+    transaction.on_commit(lambda: _refresh_renders(post_ids), using=using)
+
+
+def _set_like(comment_id, user_name, liked):
+    from blog.models import Comment, CommentLike
+
+    using = router.db_for_write(CommentLike)
+    with transaction.atomic(using=using):
+        row = Comment.objects.using(using).select_for_update(of=('self',)).filter(
+            pk=comment_id,
+        ).order_by().values_list('like_count', 'post_id', 'post__slug').first()
+        if row is None:
+            raise Comment.DoesNotExist(f"Comment with ID {comment_id} not found")
+        like_count, post_id, slug = row
+
+        likes = CommentLike.objects.using(using).filter(comment_id=comment_id, user_name=user_name)
+        if liked:
+            changed = not likes.exists()
+            if changed:
+                CommentLike.objects.using(using).bulk_create(
+                    [CommentLike(comment_id=comment_id, user_name=user_name)], ignore_conflicts=True,
+                )
+                counters.adjust_like_count(comment_id, 1)
+                invalidate_posts([post_id], [slug], using=using)
+        else:
+            # The delete signals uncount the like and refresh the post
+            deleted, _ = likes.delete()
+            changed = deleted > 0
+        if changed:
+            like_count += 1 if liked else -1
+    return changed, like_count
+
+
+def like_comment(comment_id, user_name):
+    """
+    Like a comment on behalf of a user name, doing nothing if already liked
+
+    Args:
+        comment_id (int): Comment to like
+        user_name (str): Name of the user liking it
+
+    Returns:
+        tuple: (whether a like was added, the comment's like count)
+
+    Raises:
+        Comment.DoesNotExist: If the comment does not exist
+    """
+    return _set_like(comment_id, user_name, liked=True)
+
+
+def unlike_comment(comment_id, user_name):
+    """
+    Remove a user name's like from a comment, doing nothing if not liked
+
+    Args:
+        comment_id (int): Comment to unlike
+        user_name (str): Name of the user who liked it
+
+    Returns:
+        tuple: (whether a like was removed, the comment's like count)
+
+    Raises:
+        Comment.DoesNotExist: If the comment does not exist
+    """
+    return _set_like(comment_id, user_name, liked=False)
+
+
+def liked_comment_ids(user_name, comment_ids):
+    """
+    Find which of the given comments a user name has liked, in one query
+
+    Args:
+        user_name (str): Name of the user
+        comment_ids: Comment ids to check (at most MAX_LOOKUP_IDS)
+
+    Returns:
+        list: The liked comment ids, in ascending order
+    """
+    from blog.models import CommentLike
+
+    return list(
+        CommentLike.objects.filter(user_name=user_name, comment_id__in=set(comment_ids))
+        .order_by('comment_id')
+        .values_list('comment_id', flat=True)
+    )
@@ -0,0 +1,275 @@
+"""
+Media garbage collection
+
+Finds stored files that nothing references any more and deletes them. The
+reference index covers model image fields and their variants, originals of
+queued image jobs, and media linked from post HTML, which is where editor
+uploads (``quill_uploads/``, ``ckeditor_uploads/``, ``uploads/ckeditor/``)
+are only ever referenced. MediaAsset outputs are kept while a row, post
+content or queued job still uses them or their original; once their files
+are collected the MediaAsset rows go too, so identical uploads are
+processed again instead of reusing a deleted file.
+
+Storage is listed page by page in name order (S3 through the bucket's
+paginated object listing, any other backend through its directory listing)
+and merged against the sorted reference index, so the listing is never
+held in memory. Files modified within a grace period are kept, which
+covers uploads whose post has not been saved yet.
+"""
+
+import logging
+import os
+import re
+from dataclasses import dataclass
+from datetime import timedelta
+from urllib.parse import unquote
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .media_store import is_hashed_name
+
+logger = logging.getLogger(__name__)
+
+# Directories the collector manages; anything else in storage is left alone
+GC_PREFIXES = (
+    'blog_images/',
+    'ckeditor_uploads/',
+    'featured_images/',
+    'quill_uploads/',
+    'uploads/ckeditor/',
+)
+
+DEFAULT_GRACE_PERIOD = timedelta(hours=24)
+
+# Objects per S3 listing page and per delete request (the S3 maximum)
+PAGE_SIZE = 1000
+
+# Managed media names anywhere in post HTML: src/href/srcset attributes,
+# inline styles or absolute storage URLs
+CONTENT_REFERENCE_RE = re.compile(
+    r'(?:%s)[^"\'\s?#()<>,]+' % '|'.join(re.escape(prefix) for prefix in GC_PREFIXES)
+)
+
+
+@dataclass
+class StoredFile:
+    name: str
+    size: int
+    modified: object
+
+
+def content_references(html):
+    """
+    Get the managed media names linked from a piece of HTML
+
+    Returns:
+        set: Storage names
+    """
+    return {unquote(name) for name in CONTENT_REFERENCE_RE.findall(unquote(html or ''))}
+
+
+def referenced_names():
+    """
+    Build the reference index
+
+    Returns:
+        list: Sorted storage names that must be kept
+    """
+    from blog.models import BlogImage, BlogPost, ImageJob, MediaAsset
+
+    names = set()
+
+    def add_variants(variants):
+        names.update(variant['name'] for variant in variants or [])
+
+    posts = BlogPost.objects.values_list('featured_image', 'featured_image_variants', 'content', 'excerpt')
+    for featured_image, variants, content, excerpt in posts.iterator(chunk_size=PAGE_SIZE):
+        if featured_image:
+            names.add(featured_image)
+        add_variants(variants)
+        names |= content_references(content)
+        names |= content_references(excerpt)
+
+    for image, variants in BlogImage.objects.values_list('image', 'variants').iterator(chunk_size=PAGE_SIZE):
+        names.add(image)
+        add_variants(variants)
+
+    # Originals still waiting for (or being swapped by) the image worker
+    queued_digests = set()
+    for path, digest in ImageJob.objects.filter(
+        status__in=[ImageJob.STATUS_PENDING, ImageJob.STATUS_PROCESSING]
+    ).values_list('original_path', 'sha256'):
+        names.add(path)
+        queued_digests.add(digest)
+
+    # An asset is still used when its output is, when a queued job may reuse
+    # it, or when a content-addressed original of it is still linked
+    used_digests = queued_digests | {
+        os.path.splitext(os.path.basename(name))[0] for name in names if is_hashed_name(name)
+    }
+    assets = MediaAsset.objects.values_list('sha256', 'name', 'variants').iterator(chunk_size=PAGE_SIZE)
+    for digest, name, variants in assets:
+        if name in names or digest in used_digests:
+            names.add(name)
+            add_variants(variants)
+
+    names.discard('')
+    return sorted(names)
+
+
+def _list_s3(storage, prefix):
+    location = storage.location.strip('/')
+    key_prefix = f"{location}/{prefix}" if location else prefix
+    # Iterating the collection requests one page of keys at a time, in key order
+    for obj in storage.bucket.objects.filter(Prefix=key_prefix).page_size(PAGE_SIZE):
+        name = obj.key[len(location) + 1:] if location else obj.key
+        yield StoredFile(name, obj.size, obj.last_modified)
+
+
+def _list_directory(storage, path):
+    try:
+        directories, files = storage.listdir(path)
+    except FileNotFoundError:
+        return
+    # Sort as full names would sort: a directory's entries are all "<dir>/..."
+    entries = [(f"{directory}/", True) for directory in directories] + [(name, False) for name in files]
+    for entry, is_directory in sorted(entries):
+        name = f"{path}{entry}"
+        if is_directory:
+            yield from _list_directory(storage, name)
+        elif not entry.startswith('.'):
+            yield StoredFile(name, storage.size(name), storage.get_modified_time(name))
+
+
+def list_storage(storage, prefix):
+    """
+    List the files under a prefix in name order, a page at a time
+
+    Args:
+        storage: Storage backend; S3 storages are listed through their bucket
+        prefix (str): Directory prefix ending in '/'
+
+    Yields:
+        StoredFile: Stored files, sorted by name
+    """
+    if hasattr(storage, 'bucket'):
+        yield from _list_s3(storage, prefix)
+    else:
+        yield from _list_directory(storage, prefix)
+
+
+def find_unreferenced(storage=None, prefixes=GC_PREFIXES, grace_period=DEFAULT_GRACE_PERIOD, references=None):
+    """
+    Find stored files that nothing references
+
+    The sorted storage listing is merged against the sorted reference
+    index, so both are walked once.
+
+    Args:
+        storage: Storage backend (default: default_storage)
+        prefixes: Directory prefixes to collect in
+        grace_period (timedelta): Files modified more recently are kept
+        references (list): Sorted reference index (default: built from the
+            database)
+
+    Yields:
+        StoredFile: Unreferenced files older than the grace period
+    """
+    storage = storage or default_storage
+    references = referenced_names() if references is None else references
+    cutoff = timezone.now() - grace_period
+
+    position = 0
+    for prefix in sorted(prefixes):
+        for stored in list_storage(storage, prefix):
+            while position < len(references) and references[position] < stored.name:
+                position += 1
+            if position < len(references) and references[position] == stored.name:
+                continue
+            if stored.modified and stored.modified > cutoff:
+                continue
+            yield stored
+
+
+def delete_files(storage, names):
+    """Delete a batch of files, in one request on S3"""
+    if not names:
+        return
+    if hasattr(storage, 'bucket'):
+        location = storage.location.strip('/')
+        storage.bucket.delete_objects(Delete={
+            'Objects': [{'Key': f"{location}/{name}" if location else name} for name in names],
+            'Quiet': True,
+        })
+    else:
+        for name in names:
+            storage.delete(name)
+
+
+def release_assets(names):
+    """
+    Delete the MediaAsset rows whose output files are about to be collected
+
+    An upload may have reused one of the assets since the reference index
+    was built; its file is kept.
+
+    Args:
+        names (list): Storage names about to be deleted
+
+    Returns:
+        list: The names still safe to delete
+    """
+    from blog.models import BlogImage, BlogPost, MediaAsset
+
+    released, _ = MediaAsset.objects.filter(name__in=names).delete()
+    if not released:
+        return names
+    in_use = set(BlogPost.objects.filter(featured_image__in=names).values_list('featured_image', flat=True))
+    in_use.update(BlogImage.objects.filter(image__in=names).values_list('image', flat=True))
+    return [name for name in names if name not in in_use]
+
+
+def collect_garbage(storage=None, prefixes=GC_PREFIXES, grace_period=DEFAULT_GRACE_PERIOD,
+                    dry_run=False, batch_size=PAGE_SIZE, on_file=None):
+    """
+    Delete unreferenced media
+
+    Args:
+        storage: Storage backend (default: default_storage)
+        prefixes: Directory prefixes to collect in
+        grace_period (timedelta): Files modified more recently are kept
+        dry_run (bool): Only report what would be deleted
+        batch_size (int): Files deleted per batch
+        on_file (callable): Called with each StoredFile found
+
+    Returns:
+        tuple: (number of files, total bytes) deleted or, on a dry run,
+            that would be deleted
+    """
+    storage = storage or default_storage
+    count = total_size = 0
+    batch = []
+
+    def delete_batch():
+        nonlocal count, total_size
+        sizes = {stored.name: stored.size or 0 for stored in batch}
+        names = release_assets(list(sizes))
+        for name in sizes.keys() - set(names):
+            count -= 1
+            total_size -= sizes[name]
+        delete_files(storage, names)
+        batch.clear()
+
+    for stored in find_unreferenced(storage, prefixes, grace_period):
+        count += 1
+        total_size += stored.size or 0
+        if on_file:
+            on_file(stored)
+        if not dry_run:
+            batch.append(stored)
+            if len(batch) >= batch_size:
+                delete_batch()
+    if not dry_run:
+        delete_batch()
+        logger.info(f"Deleted {count} unreferenced media files ({total_size} bytes)")
+    return count, total_size
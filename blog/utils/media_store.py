@@ -0,0 +1,132 @@
+"""
+Content-addressed media storage
+
+Uploaded and generated files are named after the SHA-256 of their bytes, so
+identical content is stored once and a name never changes meaning, which
+lets it be served with year-long immutable caching. MediaAsset rows map the
+hash of an uploaded original to its optimized file and variants, so a
+duplicate upload reuses them without being stored or re-encoded.
+"""
+
+import hashlib
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# <directory>/<sha256>.<ext>
+HASHED_NAME_RE = re.compile(r'(?:^|/)[0-9a-f]{64}\.[A-Za-z0-9]+$')
+
+# Editor uploads referenced from post content
+EDITOR_UPLOAD_RE = re.compile(r'(?:quill|ckeditor)_uploads/([0-9a-f]{64})\.[A-Za-z0-9]+')
+
+
+def file_digest(content):
+    """
+    Get the SHA-256 hex digest of a file, streamed in chunks
+
+    Args:
+        content: Django File (or FieldFile) positioned anywhere
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def hashed_name(directory, digest, extension):
+    return f"{directory.rstrip('/')}/{digest}{extension.lower()}"
+
+
+def is_hashed_name(name):
+    return bool(HASHED_NAME_RE.search(name or ''))
+
+
+def save_hashed(storage, directory, content, extension=None, digest=None):
+    """
+    Store a file under its content hash, reusing an identical stored file
+
+    Args:
+        storage: Target storage
+        directory (str): Directory to store the file in
+        content: Django File
+        extension (str): Extension including the dot (default: from the
+            content's name)
+        digest (str): Precomputed digest of the content
+
+    Returns:
+        str: Storage name of the file
+    """
+    digest = digest or file_digest(content)
+    if extension is None:
+        extension = os.path.splitext(getattr(content, 'name', '') or '')[1]
+    name = hashed_name(directory, digest, extension)
+    if storage.exists(name):
+        logger.debug(f"Reusing stored file {name}")
+        return name
+    return storage.save(name, content)
+
+
+def find_asset(digest):
+    from blog.models import MediaAsset
+
+    return MediaAsset.objects.filter(sha256=digest).first()
+
+
+def store_upload(instance, field_file):
+    """
+    Store a new upload of a model file field under its content hash
+
+    The field is pointed at the stored name (or straight at the optimized
+    file when identical content was processed before) and marked committed,
+    so the model save does not store it again. A reused asset without
+    variants (first processed as an editor upload) still needs a job to
+    generate them.
+
+    Args:
+        instance: Model instance being saved
+        field_file: Its uncommitted FieldFile
+
+    Returns:
+        tuple: (digest, MediaAsset or None)
+    """
+    digest = file_digest(field_file)
+    asset = find_asset(digest)
+    if asset is not None:
+        name = asset.name
+    else:
+        upload_name = field_file.field.generate_filename(instance, os.path.basename(field_file.name))
+        name = save_hashed(field_file.storage, os.path.dirname(upload_name), field_file.file, digest=digest,
+                           extension=os.path.splitext(upload_name)[1])
+    field_file.name = name
+    field_file._committed = True
+    return digest, asset
+
+
+def replace_editor_uploads(html):
+    """
+    Point editor upload references in post HTML at their optimized files
+
+    Returns:
+        str: The HTML, unchanged if no processed upload is referenced
+    """
+    from blog.models import MediaAsset
+
+    digests = set(EDITOR_UPLOAD_RE.findall(html or ''))
+    if not digests:
+        return html
+    optimized = dict(MediaAsset.objects.filter(sha256__in=digests).values_list('sha256', 'name'))
+    if not optimized:
+        return html
+
+    def replace(match):
+        return optimized.get(match.group(1), match.group(0))
+
+    return EDITOR_UPLOAD_RE.sub(replace, html)
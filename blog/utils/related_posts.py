@@ -0,0 +1,366 @@
+"""
+Related-posts index built from TF-IDF vectors of post text
+
+Published posts are turned into L2-normalised TF-IDF vectors (title, excerpt,
+stripped content and a category token), and the top-k cosine neighbours of
+every post are stored in the RelatedPost table. Similarities are computed as
+batched matrix products, so the related-posts endpoint only has to read the
+precomputed rows.
+
+Building the matrix reads the whole published corpus, so saves and deletes
+only queue a RelatedPostUpdate row; the process_related_posts worker drains
+the queue in batches, loading the corpus once per batch however many posts
+changed. Each refresh bumps the posts response cache scope, which cached
+related-posts responses are stored under.
+"""
+
+import logging
+import math
+import re
+import time
+from collections import Counter
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from . import response_cache
+
+logger = logging.getLogger(__name__)
+
+# Number of neighbours stored per post
+DEFAULT_TOP_K = 10
+
+# Vocabulary size cap, keeps the dense matrix small for large archives
+MAX_FEATURES = 4096
+
+# Rows multiplied against the whole matrix at once
+BATCH_SIZE = 256
+
+# How many times title words and the category token are counted
+TITLE_WEIGHT = 3
+CATEGORY_WEIGHT = 3
+
+STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'have',
+    'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should',
+    'this', 'that', 'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we',
+    'they', 'me', 'him', 'her', 'us', 'them', 'my', 'your', 'his',
+    'its', 'our', 'their', 'from', 'up', 'about', 'into', 'over', 'after',
+    'can', 'not', 'all', 'more', 'also', 'than', 'then', 'there', 'what',
+    'when', 'which', 'who', 'how', 'out', 'some', 'just', 'very', 'so',
+})
+
+
+def tokenize(text, min_length=3):
+    """
+    Split text into lowercase keyword tokens
+
+    Args:
+        text (str): Plain text or HTML
+        min_length (int): Minimum token length
+
+    Returns:
+        list: Tokens with stop words and pure numbers removed
+    """
+    words = re.findall(r'\w+', strip_tags(text or '').lower())
+    return [
+        word for word in words
+        if len(word) >= min_length and word not in STOP_WORDS and not word.isdigit()
+    ]
+
+
+def post_terms(post):
+    """
+    Get the weighted term counts of a blog post
+
+    Args:
+        post: BlogPost instance
+
+    Returns:
+        Counter: Term frequencies
+    """
+    terms = Counter(tokenize(post.content))
+    terms.update(tokenize(post.excerpt))
+    for _ in range(TITLE_WEIGHT):
+        terms.update(tokenize(post.title))
+    if post.category_id:
+        terms[f"__category_{post.category_id}"] += CATEGORY_WEIGHT
+    return terms
+
+
+def build_matrix(term_counts, max_features=MAX_FEATURES):
+    """
+    Build an L2-normalised TF-IDF matrix
+
+    Args:
+        term_counts (list): One Counter per document
+        max_features (int): Keep only the most widespread terms
+
+    Returns:
+        numpy.ndarray: float32 matrix of shape (documents, features)
+    """
+    document_frequency = Counter()
+    for counts in term_counts:
+        document_frequency.update(counts.keys())
+
+    # Terms that occur in a single document cannot link two posts
+    shared = [term for term, df in document_frequency.items() if df > 1]
+    shared.sort(key=lambda term: (-document_frequency[term], term))
+    vocabulary = {term: index for index, term in enumerate(shared[:max_features])}
+
+    matrix = np.zeros((len(term_counts), len(vocabulary)), dtype=np.float32)
+    if not vocabulary:
+        return matrix
+
+    documents = len(term_counts)
+    idf = np.zeros(len(vocabulary), dtype=np.float32)
+    for term, index in vocabulary.items():
+        idf[index] = math.log((1 + documents) / (1 + document_frequency[term])) + 1
+
+    for row, counts in enumerate(term_counts):
+        for term, count in counts.items():
+            index = vocabulary.get(term)
+            if index is not None:
+                # Sublinear term frequency
+                matrix[row, index] = 1 + math.log(count)
+
+    matrix *= idf
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    matrix /= norms
+    return matrix
+
+
+def top_neighbours(matrix, rows=None, top_k=DEFAULT_TOP_K, batch_size=BATCH_SIZE):
+    """
+    Find the most similar documents for the given rows
+
+    Args:
+        matrix (numpy.ndarray): Normalised TF-IDF matrix
+        rows (list): Row indexes to compute (default: all)
+        top_k (int): Neighbours per row
+        batch_size (int): Rows per matrix product
+
+    Returns:
+        dict: Row index -> list of (neighbour row, score), best first
+    """
+    if rows is None:
+        rows = range(matrix.shape[0])
+    rows = np.asarray(list(rows), dtype=np.int64)
+    results = {}
+    if not len(rows) or matrix.shape[0] < 2:
+        return {int(row): [] for row in rows}
+
+    k = min(top_k, matrix.shape[0] - 1)
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        scores = matrix[batch] @ matrix.T
+        # Never relate a post to itself
+        scores[np.arange(len(batch)), batch] = -np.inf
+
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind='stable')
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        candidate_scores = np.take_along_axis(candidate_scores, order, axis=1)
+
+        for i, row in enumerate(batch):
+            results[int(row)] = [
+                (int(neighbour), float(score))
+                for neighbour, score in zip(candidates[i], candidate_scores[i])
+                if score > 0
+            ]
+    return results
+
+
+def _load_corpus():
+    from blog.models import BlogPost
+
+    posts = list(
+        BlogPost.objects.filter(published=True)
+        .only('id', 'title', 'excerpt', 'content', 'category_id')
+        .order_by('id')
+    )
+    ids = [post.id for post in posts]
+    matrix = build_matrix([post_terms(post) for post in posts])
+    return ids, matrix
+
+
+def _entries(ids, neighbours):
+    from blog.models import RelatedPost
+
+    entries = []
+    for row, items in neighbours.items():
+        for rank, (neighbour, score) in enumerate(items):
+            entries.append(RelatedPost(
+                post_id=ids[row],
+                related_id=ids[neighbour],
+                score=score,
+                rank=rank,
+            ))
+    return entries
+
+
+def rebuild_related_posts(top_k=DEFAULT_TOP_K):
+    """
+    Recompute the related-posts index for every published post
+
+    Returns:
+        int: Number of posts indexed
+    """
+    from blog.models import RelatedPost, RelatedPostUpdate
+
+    started = timezone.now()
+    ids, matrix = _load_corpus()
+    entries = _entries(ids, top_neighbours(matrix, top_k=top_k))
+
+    with transaction.atomic():
+        RelatedPost.objects.all().delete()
+        RelatedPost.objects.bulk_create(entries, batch_size=1000)
+        # Everything queued before the corpus was read is covered
+        RelatedPostUpdate.objects.filter(queued_at__lte=started).delete()
+        # Cached related-posts responses live under the posts scope
+        response_cache.bump(response_cache.POSTS_SCOPE)
+
+    logger.info(f"Rebuilt related posts for {len(ids)} posts")
+    return len(ids)
+
+
+def queue_related_update(post_id, affected_ids=None):
+    """
+    Queue a saved or deleted post for the process_related_posts worker
+
+    A post already queued is only pushed back to the end of the queue, so
+    repeated saves cost one refresh.
+
+    Args:
+        post_id (int): ID of the saved or deleted post
+        affected_ids (list): Posts that listed it, for deleted posts whose
+            rows are gone by the time the worker runs
+    """
+    from blog.models import RelatedPostUpdate
+
+    changes = {'queued_at': timezone.now()}
+    if affected_ids:
+        changes['affected_ids'] = list(affected_ids)
+    if not RelatedPostUpdate.objects.filter(post_id=post_id).update(**changes):
+        # A concurrent insert of the same post is just as fresh
+        RelatedPostUpdate.objects.bulk_create(
+            [RelatedPostUpdate(post_id=post_id, **changes)], ignore_conflicts=True
+        )
+
+
+def update_related_posts(post_ids, affected_ids=None, top_k=DEFAULT_TOP_K):
+    """
+    Refresh the index rows affected by changes to some posts
+
+    Recomputes the posts' own neighbours plus those of posts that currently
+    list one of them or for which one of them is now similar enough to
+    enter their top-k, with a single load of the corpus. Document
+    frequencies drift slightly between full rebuilds; run the
+    rebuild_related_posts command periodically to correct that.
+
+    Args:
+        post_ids (list): IDs of the saved or deleted posts
+        affected_ids (list): Posts that listed deleted posts whose rows are
+            already gone
+
+    Returns:
+        int: Number of posts whose rows were recomputed
+    """
+    from blog.models import RelatedPost
+
+    post_ids = set(post_ids)
+    ids, matrix = _load_corpus()
+    position = {pk: row for row, pk in enumerate(ids)}
+
+    affected = set(affected_ids or [])
+    affected.update(RelatedPost.objects.filter(related_id__in=post_ids).values_list('post_id', flat=True))
+
+    # Deleted or unpublished posts only change their former neighbours
+    gone = [pk for pk in post_ids if pk not in position]
+    changed = [position[pk] for pk in post_ids if pk in position]
+    if changed:
+        affected.update(ids[row] for row in changed)
+        similarities = matrix @ matrix[changed].T
+        # A post entering its own row does not count
+        similarities[changed, np.arange(len(changed))] = -np.inf
+        best = similarities.max(axis=1)
+
+        # Lowest stored score per post, posts with free slots accept anything
+        stored = {
+            row['post_id']: row
+            for row in RelatedPost.objects.order_by().values('post_id').annotate(
+                lowest=Min('score'), total=Count('id'),
+            )
+        }
+        for pk, other in position.items():
+            if best[other] <= 0:
+                continue
+            entry = stored.get(pk)
+            if entry is None or entry['total'] < top_k or best[other] > entry['lowest']:
+                affected.add(pk)
+
+    rows = [position[pk] for pk in affected if pk in position]
+    entries = _entries(ids, top_neighbours(matrix, rows=rows, top_k=top_k))
+
+    with transaction.atomic():
+        RelatedPost.objects.filter(post_id__in=gone + [ids[row] for row in rows]).delete()
+        RelatedPost.objects.bulk_create(entries, batch_size=1000)
+        response_cache.bump(response_cache.POSTS_SCOPE)
+    return len(rows)
+
+
+def process_related_updates(top_k=DEFAULT_TOP_K):
+    """
+    Apply every queued related-posts update in one batch
+
+    Returns:
+        int: Number of queued posts processed
+    """
+    from blog.models import RelatedPostUpdate
+
+    started = timezone.now()
+    queued = list(RelatedPostUpdate.objects.filter(queued_at__lte=started).values_list('post_id', 'affected_ids'))
+    if not queued:
+        return 0
+
+    post_ids = [post_id for post_id, _ in queued]
+    affected_ids = [pk for _, affected in queued for pk in affected]
+    update_related_posts(post_ids, affected_ids=affected_ids, top_k=top_k)
+
+    # Posts queued again while this batch ran stay for the next one
+    RelatedPostUpdate.objects.filter(post_id__in=post_ids, queued_at__lte=started).delete()
+    return len(queued)
+
+
+def run_worker(once=False, poll_interval=10, top_k=DEFAULT_TOP_K):
+    """
+    Process queued related-posts updates until stopped
+
+    Args:
+        once (bool): Exit as soon as the queue is empty
+        poll_interval (float): Seconds to sleep when the queue is empty
+        top_k (int): Neighbours stored per post
+
+    Returns:
+        int: Number of queued posts processed
+    """
+    processed = 0
+    while True:
+        try:
+            batch = process_related_updates(top_k=top_k)
+        except Exception as e:
+            logger.error(f"Error updating related posts: {str(e)}")
+            batch = 0
+            if once:
+                break
+        processed += batch
+        if not batch:
+            if once:
+                break
+            time.sleep(poll_interval)
+    return processed
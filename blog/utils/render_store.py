@@ -0,0 +1,165 @@
+"""
+Persisted post detail payloads
+
+The JSON body of the post-by-slug response is rendered once, compressed with
+gzip (and brotli when the ``brotli`` package is installed) and stored in the
+PostRender table. Signal handlers re-render a post when it, its images or its
+visible comments change, so reads only fetch one row and write its bytes to
+the response in whichever encoding the client accepts.
+"""
+
+import gzip
+import logging
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Renders run after every like, comment and image change, inside the
+# writing request, so use levels that compress well without dominating it
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def render_post(post):
+    """
+    Render and store the detail payload of a blog post
+
+    Args:
+        post: BlogPost instance, ideally with category and images loaded
+
+    Returns:
+        PostRender: The saved render
+    """
+    from blog.models import PostRender
+    from blog.serializers import BlogPostSerializer
+
+    # No request in the context, like the by-slug view, so media URLs do not
+    # depend on the host the render was triggered from
+    payload = JSONRenderer().render(BlogPostSerializer(post).data)
+
+    render, _ = PostRender.objects.update_or_create(
+        post_id=post.pk,
+        defaults={
+            'payload': payload,
+            'gzip_payload': gzip.compress(payload, compresslevel=GZIP_LEVEL, mtime=0),
+            'brotli_payload': brotli.compress(payload, quality=BROTLI_QUALITY) if brotli else None,
+        }
+    )
+    return render
+
+
+def refresh_renders(post_ids):
+    """
+    Re-render the stored payloads of the given posts
+
+    Returns:
+        int: Number of posts rendered
+    """
+    from blog.models import BlogPost
+
+    posts = BlogPost.objects.filter(pk__in=post_ids).select_related('category').prefetch_related('images')
+    rendered = 0
+    for post in posts:
+        render_post(post)
+        rendered += 1
+    return rendered
+
+
+def drop_category_renders(category_id):
+    """Discard the renders nesting a category; they are rebuilt when next read"""
+    from blog.models import PostRender
+
+    PostRender.objects.filter(post__category_id=category_id).delete()
+
+
+def rebuild_renders(batch_size=100):
+    """
+    Render every blog post
+
+    Returns:
+        int: Number of posts rendered
+    """
+    from blog.models import BlogPost
+
+    rendered = 0
+    posts = BlogPost.objects.select_related('category').prefetch_related('images').order_by('id')
+    for post in posts.iterator(chunk_size=batch_size):
+        render_post(post)
+        rendered += 1
+
+    logger.info(f"Rendered {rendered} posts")
+    return rendered
+
+
+def get_render(slug):
+    """
+    Get the stored render of a post, rendering it on first access
+
+    Returns:
+        PostRender: The render, or None if no post has this slug
+    """
+    from blog.models import BlogPost, PostRender
+
+    render = PostRender.objects.filter(post__slug=slug).first()
+    if render is not None:
+        return render
+
+    post = BlogPost.objects.select_related('category').prefetch_related('images').filter(slug=slug).first()
+    if post is None:
+        return None
+    logger.debug(f"Rendering post {post.pk} on first access")
+    return render_post(post)
+
+
+def _accepted_encodings(header):
+    """Parse an Accept-Encoding header into the set of acceptable codings"""
+    accepted = set()
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding)
+    return accepted
+
+
+def render_response(render, request):
+    """
+    Build the response for a stored render, compressed when the client allows
+
+    Args:
+        render: PostRender instance
+        request: The incoming request
+
+    Returns:
+        HttpResponse: JSON response carrying the stored bytes
+    """
+    accepted = _accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING'))
+
+    encoding = None
+    body = bytes(render.payload)
+    if render.brotli_payload is not None and ('br' in accepted or '*' in accepted):
+        encoding, body = 'br', bytes(render.brotli_payload)
+    elif 'gzip' in accepted or '*' in accepted:
+        encoding, body = 'gzip', bytes(render.gzip_payload)
+
+    response = HttpResponse(body, content_type='application/json')
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Content-Length'] = str(len(body))
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -0,0 +1,195 @@
+"""
+Response cache for the public read endpoints
+
+Cached responses are stored in the default Django cache together with the
+versions of the scopes they were built from (a post, a category, the post
+listing...). Signal handlers bump a scope's version when the underlying data
+changes, which makes every response depending on it stale without having to
+know its cache key.
+
+Bumps only reach processes sharing the cache, so the cache is on by default
+only with a shared backend (redis or file, see backend/settings.py), and they
+are issued once the change commits so a concurrent reader cannot cache the
+old state under the new version.
+"""
+
+import functools
+import hashlib
+import logging
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'blog:response'
+VERSION_PREFIX = 'blog:version'
+HITS_KEY = 'blog:response-cache:hits'
+MISSES_KEY = 'blog:response-cache:misses'
+
+# Scope bumped by any change visible in post listings (lists, slugs, related)
+POSTS_SCOPE = 'posts'
+# Scope bumped by any change visible in category listings (post counts)
+CATEGORIES_SCOPE = 'categories'
+
+
+def post_scope(slug):
+    return f"post:{slug}"
+
+
+def category_scope(category_id):
+    return f"category:{category_id}"
+
+
+def is_enabled():
+    return getattr(settings, 'RESPONSE_CACHE_ENABLED', False)
+
+
+def get_timeout():
+    return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+
+
+def _version_key(scope):
+    return f"{VERSION_PREFIX}:{scope}"
+
+
+def get_versions(scopes):
+    """
+    Get the current version of each scope, creating missing ones
+
+    Args:
+        scopes (list): Scope names
+
+    Returns:
+        dict: scope -> version token
+    """
+    keys = {_version_key(scope): scope for scope in scopes}
+    found = cache.get_many(list(keys))
+    versions = {}
+    for key, scope in keys.items():
+        version = found.get(key)
+        if version is None:
+            version = uuid.uuid4().hex
+            # Another worker may have created it meanwhile; keep theirs
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+        versions[scope] = version
+    return versions
+
+
+def _bump_now(scopes):
+    cache.set_many({_version_key(scope): uuid.uuid4().hex for scope in scopes}, None)
+    logger.debug(f"Bumped response cache scopes: {', '.join(scopes)}")
+
+
+def bump(*scopes):
+    """
+    Invalidate every cached response that depends on the given scopes once
+    the current transaction commits (right away outside of one)
+    """
+    if not scopes:
+        return
+    scopes = list(scopes)
+    transaction.on_commit(lambda: _bump_now(scopes))
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Counter expired or never created
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def get_stats():
+    """
+    Get the hit/miss counters of the response cache
+
+    Returns:
+        dict: hits, misses and hit_rate
+    """
+    counts = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits = counts.get(HITS_KEY, 0)
+    misses = counts.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else None,
+    }
+
+
+def reset_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
+
+
+def _response_key(request):
+    # The absolute URI covers host-dependent media URLs; sort the query so
+    # equivalent requests share an entry
+    url = request.build_absolute_uri(request.path)
+    query = '&'.join(sorted(f"{key}={value}" for key, values in request.query_params.lists() for value in values))
+    digest = hashlib.md5(f"{url}?{query}".encode('utf-8')).hexdigest()
+    return f"{KEY_PREFIX}:{digest}"
+
+
+def cache_response(scopes, data_scopes=None):
+    """
+    Cache successful GET responses of a DRF view or view method
+
+    Args:
+        scopes: List of scope names the response depends on, or a callable
+            ``scopes(request, **kwargs)`` returning them
+        data_scopes: Optional callable ``data_scopes(data)`` returning extra
+            scopes that are only known once the response is built
+
+    Responses carry an ``X-Cache: HIT`` or ``X-Cache: MISS`` header.
+    """
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(*args, **kwargs):
+            request = next(arg for arg in args if isinstance(arg, Request))
+            if request.method != 'GET' or not is_enabled():
+                return view_func(*args, **kwargs)
+
+            key = _response_key(request)
+            entry = cache.get(key)
+            if entry is not None and get_versions(list(entry['versions'])) == entry['versions']:
+                _count(HITS_KEY)
+                response = Response(entry['data'], status=entry['status'])
+                response['X-Cache'] = 'HIT'
+                return response
+
+            _count(MISSES_KEY)
+            # Read versions before building the response so a concurrent
+            # change invalidates the entry instead of being hidden by it
+            names = scopes(request, **kwargs) if callable(scopes) else scopes
+            versions = get_versions(names)
+
+            response = view_func(*args, **kwargs)
+            if response.status_code == 200 and getattr(response, 'data', None) is not None:
+                if data_scopes:
+                    versions.update(get_versions(data_scopes(response.data)))
+                cache.set(key, {
+                    'data': response.data,
+                    'status': response.status_code,
+                    'versions': versions,
+                }, get_timeout())
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+def post_detail_scopes(request, slug=None, **kwargs):
+    """Scopes of a single-post response looked up by slug"""
+    return [post_scope(slug)]
+
+
+def post_category_scopes(data):
+    """Scope of the category nested in a post response"""
+    category = data.get('category')
+    return [category_scope(category['id'])] if category else []
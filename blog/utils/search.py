@@ -0,0 +1,212 @@
+"""
+Full-text search for blog posts
+
+Each post has a PostSearchDocument row holding its stripped, whitespace
+normalized text. Migration 0013 builds the database-specific index on top of
+that table:
+
+- PostgreSQL: a stored ``search_vector`` tsvector column (title weighted A,
+  excerpt B, content C) with a GIN index
+- SQLite: an external-content FTS5 table kept in sync by triggers
+
+Other databases fall back to substring matching over the stripped text.
+"""
+
+import logging
+import re
+from django.db import connection
+from django.db.models import Case, CharField, FloatField, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.utils.html import strip_tags
+
+logger = logging.getLogger(__name__)
+
+# Names of the database objects created by migration 0013
+DOCUMENT_TABLE = 'blog_postsearchdocument'
+FTS_TABLE = 'blog_postsearch_fts'
+
+# Relative weights of the title, excerpt and content columns (FTS5 bm25)
+FTS_WEIGHTS = (10.0, 4.0, 1.0)
+
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_STOP = '</mark>'
+
+# Maximum number of terms taken from a search query
+MAX_TERMS = 10
+
+
+def build_search_document(post):
+    """
+    Build the plain-text search fields for a blog post
+
+    Args:
+        post: BlogPost instance
+
+    Returns:
+        dict: title, excerpt and body with HTML tags stripped
+    """
+    def clean(value):
+        return re.sub(r'\s+', ' ', strip_tags(value or '')).strip()
+
+    return {
+        'title': clean(post.title),
+        'excerpt': clean(post.excerpt or post.generate_excerpt()),
+        'body': clean(post.content),
+    }
+
+
+def index_post(post):
+    """Create or refresh the search document of a blog post"""
+    from blog.models import PostSearchDocument
+
+    PostSearchDocument.objects.update_or_create(
+        post_id=post.pk,
+        defaults=build_search_document(post)
+    )
+
+
+def rebuild_index(batch_size=500):
+    """
+    Rebuild the search documents of all blog posts
+
+    Returns:
+        int: Number of posts indexed
+    """
+    from blog.models import BlogPost
+
+    indexed = 0
+    posts = BlogPost.objects.only('id', 'title', 'excerpt', 'content').order_by('id')
+    for post in posts.iterator(chunk_size=batch_size):
+        index_post(post)
+        indexed += 1
+
+    logger.info(f"Rebuilt search index for {indexed} posts")
+    return indexed
+
+
+def prepare_terms(search_query):
+    """
+    Split a search query into plain word terms safe to embed in a full-text query
+
+    Args:
+        search_query (str): Raw query string
+
+    Returns:
+        list: Up to MAX_TERMS lowercase terms of at least 2 characters
+    """
+    words = re.findall(r'\w+', strip_tags(search_query or '').lower())
+    return [word for word in words if len(word) >= 2][:MAX_TERMS]
+
+
+def search_posts(queryset, search_query):
+    """
+    Filter a BlogPost queryset by a full-text query and order it by relevance
+
+    Matching posts are annotated with ``search_rank`` (higher is better) and
+    ``search_highlight`` (a content snippet with matches wrapped in <mark>).
+
+    Args:
+        queryset: BlogPost queryset
+        search_query (str): Raw query string
+
+    Returns:
+        QuerySet: Filtered, annotated and ranked queryset
+    """
+    terms = prepare_terms(search_query)
+    if not terms:
+        return queryset
+
+    vendor = connection.vendor
+    if vendor == 'postgresql':
+        return _search_postgresql(queryset, terms)
+    if vendor == 'sqlite':
+        return _search_sqlite(queryset, terms)
+    return _search_fallback(queryset, terms)
+
+
+def _post_table(queryset):
+    return connection.ops.quote_name(queryset.model._meta.db_table)
+
+
+def _search_postgresql(queryset, terms):
+    # Every term must match, as a prefix so partially typed words still hit
+    tsquery = ' & '.join(f"{term}:*" for term in terms)
+    post_table = _post_table(queryset)
+    headline_options = (
+        f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, "
+        "MaxWords=35, MinWords=15, MaxFragments=2"
+    )
+
+    matches = RawSQL(
+        f"SELECT post_id FROM {DOCUMENT_TABLE} "
+        f"WHERE search_vector @@ to_tsquery('english', %s)",
+        [tsquery]
+    )
+    rank = RawSQL(
+        f"SELECT ts_rank_cd(d.search_vector, to_tsquery('english', %s), 32) "
+        f"FROM {DOCUMENT_TABLE} d WHERE d.post_id = {post_table}.id",
+        [tsquery],
+        output_field=FloatField()
+    )
+    highlight = RawSQL(
+        f"SELECT ts_headline('english', d.body, to_tsquery('english', %s), %s) "
+        f"FROM {DOCUMENT_TABLE} d WHERE d.post_id = {post_table}.id",
+        [tsquery, headline_options],
+        output_field=CharField()
+    )
+
+    return queryset.filter(id__in=matches).annotate(
+        search_rank=rank,
+        search_highlight=highlight,
+    ).order_by('-search_rank', '-created_at')
+
+
+def _search_sqlite(queryset, terms):
+    # Match either the stemmed word or anything starting with it
+    match = ' AND '.join(f'("{term}" OR "{term}"*)' for term in terms)
+    post_table = _post_table(queryset)
+    weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+
+    matches = RawSQL(
+        f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+        [match]
+    )
+    # bm25() is lower for better matches, so negate it
+    rank = RawSQL(
+        f"SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} "
+        f"WHERE {FTS_TABLE} MATCH %s AND rowid = {post_table}.id",
+        [match],
+        output_field=FloatField()
+    )
+    highlight = RawSQL(
+        f"SELECT snippet({FTS_TABLE}, 2, %s, %s, '...', 24) FROM {FTS_TABLE} "
+        f"WHERE {FTS_TABLE} MATCH %s AND rowid = {post_table}.id",
+        [HIGHLIGHT_START, HIGHLIGHT_STOP, match],
+        output_field=CharField()
+    )
+
+    return queryset.filter(id__in=matches).annotate(
+        search_rank=rank,
+        search_highlight=highlight,
+    ).order_by('-search_rank', '-created_at')
+
+
+def _search_fallback(queryset, terms):
+    logger.debug(f"No full-text index for {connection.vendor}, using substring search")
+
+    search_filter = Q()
+    for term in terms:
+        search_filter &= (
+            Q(search_document__title__icontains=term) |
+            Q(search_document__excerpt__icontains=term) |
+            Q(search_document__body__icontains=term)
+        )
+
+    return queryset.filter(search_filter).annotate(
+        search_rank=Case(
+            When(search_document__title__icontains=terms[0], then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField()
+        ),
+        search_highlight=Value(None, output_field=CharField()),
+    ).order_by('-search_rank', '-created_at')
@@ -0,0 +1,152 @@
+"""
+Unique slug allocation
+
+Slugs are derived from a title or name and made unique with a numeric
+suffix (``weekly-update``, ``weekly-update-1``, ...). Instead of probing one
+candidate per query, the allocator reads every existing ``base`` and
+``base-N`` slug in one query and picks the lowest free suffix in memory, so
+allocating slugs for a whole batch of rows costs one round trip no matter
+how many of them share a title. Two writers can still pick the same slug
+at the same time; save_with_unique_slug() lets the unique constraint decide
+and allocates again for the loser.
+"""
+
+import logging
+import re
+from collections import defaultdict
+from django.db import IntegrityError, router, transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+logger = logging.getLogger(__name__)
+
+# Room kept for a "-N" suffix when a base is cut to the field length
+SUFFIX_ROOM = 11
+
+# Distinct bases looked up per query
+LOOKUP_BATCH_SIZE = 500
+
+# Saves attempted before a slug collision is raised to the caller
+SAVE_ATTEMPTS = 5
+
+_SUFFIXED = re.compile(r'^(?P<base>.+)-(?P<number>\d+)$')
+
+
+def slug_base(value, max_length, fallback):
+    """
+    Slugify a title or name into the base slug suffixes are added to
+
+    Args:
+        value (str): Title or name
+        max_length (int): Length of the slug field
+        fallback (str): Base used when the value has no slug characters
+
+    Returns:
+        str: The base slug
+    """
+    base = slugify(value or '') or fallback
+    if len(base) > max_length - SUFFIX_ROOM:
+        base = base[:max_length - SUFFIX_ROOM].rstrip('-') or fallback
+    return base
+
+
+def _taken_suffixes(queryset, bases, field):
+    """Map each base to the suffixes already used (0 for the bare base)"""
+    taken = defaultdict(set)
+    bases = sorted(bases)
+    for start in range(0, len(bases), LOOKUP_BATCH_SIZE):
+        chunk = bases[start:start + LOOKUP_BATCH_SIZE]
+        match = Q(**{f"{field}__in": chunk})
+        for base in chunk:
+            match |= Q(**{f"{field}__startswith": f"{base}-"})
+
+        chunk = set(chunk)
+        for slug in queryset.filter(match).values_list(field, flat=True):
+            if slug in chunk:
+                taken[slug].add(0)
+            suffixed = _SUFFIXED.match(slug)
+            if suffixed and suffixed.group('base') in chunk:
+                taken[suffixed.group('base')].add(int(suffixed.group('number')))
+    return taken
+
+
+def allocate_slugs(model, values, field='slug', fallback=None, exclude_pks=()):
+    """
+    Allocate unique slugs for a batch of rows
+
+    Args:
+        model: Model owning the slug field
+        values (list): Title or name of each row
+        field (str): Slug field
+        fallback (str): Base for values without slug characters (default:
+            the model name)
+        exclude_pks: Rows whose current slugs may be reused (rows being
+            re-slugged)
+
+    Returns:
+        list: One slug per value, unique in the table and in the batch
+    """
+    max_length = model._meta.get_field(field).max_length
+    fallback = fallback or model._meta.model_name
+    bases = [slug_base(value, max_length, fallback) for value in values]
+
+    queryset = model._default_manager.all()
+    if exclude_pks:
+        queryset = queryset.exclude(pk__in=exclude_pks)
+    taken = _taken_suffixes(queryset, set(bases), field)
+
+    # A suffixed slug can equal another row's bare base ("news-1"), so slugs
+    # handed out in this batch are checked across bases too
+    assigned = set()
+    next_suffix = {}
+    slugs = []
+    for base in bases:
+        used = taken[base]
+        number = next_suffix.get(base, 0)
+        while True:
+            slug = f"{base}-{number}" if number else base
+            if number not in used and slug not in assigned:
+                break
+            number += 1
+        used.add(number)
+        assigned.add(slug)
+        next_suffix[base] = number + 1
+        slugs.append(slug)
+    return slugs
+
+
+def allocate_slug(model, value, field='slug', fallback=None, exclude_pk=None):
+    """Allocate a unique slug for one row (see allocate_slugs)"""
+    exclude_pks = [exclude_pk] if exclude_pk is not None else ()
+    return allocate_slugs(model, [value], field, fallback, exclude_pks)[0]
+
+
+def save_with_unique_slug(instance, value, save, *args, **kwargs):
+    """
+    Save an instance, allocating its slug from a title or name if it has none
+
+    When a concurrent save takes the same slug first, the unique constraint
+    rejects this one and a new slug is allocated, up to SAVE_ATTEMPTS times.
+
+    Args:
+        instance: Model instance with a ``slug`` field
+        value (str): Title or name the slug is derived from
+        save: Callable doing the actual save (e.g. the parent class's save)
+        *args, **kwargs: Passed to save
+    """
+    if instance.slug:
+        return save(*args, **kwargs)
+
+    model = type(instance)
+    using = kwargs.get('using') or router.db_for_write(model, instance=instance)
+    for attempt in range(1, SAVE_ATTEMPTS + 1):
+        instance.slug = allocate_slug(model, value, exclude_pk=instance.pk)
+        try:
+            with transaction.atomic(using=using):
+                return save(*args, **kwargs)
+        except IntegrityError:
+            # Only a slug taken meanwhile is worth another attempt
+            taken = model._default_manager.using(using).filter(slug=instance.slug).exclude(pk=instance.pk).exists()
+            if not taken or attempt == SAVE_ATTEMPTS:
+                raise
+            logger.info(f"Slug {instance.slug} was taken concurrently, allocating another")
@@ -1,16 +1,18 @@
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
-from django.db.models import Count, Q
-from django.utils.html import strip_tags
+from django.db.models import Case, IntegerField, Value, When
 import logging
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 from .models import Category, BlogPost
 from .serializers import CategorySerializer, BlogPostListSerializer
+from .utils.response_cache import CATEGORIES_SCOPE, POSTS_SCOPE, cache_response
+from .utils.conditional import category_validators, conditional
 
 # Setup logger
 logger = logging.getLogger(__name__)
@@ -34,9 +36,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
     destroy:
     Delete a category (requires authentication).
     """
-    queryset = Category.objects.all().annotate(
-        post_count=Count('posts', filter=Q(posts__published=True))
-    ).order_by('name')
+    queryset = Category.objects.all().order_by('name')
     serializer_class = CategorySerializer
     lookup_field = 'slug'
     
@@ -77,6 +77,8 @@ class CategoryViewSet(viewsets.ModelViewSet):
         },
         tags=['Categories']
     )
+    @method_decorator(conditional(category_validators))
+    @cache_response([CATEGORIES_SCOPE])
     def list(self, request, *args, **kwargs):
         """List all categories with post counts"""
         return super().list(request, *args, **kwargs)
@@ -89,6 +91,8 @@ class CategoryViewSet(viewsets.ModelViewSet):
         },
         tags=['Categories']
     )
+    @method_decorator(conditional(category_validators))
+    @cache_response([CATEGORIES_SCOPE])
     def retrieve(self, request, *args, **kwargs):
         """Retrieve a specific category by slug"""
         return super().retrieve(request, *args, **kwargs)
@@ -183,17 +187,20 @@ class CategoryViewSet(viewsets.ModelViewSet):
 )
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@cache_response([POSTS_SCOPE])
 def get_related_posts(request, slug):
     """
     Get related posts for a specific blog post.
     
-    Related posts are determined by:
-    1. Same category (highest priority)
-    2. Similar content/title keywords (medium priority)
-    3. Recent posts (lowest priority)
+    Related posts come from the precomputed TF-IDF index (see
+    blog.utils.related_posts), which scores posts by title, content and
+    category similarity. Posts that are not indexed yet fall back to recent
+    posts, preferring the same category.
     """
     # Get the current post
-    current_post = get_object_or_404(BlogPost, slug=slug, published=True)
+    current_post = get_object_or_404(
+        BlogPost.objects.only('id', 'category_id'), slug=slug, published=True
+    )
     
     # Get limit parameter (default 4, max 10)
     try:
@@ -202,109 +209,35 @@ def get_related_posts(request, slug):
     except (ValueError, TypeError):
         limit = 4
     
-    # Start with all published posts except the current one
-    related_posts = BlogPost.objects.filter(
-        published=True
-    ).exclude(id=current_post.id).prefetch_related('images')
-    
-    # Strategy 1: Posts from the same category (if current post has a category)
-    category_posts = []
-    if current_post.category:
-        category_posts = list(related_posts.filter(
-            category=current_post.category
-        ).order_by('-created_at')[:limit])
+    published_posts = BlogPost.objects.filter(published=True).with_list_stats()
     
-    # Strategy 2: Posts with similar keywords in title or content
-    similar_posts = []
-    if len(category_posts) < limit:
-        # Extract keywords from current post title
-        title_keywords = _extract_keywords(current_post.title)
-        
-        if title_keywords:
-            # Build query for posts with similar keywords
-            keyword_query = Q()
-            for keyword in title_keywords[:5]:  # Use top 5 keywords
-                keyword_query |= (
-                    Q(title__icontains=keyword) |
-                    Q(content__icontains=keyword)
-                )
-            
-            # Get posts with similar keywords, excluding category posts already found
-            exclude_ids = [post.id for post in category_posts] + [current_post.id]
-            similar_posts = list(related_posts.filter(keyword_query).exclude(
-                id__in=exclude_ids
-            ).order_by('-created_at')[:limit - len(category_posts)])
-    
-    # Strategy 3: Recent posts to fill remaining slots
-    recent_posts = []
-    total_found = len(category_posts) + len(similar_posts)
-    if total_found < limit:
-        exclude_ids = [post.id for post in category_posts + similar_posts] + [current_post.id]
-        recent_posts = list(related_posts.exclude(
-            id__in=exclude_ids
-        ).order_by('-created_at')[:limit - total_found])
+    # Single indexed lookup of the precomputed neighbours
+    related_posts = list(
+        published_posts.filter(related_from__post=current_post).order_by('related_from__rank')[:limit]
+    )
     
-    # Combine all related posts with priority order
-    final_related_posts = category_posts + similar_posts + recent_posts
+    # Fill remaining slots with recent posts, same category first
+    if len(related_posts) < limit:
+        exclude_ids = [post.id for post in related_posts] + [current_post.id]
+        related_posts += list(
+            published_posts.exclude(id__in=exclude_ids).order_by(
+                Case(
+                    When(category_id=current_post.category_id, then=Value(0)),
+                    default=Value(1),
+                    output_field=IntegerField()
+                ),
+                '-created_at'
+            )[:limit - len(related_posts)]
+        )
     
     # Serialize the results
     serializer = BlogPostListSerializer(
-        final_related_posts[:limit], 
+        related_posts, 
         many=True, 
         context={'request': request}
     )
     
     return Response({
-        'count': len(final_related_posts),
+        'count': len(related_posts),
         'results': serializer.data
     })
-
-
-def _extract_keywords(text, min_length=3, max_keywords=10):
-    """
-    Extract meaningful keywords from text for similarity matching.
-    
-    Args:
-        text (str): Text to extract keywords from
-        min_length (int): Minimum length of keywords to consider
-        max_keywords (int): Maximum number of keywords to return
-    
-    Returns:
-        list: List of keywords sorted by relevance
-    """
-    if not text:
-        return []
-    
-    # Remove HTML tags and convert to lowercase
-    clean_text = strip_tags(text).lower()
-    
-    # Common stop words to exclude
-    stop_words = {
-        'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 
-        'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'have', 
-        'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should',
-        'this', 'that', 'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we',
-        'they', 'me', 'him', 'her', 'us', 'them', 'my', 'your', 'his', 'her',
-        'its', 'our', 'their', 'from', 'up', 'about', 'into', 'over', 'after'
-    }
-    
-    # Split into words and filter
-    words = []
-    for word in clean_text.split():
-        # Remove punctuation and keep only alphanumeric characters
-        clean_word = ''.join(char for char in word if char.isalnum())
-        
-        # Filter by length, stop words, and ensure it's not just numbers
-        if (len(clean_word) >= min_length and 
-            clean_word not in stop_words and 
-            not clean_word.isdigit()):
-            words.append(clean_word)
-    
-    # Count word frequency and return most common words
-    word_freq = {}
-    for word in words:
-        word_freq[word] = word_freq.get(word, 0) + 1
-    
-    # Sort by frequency and return top keywords
-    sorted_words = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
-    return [word for word, freq in sorted_words[:max_keywords]]
\ No newline at end of file
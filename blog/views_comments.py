@@ -5,21 +5,36 @@ from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from django.db.models import Count
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Q
 import logging
 
-from .models import BlogPost, Comment, CommentLike
-from .serializers import CommentSerializer
+from .models import BlogPost, Comment
+from .pagination import AdminCommentPagination, CommentPagination, ReplyPagination
+from .serializers import CommentModerationSerializer, CommentSerializer
+from .utils.comment_tree import attach_likes, subtree_queryset
+from .utils.exports import EXPORT_FORMATS, stream_export
+from .utils import like_buffer
+from .utils.likes import MAX_LOOKUP_IDS, like_comment, liked_comment_ids, unlike_comment
+from .utils.comment_moderation import ACTIONS as MODERATION_ACTIONS, comment_status_counts, moderate_comments
 
 # Setup logger
 logger = logging.getLogger(__name__)
 
+# Columns of comment exports
+COMMENT_EXPORT_COLUMNS = [
+    'id', 'post_id', 'post__slug', 'parent_id', 'level', 'author_name', 'author_email',
+    'author_website', 'content', 'approved', 'is_trash', 'admin_reply', 'ip_address',
+    'user_agent', 'approved_reply_count', 'like_count', 'created_at', 'updated_at',
+]
+
 class CommentViewSet(viewsets.ModelViewSet):
     """
     API endpoint for managing blog comments.
     """
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
+    pagination_class = CommentPagination
     
     def get_permissions(self):
         """
@@ -27,8 +42,42 @@ class CommentViewSet(viewsets.ModelViewSet):
         """
         # Allow public access for ALL comment-related operations
         permission_classes = [AllowAny]
+        # except bulk moderation, which can delete a whole post's comments,
+        # and exports, which include author emails and IP addresses
+        if self.action in ['bulk', 'export']:
+            permission_classes = [IsAuthenticated]
         return [permission() for permission in permission_classes]
     
+    def _like_response(self, request, pk, liked):
+        """Apply an idempotent like or unlike and return the new like count"""
+        user_name = request.data.get('user_name')
+        if not user_name:
+            return Response({
+                'status': 'error',
+                'message': 'User name is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            comment_id = int(pk)
+            if like_buffer.is_enabled():
+                changed, like_count = like_buffer.get_buffer().record(comment_id, user_name, liked)
+            elif liked:
+                changed, like_count = like_comment(comment_id, user_name)
+            else:
+                changed, like_count = unlike_comment(comment_id, user_name)
+        except (ValueError, Comment.DoesNotExist):
+            return Response({
+                'status': 'error',
+                'message': f'Comment with ID {pk} not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response({
+            'status': 'success',
+            'liked': liked,
+            'changed': changed,
+            'like_count': like_count
+        })
+    
     @swagger_auto_schema(
         method='post',
         request_body=openapi.Schema(
@@ -38,44 +87,12 @@ class CommentViewSet(viewsets.ModelViewSet):
                 'user_name': openapi.Schema(type=openapi.TYPE_STRING, description='Name of the user liking the comment'),
             },
         ),
-        responses={200: 'Comment liked successfully', 400: 'Bad request', 404: 'Comment not found'}
+        responses={200: 'Comment liked (or already liked); returns the new like_count', 400: 'Bad request', 404: 'Comment not found'}
     )
     @action(detail=True, methods=['post'])
     def like(self, request, pk=None):
-        """Like a comment"""
-        try:
-            comment = self.get_object()
-            user_name = request.data.get('user_name')
-            
-            if not user_name:
-                return Response({
-                    'status': 'error',
-                    'message': 'User name is required'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Check if user already liked this comment
-            if CommentLike.objects.filter(comment=comment, user_name=user_name).exists():
-                return Response({
-                    'status': 'error',
-                    'message': 'You have already liked this comment'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Create the like
-            CommentLike.objects.create(comment=comment, user_name=user_name)
-            
-            # Return updated comment data
-            serializer = self.get_serializer(comment)
-            return Response({
-                'status': 'success',
-                'message': 'Comment liked successfully',
-                'comment': serializer.data
-            })
-            
-        except Exception as e:
-            return Response({
-                'status': 'error',
-                'message': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        """Like a comment; liking it again changes nothing"""
+        return self._like_response(request, pk, liked=True)
     
     @swagger_auto_schema(
         method='post',
@@ -86,44 +103,51 @@ class CommentViewSet(viewsets.ModelViewSet):
                 'user_name': openapi.Schema(type=openapi.TYPE_STRING, description='Name of the user unliking the comment'),
             },
         ),
-        responses={200: 'Comment unliked successfully', 400: 'Bad request', 404: 'Comment not found'}
+        responses={200: 'Comment unliked (or was not liked); returns the new like_count', 400: 'Bad request', 404: 'Comment not found'}
     )
     @action(detail=True, methods=['post'])
     def unlike(self, request, pk=None):
-        """Unlike a comment"""
+        """Remove a like from a comment; unliking it again changes nothing"""
+        return self._like_response(request, pk, liked=False)
+    
+    @swagger_auto_schema(
+        method='get',
+        manual_parameters=[
+            openapi.Parameter('user_name', openapi.IN_QUERY, description='Name of the user', type=openapi.TYPE_STRING, required=True),
+            openapi.Parameter('ids', openapi.IN_QUERY, description=f'Comma-separated comment IDs (at most {MAX_LOOKUP_IDS})', type=openapi.TYPE_STRING, required=True),
+        ],
+        responses={200: 'The given comment IDs the user has liked', 400: 'Bad request'}
+    )
+    @action(detail=False, methods=['get'])
+    def liked(self, request):
+        """Which of the given comments a user name has liked, in one query"""
+        user_name = request.query_params.get('user_name')
+        if not user_name:
+            return Response({
+                'status': 'error',
+                'message': 'User name is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
         try:
-            comment = self.get_object()
-            user_name = request.data.get('user_name')
-            
-            if not user_name:
-                return Response({
-                    'status': 'error',
-                    'message': 'User name is required'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Try to find and delete the like
-            try:
-                like = CommentLike.objects.get(comment=comment, user_name=user_name)
-                like.delete()
-            except CommentLike.DoesNotExist:
-                return Response({
-                    'status': 'error',
-                    'message': 'You have not liked this comment'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Return updated comment data
-            serializer = self.get_serializer(comment)
+            comment_ids = [int(value) for value in request.query_params.get('ids', '').split(',') if value.strip()]
+        except ValueError:
             return Response({
-                'status': 'success',
-                'message': 'Comment unliked successfully',
-                'comment': serializer.data
-            })
-            
-        except Exception as e:
+                'status': 'error',
+                'message': 'ids must be a comma-separated list of comment IDs'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(comment_ids) > MAX_LOOKUP_IDS:
             return Response({
                 'status': 'error',
-                'message': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                'message': f'At most {MAX_LOOKUP_IDS} ids can be checked at once'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        liked = liked_comment_ids(user_name, comment_ids) if comment_ids else []
+        if like_buffer.is_enabled():
+            liked = like_buffer.apply_pending(user_name, comment_ids, liked)
+        return Response({
+            'user_name': user_name,
+            'liked': liked
+        })
     
     def create(self, request, *args, **kwargs):
         """Create a new comment with better error handling"""
@@ -191,8 +215,16 @@ class CommentViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Get filtered queryset based on query parameters"""
-        queryset = self.queryset
+        queryset = self.filter_comments(self.queryset)
         
+        # Filter to only include top-level comments (not replies)
+        queryset = queryset.filter(parent__isnull=True)
+        
+        # Default ordering
+        return queryset.order_by('-created_at')
+    
+    def filter_comments(self, queryset):
+        """Apply the post, approved and is_trash query parameter filters"""
         # Filter by post ID if provided
         post_id = self.request.query_params.get('post')
         if post_id:
@@ -219,11 +251,84 @@ class CommentViewSet(viewsets.ModelViewSet):
             elif is_trash.lower() == 'false':
                 queryset = queryset.filter(is_trash=False)
         
-        # Filter to only include top-level comments (not replies)
-        queryset = queryset.filter(parent__isnull=True)
+        return queryset
+    
+    @swagger_auto_schema(
+        method='get',
+        manual_parameters=[
+            openapi.Parameter('output', openapi.IN_QUERY, description='Export format: ndjson (default) or csv', type=openapi.TYPE_STRING, enum=list(EXPORT_FORMATS)),
+            openapi.Parameter('post', openapi.IN_QUERY, description='Filter by post ID', type=openapi.TYPE_INTEGER),
+            openapi.Parameter('approved', openapi.IN_QUERY, description='Filter by approval status (true/false)', type=openapi.TYPE_STRING),
+            openapi.Parameter('is_trash', openapi.IN_QUERY, description='Filter by trash status (true/false)', type=openapi.TYPE_STRING),
+        ],
+        responses={200: 'Streamed NDJSON or CSV file of the matching comments, replies included', 400: 'Unknown format'}
+    )
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream every matching comment, replies included, for audits"""
+        output = request.query_params.get('output', 'ndjson')
+        if output not in EXPORT_FORMATS:
+            return Response({
+                'status': 'error',
+                'message': f'Unknown format: {output}'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Default ordering
-        return queryset.order_by('-created_at')
+        queryset = self.filter_comments(Comment.objects.all()).order_by('-created_at', '-id')
+        return stream_export(queryset, COMMENT_EXPORT_COLUMNS, output, 'comments')
+    
+    def _subtree_response(self, request, pk, default_depth):
+        """A keyset page of the visible replies below a visible comment"""
+        depth = request.query_params.get('depth', default_depth)
+        try:
+            depth = int(depth) if depth is not None else None
+            if depth is not None and depth < 1:
+                raise ValueError(depth)
+        except ValueError:
+            return Response({
+                'status': 'error',
+                'message': 'depth must be a positive integer'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        comment = get_object_or_404(
+            Comment.objects.select_related('post'), pk=pk, approved=True, is_trash=False
+        )
+        paginator = ReplyPagination()
+        replies = paginator.paginate_queryset(subtree_queryset(comment, depth), request, view=self)
+        for reply in replies:
+            # Reuse the already loaded post so post_title does not query
+            reply.post = comment.post
+        attach_likes(replies)
+        
+        serializer = CommentSerializer(replies, many=True, context={'request': request, 'no_replies': True})
+        return paginator.get_paginated_response(serializer.data)
+    
+    @swagger_auto_schema(
+        method='get',
+        manual_parameters=[
+            openapi.Parameter('depth', openapi.IN_QUERY, description='Reply levels to include (default: 1, direct replies only)', type=openapi.TYPE_INTEGER),
+            openapi.Parameter('limit', openapi.IN_QUERY, description='Replies per page (default: 20, max: 100)', type=openapi.TYPE_INTEGER),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description='Opaque cursor taken from a next/previous link', type=openapi.TYPE_STRING),
+        ],
+        responses={200: 'A page of replies, oldest first, flat with parent and level', 404: 'Comment not found'}
+    )
+    @action(detail=True, methods=['get'])
+    def replies(self, request, pk=None):
+        """Load the replies of a comment a page at a time"""
+        return self._subtree_response(request, pk, default_depth=1)
+    
+    @swagger_auto_schema(
+        method='get',
+        manual_parameters=[
+            openapi.Parameter('depth', openapi.IN_QUERY, description='Reply levels to include (default: all)', type=openapi.TYPE_INTEGER),
+            openapi.Parameter('limit', openapi.IN_QUERY, description='Replies per page (default: 20, max: 100)', type=openapi.TYPE_INTEGER),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description='Opaque cursor taken from a next/previous link', type=openapi.TYPE_STRING),
+        ],
+        responses={200: 'A page of the reply subtree in thread order (depth first), flat with parent and level', 404: 'Comment not found'}
+    )
+    @action(detail=True, methods=['get'])
+    def thread(self, request, pk=None):
+        """Load the whole reply subtree of a comment a page at a time"""
+        return self._subtree_response(request, pk, default_depth=None)
     
     @action(detail=False, methods=['get'])
     def pending_count(self, request):
@@ -235,18 +340,69 @@ class CommentViewSet(viewsets.ModelViewSet):
     def counts(self, request):
         """Get comment counts by status (including replies for admin)"""
         # For admin interface, count ALL comments including replies
-        all_count = Comment.objects.count()
-        pending_count = Comment.objects.filter(approved=False, is_trash=False).count()
-        approved_count = Comment.objects.filter(approved=True, is_trash=False).count()
-        trash_count = Comment.objects.filter(is_trash=True).count()
+        return Response(comment_status_counts())
+        
+    @swagger_auto_schema(
+        method='post',
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['action'],
+            properties={
+                'action': openapi.Schema(type=openapi.TYPE_STRING, enum=list(MODERATION_ACTIONS)),
+                'ids': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER)),
+                'filter': openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    description='Select comments by post, approved and/or is_trash instead of ids',
+                    properties={
+                        'post': openapi.Schema(type=openapi.TYPE_INTEGER),
+                        'approved': openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                        'is_trash': openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                    },
+                ),
+            },
+        ),
+        responses={200: 'Ids of the changed comments and the new status counts', 400: 'Bad request'}
+    )
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Approve, unapprove, trash, restore or delete many comments at once"""
+        action_name = request.data.get('action')
+        if action_name not in MODERATION_ACTIONS:
+            return Response({
+                'status': 'error',
+                'message': f'Unknown action: {action_name}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        ids = request.data.get('ids')
+        filters = request.data.get('filter')
+        if ids is not None:
+            if not isinstance(ids, list) or not all(isinstance(comment_id, int) for comment_id in ids):
+                return Response({
+                    'status': 'error',
+                    'message': 'ids must be a list of comment IDs'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            filters = {'id__in': ids}
+        elif not (isinstance(filters, dict) and filters and set(filters) <= {'post', 'approved', 'is_trash'}):
+            return Response({
+                'status': 'error',
+                'message': 'Either ids or a filter on post, approved and/or is_trash is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            affected_ids = moderate_comments(action_name, Comment.objects.filter(**filters))
+        except (ValueError, TypeError, ValidationError) as e:
+            return Response({
+                'status': 'error',
+                'message': f'Invalid filter: {str(e)}'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
-            'all': all_count,
-            'pending': pending_count,
-            'approved': approved_count,
-            'trash': trash_count
+            'status': 'success',
+            'action': action_name,
+            'affected_ids': affected_ids,
+            'counts': comment_status_counts(),
         })
-        
+    
     @action(detail=True, methods=['post', 'patch'])
     def approve(self, request, pk=None):
         """Approve a comment"""
@@ -522,9 +678,21 @@ class CommentViewSet(viewsets.ModelViewSet):
             'total': all_comments.count()
         })
     
+    @swagger_auto_schema(
+        method='get',
+        manual_parameters=[
+            openapi.Parameter('post', openapi.IN_QUERY, description='Filter by post ID', type=openapi.TYPE_INTEGER),
+            openapi.Parameter('approved', openapi.IN_QUERY, description='Filter by approval status (true/false)', type=openapi.TYPE_STRING),
+            openapi.Parameter('is_trash', openapi.IN_QUERY, description='Filter by trash status (true/false)', type=openapi.TYPE_STRING),
+            openapi.Parameter('limit', openapi.IN_QUERY, description='Comments per page (default: 100, max: 500)', type=openapi.TYPE_INTEGER),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description='Opaque cursor taken from a next/previous link', type=openapi.TYPE_STRING),
+            openapi.Parameter('count', openapi.IN_QUERY, description='Set to "false" to skip the total count', type=openapi.TYPE_STRING),
+        ],
+        responses={200: 'A page of comments, newest first, with next/previous cursor links'}
+    )
     @action(detail=False, methods=['get'])
     def admin_all(self, request):
-        """Return ALL comments including replies for admin management"""
+        """Return ALL comments including replies for admin management, a page at a time"""
         # Get query parameters
         post_id = request.query_params.get('post')
         approved = request.query_params.get('approved')
@@ -557,17 +725,16 @@ class CommentViewSet(viewsets.ModelViewSet):
             elif is_trash.lower() == 'false':
                 queryset = queryset.filter(is_trash=False)
         
-        # Order by creation date (newest first)
-        queryset = queryset.order_by('-created_at')
-        
-        # Serialize comments without nested replies to avoid recursion in admin view
-        context = {'no_replies': True}  # This will prevent nested replies in serialization
-        serialized = CommentSerializer(queryset, many=True, context=context).data
+        # Join the post for its title; post bodies are not shown
+        queryset = queryset.select_related('post').defer(
+            'post__content', 'post__excerpt', 'post__featured_image_variants'
+        )
         
-        return Response({
-            'results': serialized,
-            'count': queryset.count()
-        })
+        # Newest first, a keyset page at a time
+        paginator = AdminCommentPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = CommentModerationSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
         
     @action(detail=False, methods=['get'])
     def check_approved(self, request):
@@ -624,25 +791,26 @@ def comment_counts(request):
     """Get all comment counts categorized by status"""
     # For public API, count top-level comments only
     # For admin interface, we use the viewset counts action which includes all comments
-    top_level_comments = Comment.objects.filter(parent__isnull=True)
-    total_count = top_level_comments.count()
-    approved_count = top_level_comments.filter(approved=True, is_trash=False).count()
-    pending_count = top_level_comments.filter(approved=False, is_trash=False).count()
-    trashed_count = top_level_comments.filter(is_trash=True).count()
-    
-    # Calculate counts by post
-    posts_with_comments = top_level_comments.values('post').distinct().count()
-    posts_with_pending = top_level_comments.filter(approved=False, is_trash=False).values('post').distinct().count()
+    pending = Q(approved=False, is_trash=False)
+    # One conditional aggregation; aliases must not shadow the filtered fields
+    counts = Comment.objects.filter(parent__isnull=True).aggregate(
+        total_count=Count('id'),
+        approved_count=Count('id', filter=Q(approved=True, is_trash=False)),
+        pending_count=Count('id', filter=pending),
+        trashed_count=Count('id', filter=Q(is_trash=True)),
+        posts_with_comments=Count('post', distinct=True),
+        posts_with_pending=Count('post', distinct=True, filter=pending),
+    )
     
     # Return counts
     return Response({
-        'total': total_count,
-        'approved': approved_count,
-        'pending': pending_count,
-        'trashed': trashed_count,
+        'total': counts['total_count'],
+        'approved': counts['approved_count'],
+        'pending': counts['pending_count'],
+        'trashed': counts['trashed_count'],
         'posts': {
-            'with_comments': posts_with_comments,
-            'with_pending': posts_with_pending
+            'with_comments': counts['posts_with_comments'],
+            'with_pending': counts['posts_with_pending']
         }
     })
 
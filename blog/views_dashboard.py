@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.db.models import Count, Q
 from .models import BlogPost, Comment, Category
+from .utils.response_cache import get_stats, reset_stats
 
 
 @api_view(['GET'])
@@ -14,33 +15,17 @@ def dashboard_stats(request):
     Returns counts for posts, comments, and categories
     """
     try:
-        # Get all posts count
-        total_posts = BlogPost.objects.count()
-        
-        # Get published posts count
-        published_posts = BlogPost.objects.filter(published=True).count()
-        
-        # Get draft posts count
-        draft_posts = BlogPost.objects.filter(published=False).count()
-        
-        # Get total comments count
-        total_comments = Comment.objects.count()
-        
-        # Get pending (unapproved) comments count
-        pending_comments = Comment.objects.filter(approved=False).count()
-        
-        # Get total categories count
-        total_categories = Category.objects.count()
-        
-        # Prepare response data
-        stats = {
-            'total_posts': total_posts,
-            'published_posts': published_posts,
-            'draft_posts': draft_posts,
-            'total_comments': total_comments,
-            'pending_comments': pending_comments,
-            'total_categories': total_categories,
-        }
+        # One conditional aggregation per table
+        stats = BlogPost.objects.aggregate(
+            total_posts=Count('pk'),
+            published_posts=Count('pk', filter=Q(published=True)),
+            draft_posts=Count('pk', filter=Q(published=False)),
+        )
+        stats.update(Comment.objects.aggregate(
+            total_comments=Count('pk'),
+            pending_comments=Count('pk', filter=Q(approved=False)),
+        ))
+        stats.update(Category.objects.aggregate(total_categories=Count('pk')))
         
         return Response({
             'success': True,
@@ -54,3 +39,20 @@ def dashboard_stats(request):
             'error': str(e),
             'message': 'Failed to retrieve dashboard statistics'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def cache_stats(request):
+    """
+    Get (or reset, with DELETE) the hit/miss counters of the public
+    response cache
+    """
+    if request.method == 'DELETE':
+        reset_stats()
+    
+    return Response({
+        'success': True,
+        'data': get_stats(),
+        'message': 'Cache statistics retrieved successfully'
+    }, status=status.HTTP_200_OK)
@@ -0,0 +1,147 @@
+"""
+Media file serving for deployments without a CDN or object storage
+
+Responses carry a strong ETag, Last-Modified and long-lived Cache-Control
+(immutable for content-addressed names), answer conditional requests with
+304 and single byte ranges with 206. With MEDIA_SENDFILE set, the file is
+handed off to the front proxy (nginx X-Accel-Redirect or Apache/lighttpd
+X-Sendfile) so no worker streams it. Otherwise the response wraps the open
+file, which gunicorn sends with os.sendfile() instead of copying it through
+Python.
+"""
+
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from .utils.media_store import HASHED_NAME_RE, IMMUTABLE_CACHE_CONTROL
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileRange:
+    """
+    A byte range of an open file
+
+    Reads stop at the end of the range. fileno() is exposed so gunicorn's
+    file wrapper can sendfile() from the current offset for the response's
+    Content-Length.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def _etag(path, stats):
+    # Content-addressed names are their own strong validator
+    match = HASHED_NAME_RE.search(path)
+    if match:
+        return f'"{os.path.splitext(match.group(0).lstrip("/"))[0]}"'
+    return f'"{stats.st_mtime_ns:x}-{stats.st_size:x}"'
+
+
+def _requested_range(request, size, etag, last_modified):
+    """
+    Parse a single-range Range header
+
+    Returns:
+        tuple: (start, length), None to send the whole file, or False if
+            the range cannot be satisfied
+    """
+    header = request.headers.get('Range')
+    if not header:
+        return None
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != int(last_modified):
+        return None
+
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        # Multiple ranges or other units: the whole file is a valid answer
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start >= size or end < start:
+        return False
+    return start, end - start + 1
+
+
+@require_safe
+def serve_media(request, path, document_root=None):
+    """Serve a file from MEDIA_ROOT (or ``document_root``)"""
+    document_root = document_root or settings.MEDIA_ROOT
+    try:
+        full_path = safe_join(document_root, path)
+        stats = os.stat(full_path)
+    except (OSError, ValueError):
+        raise Http404('File not found')
+    if not stat.S_ISREG(stats.st_mode):
+        raise Http404('File not found')
+
+    etag = _etag(path, stats)
+    last_modified = stats.st_mtime
+    response = get_conditional_response(request, etag=etag, last_modified=int(last_modified))
+    if response is None:
+        content_type, encoding = mimetypes.guess_type(full_path)
+        content_type = content_type or 'application/octet-stream'
+        requested = _requested_range(request, stats.st_size, etag, last_modified)
+
+        if requested is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stats.st_size}'
+            encoding = None
+        elif settings.MEDIA_SENDFILE:
+            # The proxy serves the bytes, including ranges
+            response = HttpResponse(content_type=content_type)
+            if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+                response['X-Accel-Redirect'] = settings.MEDIA_SENDFILE_PREFIX + quote(path)
+            else:
+                response['X-Sendfile'] = full_path
+        else:
+            start, length = requested or (0, stats.st_size)
+            if request.method == 'HEAD':
+                response = HttpResponse(content_type=content_type)
+            else:
+                response = FileResponse(FileRange(open(full_path, 'rb'), start, length), content_type=content_type)
+            response['Content-Length'] = length
+            if requested:
+                response.status_code = 206
+                response['Content-Range'] = f'bytes {start}-{start + length - 1}/{stats.st_size}'
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if HASHED_NAME_RE.search(path):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    else:
+        patch_cache_control(response, public=True, max_age=settings.MEDIA_CACHE_MAX_AGE)
+    return response
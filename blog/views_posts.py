@@ -1,23 +1,35 @@
-from django.shortcuts import render, get_object_or_404
+from django.http import Http404
+from django.utils.decorators import method_decorator
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from django.db.models import Prefetch, Q
 import logging
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-import re
-from django.utils.html import strip_tags
 
-from .models import BlogPost, BlogImage, Comment
+from .models import BlogPost, BlogImage
 from .serializers import BlogPostSerializer, BlogPostListSerializer, BlogImageSerializer
 from .pagination import BlogPostPagination
+from .utils.search import search_posts
+from .utils.response_cache import (
+    POSTS_SCOPE, cache_response, post_category_scopes, post_detail_scopes
+)
+from .utils.exports import EXPORT_FORMATS, stream_export
+from .utils.conditional import conditional, post_list_validators, post_validators, slug_list_validators
+from .utils.render_store import get_render, render_response
 
 # Setup logger
 logger = logging.getLogger(__name__)
 
+# Columns of post exports
+POST_EXPORT_COLUMNS = [
+    'id', 'title', 'slug', 'category__name', 'published', 'featured', 'position', 'read_time',
+    'approved_comment_count', 'excerpt', 'content', 'meta_title', 'meta_description',
+    'created_at', 'updated_at',
+]
+
 class BlogPostViewSet(viewsets.ModelViewSet):
     """
     API endpoint for managing blog posts.
@@ -64,8 +76,8 @@ class BlogPostViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         queryset = self.queryset
-        if self.action == 'list':
-            # Filter by published status for list view
+        if self.action in ['list', 'export']:
+            # Filter by published status for list view and exports
             published = self.request.query_params.get('published')
             if published is not None:
                 if published.lower() == 'true':
@@ -95,92 +107,25 @@ class BlogPostViewSet(viewsets.ModelViewSet):
         
         # Optimize with prefetch_related
         if self.action == 'retrieve':
-            # For single post view, prefetch related images and approved comments
-            queryset = queryset.prefetch_related(
-                'images',
-                Prefetch(
-                    'comments',
-                    queryset=Comment.objects.filter(approved=True),
-                    to_attr='approved_comments'
-                )
-            )
+            # For single post view, join the category and prefetch images;
+            # the comment thread is loaded by the serializer's tree builder
+            queryset = queryset.select_related('category').prefetch_related('images')
         elif self.action == 'list':
-            # For list view, just prefetch images
-            queryset = queryset.prefetch_related('images')
+            # For list view, join category and annotate comment/category counts
+            queryset = queryset.with_list_stats()
             
         return queryset
     
     def _apply_search_filter(self, queryset, search_query):
         """
-        Apply universal search filter across title, content, and slug.
-        Supports multiple search terms and provides relevance-based ordering.
+        Apply full-text search across title, excerpt and content.
+        All terms must match; results are ordered by relevance and annotated
+        with a highlighted content snippet (see blog.utils.search).
         """
         if not search_query or not search_query.strip():
             return queryset
         
-        # Clean and prepare search terms
-        search_terms = self._prepare_search_terms(search_query)
-        
-        if not search_terms:
-            return queryset
-        
-        # Build search query using Q objects
-        search_filter = Q()
-        
-        for term in search_terms:
-            # Create a filter for each term that searches across multiple fields
-            term_filter = (
-                Q(title__icontains=term) |
-                Q(slug__icontains=term) |
-                Q(content__icontains=term)
-            )
-            
-            # Combine with AND logic (all terms must be found somewhere)
-            if search_filter:
-                search_filter &= term_filter
-            else:
-                search_filter = term_filter
-        
-        # Apply the search filter
-        queryset = queryset.filter(search_filter)
-        
-        # Simple relevance ordering: title matches first, then by creation date
-        # We'll use a simpler approach without raw SQL to avoid parameter issues
-        title_matches = queryset.filter(title__icontains=search_terms[0])
-        other_matches = queryset.exclude(title__icontains=search_terms[0])
-        
-        # Combine with title matches first, then other matches
-        from django.db.models import Case, When, IntegerField
-        
-        queryset = queryset.annotate(
-            title_priority=Case(
-                When(title__icontains=search_terms[0], then=1),
-                default=0,
-                output_field=IntegerField()
-            )
-        ).order_by('-title_priority', '-created_at')
-        
-        return queryset
-    
-    def _prepare_search_terms(self, search_query):
-        """
-        Clean and prepare search terms from the search query.
-        Removes HTML tags, splits on whitespace, and filters out short terms.
-        """
-        # Remove HTML tags if present
-        clean_query = strip_tags(search_query)
-        
-        # Split into terms and clean them
-        terms = []
-        for term in clean_query.split():
-            # Remove special characters and keep only alphanumeric and common punctuation
-            clean_term = re.sub(r'[^\w\s-]', '', term).strip()
-            
-            # Only include terms that are at least 2 characters long
-            if len(clean_term) >= 2:
-                terms.append(clean_term)
-        
-        return terms[:10]  # Limit to 10 search terms for performance
+        return search_posts(queryset, search_query)
 
     @swagger_auto_schema(
         operation_description="Create a new blog post with optional image uploads. You can set the category using either category_id or category_name.",
@@ -336,6 +281,27 @@ class BlogPostViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @swagger_auto_schema(
+        method='get',
+        operation_description="Stream the posts matching the list filters as NDJSON or CSV (requires authentication)",
+        manual_parameters=[
+            openapi.Parameter('output', openapi.IN_QUERY, description='Export format: ndjson (default) or csv', type=openapi.TYPE_STRING, enum=list(EXPORT_FORMATS)),
+            openapi.Parameter('published', openapi.IN_QUERY, description='Filter by published status (true/false)', type=openapi.TYPE_STRING),
+            openapi.Parameter('category', openapi.IN_QUERY, description='Filter by category name (case-insensitive exact match)', type=openapi.TYPE_STRING),
+            openapi.Parameter('search', openapi.IN_QUERY, description='Full-text search across title, excerpt and content', type=openapi.TYPE_STRING),
+        ],
+        responses={200: 'Streamed NDJSON or CSV file', 400: 'Unknown format'},
+        tags=['Posts']
+    )
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream every post matching the list filters"""
+        output = request.query_params.get('output', 'ndjson')
+        if output not in EXPORT_FORMATS:
+            return Response({"detail": f"Unknown format: {output}"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return stream_export(self.get_queryset(), POST_EXPORT_COLUMNS, output, 'posts')
+    
     @swagger_auto_schema(
         operation_description="Alternative endpoint for deleting a post using POST method",
         responses={
@@ -404,7 +370,7 @@ class BlogPostViewSet(viewsets.ModelViewSet):
             openapi.Parameter(
                 name='search',
                 in_=openapi.IN_QUERY,
-                description='Universal search across title, content, and slug. Supports multiple terms.',
+                description='Full-text search across title, excerpt and content, ranked by relevance. All terms must match.',
                 type=openapi.TYPE_STRING,
                 required=False
             ),
@@ -449,6 +415,28 @@ class BlogPostViewSet(viewsets.ModelViewSet):
                 description='Number of posts per page (default: 9, max: 50)',
                 type=openapi.TYPE_INTEGER,
                 required=False
+            ),
+            openapi.Parameter(
+                name='pagination',
+                in_=openapi.IN_QUERY,
+                description='Set to "cursor" for keyset pagination in the same order as numbered pages; '
+                            'pages are then linked by next/previous cursors and carry no page numbers',
+                type=openapi.TYPE_STRING,
+                required=False
+            ),
+            openapi.Parameter(
+                name='cursor',
+                in_=openapi.IN_QUERY,
+                description='Opaque cursor taken from a next/previous link (implies pagination=cursor)',
+                type=openapi.TYPE_STRING,
+                required=False
+            ),
+            openapi.Parameter(
+                name='count',
+                in_=openapi.IN_QUERY,
+                description='With cursor pagination, set to "true" to include the total count',
+                type=openapi.TYPE_STRING,
+                required=False
             )
         ],
         responses={
@@ -473,6 +461,8 @@ class BlogPostViewSet(viewsets.ModelViewSet):
         },
         tags=['Posts']
     )
+    @method_decorator(conditional(post_list_validators))
+    @cache_response([POSTS_SCOPE])
     def list(self, request, *args, **kwargs):
         """List all blog posts with optional filtering"""
         return super().list(request, *args, **kwargs)
@@ -485,6 +475,8 @@ class BlogPostViewSet(viewsets.ModelViewSet):
         },
         tags=['Posts']
     )
+    @method_decorator(conditional(post_validators))
+    @cache_response(post_detail_scopes, post_category_scopes)
     def retrieve(self, request, *args, **kwargs):
         """Retrieve a specific blog post by slug"""
         return super().retrieve(request, *args, **kwargs)
@@ -539,11 +531,13 @@ class BlogPostViewSet(viewsets.ModelViewSet):
 )
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@conditional(post_validators)
 def get_post_by_slug(request, slug):
-    """Get a blog post by its slug"""
-    post = get_object_or_404(BlogPost, slug=slug)
-    serializer = BlogPostSerializer(post)
-    return Response(serializer.data)
+    """Get a blog post by its slug, served from its pre-rendered payload"""
+    render = get_render(slug)
+    if render is None:
+        raise Http404
+    return render_response(render, request)
 
 
 @swagger_auto_schema(
@@ -567,6 +561,8 @@ def get_post_by_slug(request, slug):
 )
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@conditional(slug_list_validators)
+@cache_response([POSTS_SCOPE])
 def get_all_slugs(request):
     """Get a list of all blog post slugs"""
     # Get all slugs from published blog posts
@@ -9,12 +9,38 @@ from rest_framework import status, permissions
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.core.files.storage import default_storage
 from django.conf import settings
-from .utils.image_utils import validate_blog_image, optimize_blog_image
+from .utils.image_utils import validate_blog_image
+from .utils.image_queue import enqueue_editor_upload
+from .utils.media_store import file_digest, find_asset, hashed_name
 import os
-import uuid
 
 logger = logging.getLogger(__name__)
 
+
+def _store_editor_upload(image_file, directory, extension):
+    """
+    Store an editor upload by content hash
+
+    Content uploaded before is not stored again: the optimized file is
+    returned if it exists, otherwise the stored original. New content is
+    queued for optimization by the image worker.
+
+    Returns:
+        str: Storage name to link in the post content
+    """
+    digest = file_digest(image_file)
+    asset = find_asset(digest)
+    if asset is not None:
+        return asset.name
+    
+    file_path = hashed_name(directory, digest, extension)
+    # Otherwise identical content is already stored and queued
+    if not default_storage.exists(file_path):
+        file_path = default_storage.save(file_path, image_file)
+        enqueue_editor_upload(file_path, digest)
+    return file_path
+
+
 class QuillImageUploadView(APIView):
     """
     Handle image uploads for Quill editor
@@ -43,32 +69,18 @@ class QuillImageUploadView(APIView):
                     'details': validation_result['errors']
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Generate unique filename
+            # Get the file extension
             file_extension = os.path.splitext(image_file.name)[1].lower()
             if not file_extension:
                 file_extension = '.jpg'  # Default extension
             
-            unique_filename = f"quill_uploads/{uuid.uuid4().hex}{file_extension}"
-            
-            # Optimize the image
-            try:
-                optimized_image = optimize_blog_image(image_file)
-                if optimized_image:
-                    image_file = optimized_image
-                    # Update filename for WebP if converted
-                    if optimized_image.name.endswith('.webp'):
-                        unique_filename = f"quill_uploads/{uuid.uuid4().hex}.webp"
-            except Exception as e:
-                logger.warning(f"Image optimization failed, using original: {str(e)}")
-            
-            # Save the file
+            # Save the file under its content hash
+            file_path = _store_editor_upload(image_file, 'quill_uploads', file_extension)
             if hasattr(settings, 'AWS_STORAGE_BUCKET_NAME') and settings.AWS_STORAGE_BUCKET_NAME:
                 # Using S3 storage
-                file_path = default_storage.save(unique_filename, image_file)
                 file_url = default_storage.url(file_path)
             else:
                 # Using local storage
-                file_path = default_storage.save(unique_filename, image_file)
                 file_url = request.build_absolute_uri(settings.MEDIA_URL + file_path)
             
             logger.info(f"Image uploaded successfully: {file_url}")
@@ -117,32 +129,18 @@ class CKEditorImageUploadView(APIView):
                     }
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Generate unique filename
+            # Get the file extension
             file_extension = os.path.splitext(image_file.name)[1].lower()
             if not file_extension:
                 file_extension = '.jpg'  # Default extension
             
-            unique_filename = f"ckeditor_uploads/{uuid.uuid4().hex}{file_extension}"
-            
-            # Optimize the image
-            try:
-                optimized_image = optimize_blog_image(image_file)
-                if optimized_image:
-                    image_file = optimized_image
-                    # Update filename for WebP if converted
-                    if optimized_image.name.endswith('.webp'):
-                        unique_filename = f"ckeditor_uploads/{uuid.uuid4().hex}.webp"
-            except Exception as e:
-                logger.warning(f"Image optimization failed, using original: {str(e)}")
-            
-            # Save the file
+            # Save the file under its content hash
+            file_path = _store_editor_upload(image_file, 'ckeditor_uploads', file_extension)
             if hasattr(settings, 'AWS_STORAGE_BUCKET_NAME') and settings.AWS_STORAGE_BUCKET_NAME:
                 # Using S3 storage
-                file_path = default_storage.save(unique_filename, image_file)
                 file_url = default_storage.url(file_path)
             else:
                 # Using local storage
-                file_path = default_storage.save(unique_filename, image_file)
                 file_url = request.build_absolute_uri(settings.MEDIA_URL + file_path)
             
             logger.info(f"CKEditor image uploaded successfully: {file_url}")
@@ -20,6 +20,25 @@ function collect_static() {
     python manage.py collectstatic --noinput
 }
 
+function run_worker() {
+    # Restart a worker that exits, like a process manager would
+    while true; do
+        python manage.py "$@" || echo "Worker $1 exited with status $?"
+        sleep 5
+    done
+}
+
+function start_workers() {
+    # Platforms running the workers as their own services (see Procfile)
+    # set RUN_WORKERS=false on the web service
+    if [ "${RUN_WORKERS:-true}" != "true" ]; then
+        return
+    fi
+    echo "Starting background workers..."
+    run_worker process_image_jobs &
+    run_worker process_related_posts &
+}
+
 function start_server() {
     echo "Starting the application..."
     gunicorn backend.wsgi:application --bind 0.0.0.0:${PORT:-8000}
@@ -36,18 +55,20 @@ case "$1" in
         collect_static
         ;;
     start)
+        start_workers
         start_server
         ;;
     full)
         install_dependencies
         run_migrations
         collect_static
+        start_workers
         start_server
         ;;
     *)
         echo "Usage: $0 {build|start|full}"
         echo "  build: Install dependencies, run migrations, and collect static files"
-        echo "  start: Start the application server"
+        echo "  start: Start the background workers and the application server"
         echo "  full: Complete deployment process (build + start)"
         exit 1
         ;;